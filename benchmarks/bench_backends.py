@@ -0,0 +1,169 @@
+""" Benchmark of the pandas and pyarrow backends on the dataframe stages:
+parsing the genepanels file, building the symbol table, comparing the
+genepanels data to the test directory data and filtering the reports.
+
+Usage:
+    python benchmarks/bench_backends.py --nb_cis 2000 --nb_hgnc_genes 45000
+"""
+
+import argparse
+from pathlib import Path
+import random
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).absolute().parents[1]))
+
+from bench_compare_gp_td import (  # noqa: E402
+    build_synthetic_data, time_function
+)
+from test_directory_checker import (  # noqa: E402
+    backend, checker, identify, utils
+)
+
+
+def build_synthetic_hgnc_dump(nb_genes: int, seed: int = 1) -> pd.DataFrame:
+    """ Build a HGNC dump with previous and alias symbols for some genes
+
+    Args:
+        nb_genes (int): Number of genes in the HGNC dump
+        seed (int, optional): Seed for the random generator. Defaults to 1.
+
+    Returns:
+        pd.DataFrame: Dataframe with the columns of utils.HGNC_COLUMNS
+    """
+
+    rng = random.Random(seed)
+    rows = []
+
+    for i in range(1, nb_genes + 1):
+        previous_symbols = ", ".join(
+            f"PREV{i}-{j}" for j in range(rng.randint(0, 2))
+        )
+        alias_symbols = ", ".join(
+            f"ALIAS{rng.randint(1, nb_genes)}"
+            for _ in range(rng.randint(0, 3))
+        )
+        rows.append(
+            [
+                f"HGNC:{i}", f"GENE{i}", previous_symbols or None,
+                alias_symbols or None, "protein-coding gene", "1p36"
+            ]
+        )
+
+    return pd.DataFrame(rows, columns=utils.HGNC_COLUMNS)
+
+
+def run_backend(name: str, repeats: int, genepanels_file: Path, *data):
+    """ Time the dataframe stages with a backend
+
+    Args:
+        name (str): Name of the backend
+        repeats (int): Number of runs per stage
+        genepanels_file (Path): Path to the genepanels file
+        *data: HGNC dump, test directory data, signedoff panels and gene locus
+        type dict
+
+    Returns:
+        tuple: Dict of the best time of every stage and dict of their results
+    """
+
+    hgnc_dump, td_data, signedoff_panels, gene_locus_type = data
+    blacklist_config = {
+        "unaccessible_panelapp_panels": [], "genes_with_no_transcripts": []
+    }
+    backend.set_backend(name)
+    timings = {}
+    results = {}
+
+    timings["parse_genepanels"], results["parse_genepanels"] = time_function(
+        utils.parse_genepanels, repeats, genepanels_file
+    )
+    timings["build_symbol_table"], results["build_symbol_table"] = (
+        time_function(identify.build_symbol_table, repeats, hgnc_dump)
+    )
+    timings["compare_gp_td"], results["compare_gp_td"] = time_function(
+        checker.compare_gp_td, repeats, td_data,
+        results["parse_genepanels"], signedoff_panels, gene_locus_type,
+        blacklist_config
+    )
+    timings["filter_out_df"], results["filter_out_df"] = time_function(
+        lambda df: utils.filter_out_df(df, removed=None, added=None),
+        repeats, results["compare_gp_td"][2]
+    )
+
+    return timings, results
+
+
+def main(args):
+    (
+        genepanels_data, td_data, signedoff_panels, gene_locus_type
+    ) = build_synthetic_data(args["nb_cis"], args["nb_genes"])
+    hgnc_dump = build_synthetic_hgnc_dump(args["nb_hgnc_genes"])
+
+    print(
+        f"Genepanels rows: {len(genepanels_data)}, "
+        f"test directory rows: {len(td_data)}, "
+        f"HGNC genes: {len(hgnc_dump)}"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        genepanels_file = Path(tmp_dir) / "genepanels.tsv"
+        genepanels_data.to_csv(
+            genepanels_file, sep="\t", header=False, index=False
+        )
+
+        timings = {}
+        results = {}
+
+        for name in backend.BACKENDS:
+            timings[name], results[name] = run_backend(
+                name, args["repeats"], genepanels_file, hgnc_dump, td_data,
+                signedoff_panels, gene_locus_type
+            )
+
+    # the backends give the same results
+    for stage, pandas_result in results["pandas"].items():
+        pyarrow_result = results["pyarrow"][stage]
+
+        if isinstance(pandas_result, tuple):
+            for pandas_df, pyarrow_df in zip(pandas_result, pyarrow_result):
+                pd.testing.assert_frame_equal(pandas_df, pyarrow_df)
+        else:
+            pd.testing.assert_frame_equal(pandas_result, pyarrow_result)
+
+    print(f"{'stage':<20}{'pandas':>10}{'pyarrow':>10}{'speedup':>10}")
+
+    for stage in timings["pandas"]:
+        pandas_time = timings["pandas"][stage]
+        pyarrow_time = timings["pyarrow"][stage]
+        print(
+            f"{stage:<20}{pandas_time:>9.3f}s{pyarrow_time:>9.3f}s"
+            f"{pandas_time / pyarrow_time:>9.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Benchmark the pandas and pyarrow backends on synthetic data"
+        )
+    )
+    parser.add_argument(
+        "--nb_cis", type=int, default=2000,
+        help="Number of clinical indications in the genepanels data"
+    )
+    parser.add_argument(
+        "--nb_genes", type=int, default=50, help="Number of genes per panel"
+    )
+    parser.add_argument(
+        "--nb_hgnc_genes", type=int, default=45000,
+        help="Number of genes in the HGNC dump"
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="Number of runs per stage"
+    )
+    args = vars(parser.parse_args())
+    main(args)
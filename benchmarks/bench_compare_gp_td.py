@@ -0,0 +1,249 @@
+""" Benchmark of checker.compare_gp_td against the previous implementation
+which merged one dict per test before building the output dataframes.
+
+Usage:
+    python benchmarks/bench_compare_gp_td.py --nb_cis 2000 --nb_genes 50
+"""
+
+import argparse
+from pathlib import Path
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).absolute().parents[1]))
+
+from test_directory_checker import checker, utils  # noqa: E402
+
+
+class SyntheticPanel:
+    """ Minimal stand-in for the Panelapp panel objects """
+
+    def __init__(self, genes: list, version: str):
+        self.genes = [{"hgnc_id": gene} for gene in genes]
+        self.version = version
+
+    def get_genes(self):
+        return self.genes
+
+    def get_version(self):
+        return self.version
+
+
+def build_synthetic_data(nb_cis: int, nb_genes: int, seed: int = 1):
+    """ Build a genepanels dataframe, the matching test directory data and
+    the panels with a mix of identical, replaced and removed tests
+
+    Args:
+        nb_cis (int): Number of clinical indications in the genepanels data
+        nb_genes (int): Number of genes per panel
+        seed (int, optional): Seed for the random generator. Defaults to 1.
+
+    Returns:
+        tuple: Genepanels dataframe, test directory dataframe, signedoff panels
+        and gene locus type dict
+    """
+
+    rng = random.Random(seed)
+    all_genes = [f"HGNC:{i}" for i in range(1, 20000)]
+
+    genepanels_rows = []
+    td_rows = []
+    signedoff_panels = {}
+
+    for i in range(nb_cis):
+        panel_id = i + 1
+        genes = rng.sample(all_genes, nb_genes)
+        signedoff_panels[panel_id] = SyntheticPanel(genes, "1.0")
+        gemini_name = f"R{i}.1_Clinical indication {i}_P"
+
+        for gene in genes:
+            genepanels_rows.append(
+                [gemini_name, f"Panel {i}_1.0", gene, panel_id]
+            )
+
+        case = i % 4
+
+        if case == 3:
+            # removed test
+            continue
+
+        # identical test, new test code or multiple new test codes
+        test_ids = {0: [f"R{i}.1"], 1: [f"R{i}.2"], 2: [f"R{i}.2", f"R{i}.3"]}
+
+        for test_id in test_ids[case]:
+            td_rows.append(
+                [
+                    test_id, f"Clinical indication {i}", f"Panel {i} ({panel_id})",
+                    [str(panel_id)], [], "WGS"
+                ]
+            )
+
+    genepanels_data = pd.DataFrame(
+        genepanels_rows, columns=["ci", "panel", "gene", "panelapp_id"]
+    )
+    td_data = pd.DataFrame(
+        td_rows, columns=[
+            "Test ID", "Clinical Indication", "Target/Genes",
+            "Identified panels", "Identified genes", "Test Method"
+        ]
+    )
+    gene_locus_type = {gene: True for gene in all_genes}
+
+    return genepanels_data, td_data, signedoff_panels, gene_locus_type
+
+
+def legacy_compare_gp_td(
+    td_data, genepanels_data, signedoff_panels, gene_locus_type,
+    blacklist_config
+):
+    """ Previous implementation of compare_gp_td merging one dict per test """
+
+    identical_tests_data = []
+    removed_tests_data = []
+    replaced_tests_data = []
+
+    for gemini_name in genepanels_data["ci"].unique():
+        if gemini_name.startswith("C"):
+            continue
+
+        data = {
+            "gemini_name": None, "panel": None, "genes": None, "td_ci": None,
+            "td_target": None, "td_genes": None, "removed": None, "added": None
+        }
+        data["gemini_name"] = gemini_name
+        r_code = gemini_name.split("_")[0]
+
+        data_for_r_code = genepanels_data[
+            genepanels_data["ci"] == gemini_name
+        ]
+        genepanels_genes = set(data_for_r_code["gene"].unique())
+
+        data["panel"] = ", ".join(data_for_r_code["panel"].unique())
+        data["genes"] = ", ".join(sorted(list(genepanels_genes)))
+
+        td_for_test_id = td_data[td_data["Test ID"] == r_code]
+
+        if td_for_test_id.shape[0] == 1:
+            data_for_test_id = utils.format_td_data(
+                td_for_test_id, genepanels_genes, signedoff_panels,
+                gene_locus_type, blacklist_config
+            )
+            data = {**data, **data_for_test_id}
+            identical_tests_data.append(data)
+
+        else:
+            td_for_r_code = td_data[
+                td_data["Test ID"].str.contains(f"^{r_code.split('.')[0]}\\.")
+            ]
+
+            if td_for_r_code.shape[0] == 0:
+                removed_tests_data.append(data.copy())
+
+            elif td_for_r_code.shape[0] == 1:
+                data_for_r_code = utils.format_td_data(
+                    td_for_r_code, genepanels_genes, signedoff_panels,
+                    gene_locus_type, blacklist_config
+                )
+                data = {**data, **data_for_r_code}
+                replaced_tests_data.append(data)
+
+            elif td_for_r_code.shape[0] >= 2:
+                for i, row in td_for_r_code.iterrows():
+                    retain_data = data
+                    df_for_row = row.to_frame().T
+                    data_for_row = utils.format_td_data(
+                        df_for_row, genepanels_genes, signedoff_panels,
+                        gene_locus_type, blacklist_config
+                    )
+                    retain_data = {**retain_data, **data_for_row}
+                    replaced_tests_data.append(retain_data)
+
+    columns = [
+        "gemini_name", "panel", "genes", "td_ci", "td_target", "td_version",
+        "td_genes", "removed", "added"
+    ]
+
+    return (
+        pd.DataFrame(identical_tests_data, columns=columns),
+        pd.DataFrame(
+            removed_tests_data, columns=["gemini_name", "panel", "genes"]
+        ),
+        pd.DataFrame(replaced_tests_data, columns=columns),
+    )
+
+
+def time_function(function, repeats: int, *args):
+    """ Run the function several times and return the best time and the
+    result of the last run
+
+    Args:
+        function (Callable): Function to time
+        repeats (int): Number of runs
+        *args: Arguments of the function
+
+    Returns:
+        tuple: Best time in seconds and result of the function
+    """
+
+    timings = []
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function(*args)
+        timings.append(time.perf_counter() - start)
+
+    return min(timings), result
+
+
+def main(args):
+    (
+        genepanels_data, td_data, signedoff_panels, gene_locus_type
+    ) = build_synthetic_data(args["nb_cis"], args["nb_genes"])
+    blacklist_config = {
+        "unaccessible_panelapp_panels": [], "genes_with_no_transcripts": []
+    }
+    function_args = (
+        td_data, genepanels_data, signedoff_panels, gene_locus_type,
+        blacklist_config
+    )
+
+    print(
+        f"Genepanels rows: {len(genepanels_data)}, "
+        f"test directory rows: {len(td_data)}"
+    )
+
+    legacy_time, legacy_results = time_function(
+        legacy_compare_gp_td, args["repeats"], *function_args
+    )
+    current_time, current_results = time_function(
+        checker.compare_gp_td, args["repeats"], *function_args
+    )
+
+    # the replaced tests also have the scores of the candidates
+    for legacy_df, current_df in zip(legacy_results, current_results):
+        pd.testing.assert_frame_equal(legacy_df, current_df[legacy_df.columns])
+
+    print(f"legacy compare_gp_td: {legacy_time:.3f}s")
+    print(f"current compare_gp_td: {current_time:.3f}s")
+    print(f"speedup: {legacy_time / current_time:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark compare_gp_td on synthetic genepanels data"
+    )
+    parser.add_argument(
+        "--nb_cis", type=int, default=2000,
+        help="Number of clinical indications in the genepanels data"
+    )
+    parser.add_argument(
+        "--nb_genes", type=int, default=50, help="Number of genes per panel"
+    )
+    parser.add_argument(
+        "--repeats", type=int, default=3, help="Number of runs per function"
+    )
+    args = vars(parser.parse_args())
+    main(args)
@@ -0,0 +1,39 @@
+import argparse
+from pathlib import Path
+
+from test_directory_checker import checker
+
+
+def main(args):
+    checker.export_db_snapshot(
+        args["db_user"], args["db_password"], args["db_name"],
+        args["db_type"], Path(args["output"])
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Export the genes and their clinical transcript status from the "
+            "database to a snapshot file that can be passed to main.py using "
+            "--db_snapshot"
+        )
+    )
+    parser.add_argument("db_user", help="Username of the database to export")
+    parser.add_argument(
+        "db_password", help="Username's password of the database to export"
+    )
+    parser.add_argument(
+        "db_name",
+        help="Name of the database to export or path to the SQLite database"
+    )
+    parser.add_argument(
+        "-t", "--db_type", help="Type of the database", default="mysql",
+        choices=["mysql", "sqlite"]
+    )
+    parser.add_argument(
+        "-o", "--output", help="Output snapshot file",
+        default="db_snapshot.npz"
+    )
+    args = vars(parser.parse_args())
+    main(args)
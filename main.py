@@ -1,33 +1,227 @@
 import argparse
+import asyncio
 from pathlib import Path
 import sys
 
 from panelapp import queries
+import pandas as pd
 
-from test_directory_checker import checker, utils, output
+from test_directory_checker import (
+    backend, checker, checkpoint, config, fuzzy, identify, logs, utils,
+    output, preflight, profiling, shard, store
+)
 
 
-def main(args):
-    ### setup logic ###
+def get_file_compression(args: dict) -> str:
+    """ Get the compression of the output files. When the run folder is
+    bundled, the whole bundle is compressed instead of every file
 
-    command_line = " ".join(sys.argv)
+    Args:
+        args (dict): Command line arguments
+
+    Returns:
+        str: Compression of the output files or None
+    """
+
+    if args["bundle"]:
+        return None
+
+    return args["compress"]
+
+
+def compare_gp_td_data(
+    args: dict, target_data: pd.DataFrame, signedoff_panels: dict,
+    gene_locus_type: dict, blacklist_config: dict, output_folder: Path,
+    gene_table: pd.DataFrame
+) -> tuple:
+    """ Compare the genepanels data to the test directory data and find the
+    new clinical indications. In streaming mode, the comparison results are
+    appended to the output folder as they are computed and None is returned
+    for them
+
+    Args:
+        args (dict): Command line arguments
+        target_data (pd.DataFrame): Dataframe with the test directory data
+        signedoff_panels (dict): Dict containing the signedoff panels
+        gene_locus_type (dict): Dict containing the genes and whether we
+        capture them according to their locus type
+        blacklist_config (dict): Dict containing blacklisted panel IDs or genes
+        output_folder (Path): Output folder of the run
+        gene_table (pd.DataFrame): Gene table of the test directory
+
+    Returns:
+        tuple: Identical, removed and replaced tests, the new clinical
+        indications and the genepanels data, which isn't kept in streaming mode
+    """
+
+    if args["chunksize"]:
+        # remove the results appended by an interrupted run that is resumed
+        for output_name in [
+            "identical_tests.tsv", "removed_tests.tsv", "replaced_tests.tsv"
+        ]:
+            output.get_compressed_path(
+                output_folder / output_name, get_file_compression(args)
+            ).unlink(missing_ok=True)
+
+        # stream the genepanels file and append the comparison results of
+        # every chunk to the output files
+        genepanels_cis = []
+
+        for (
+            genepanels_chunk, identical_tests, removed_tests, replaced_tests
+        ) in checker.compare_gp_td_in_chunks(
+            target_data,
+            utils.parse_genepanels_in_chunks(
+                args["genepanels"], args["chunksize"]
+            ),
+            signedoff_panels, gene_locus_type, blacklist_config, gene_table
+        ):
+            output.append_table(
+                identical_tests, "identical_tests.tsv", output_folder,
+                get_file_compression(args)
+            )
+            output.append_table(
+                removed_tests, "removed_tests.tsv", output_folder,
+                get_file_compression(args)
+            )
+            output.append_table(
+                replaced_tests, "replaced_tests.tsv", output_folder,
+                get_file_compression(args)
+            )
+            genepanels_cis.extend(genepanels_chunk["ci"].unique())
+
+        # only the clinical indications are needed to find the new ones
+        genepanels_cis = pd.DataFrame({"ci": genepanels_cis})
+        identical_tests, removed_tests, replaced_tests = None, None, None
+        genepanels_data = None
+
+    else:
+        genepanels_data = utils.parse_genepanels(args["genepanels"])
+
+        if args["shard"]:
+            genepanels_data = shard.select_genepanels_shard(
+                genepanels_data, *shard.parse_shard(args["shard"])
+            )
+
+        genepanels_cis = genepanels_data
+
+        # compare the genepanels data to the test directory data
+        (
+            identical_tests, removed_tests, replaced_tests
+        ) = checker.compare_gp_td(
+            target_data, genepanels_data, signedoff_panels, gene_locus_type,
+            blacklist_config, gene_table
+        )
+
+    # find the new clinical indications in the test directory
+    new_cis = checker.find_new_clinical_indications(
+        target_data, genepanels_cis
+    )
+
+    return (
+        identical_tests, removed_tests, replaced_tests, new_cis,
+        genepanels_data
+    )
+
+
+async def compare_and_check_db(
+    args: dict, genes_to_check: set, run_folder: Path, comparison_hash: str,
+    db_hash: str, *comparison_args
+) -> tuple:
+    """ Check the presence of the genes in the database, or in the database
+    snapshot if one is given, while the comparison runs in a separate thread.
+    Both stages are loaded from their checkpoint if it exists
+
+    Args:
+        args (dict): Command line arguments
+        genes_to_check (set): Genes to check in the database
+        run_folder (Path): Output folder of the run
+        comparison_hash (str): Hash of the inputs of the comparison
+        db_hash (str): Hash of the inputs of the database check
+        *comparison_args: Arguments passed to compare_gp_td_data
+
+    Returns:
+        tuple: Identical, removed and replaced tests, the new clinical
+        indications, the genepanels data and the presence of the genes in the
+        database
+    """
+
+    if args["db_snapshot"]:
+        # the snapshot doesn't need a connection to the database
+        db_check = asyncio.to_thread(
+            checkpoint.run_stage, run_folder, "presence_in_db", db_hash,
+            checker.check_if_genes_present_in_snapshot, args["db_snapshot"],
+            genes_to_check
+        )
+    else:
+        db_check = checkpoint.run_async_stage(
+            run_folder, "presence_in_db", db_hash,
+            checker.check_if_genes_present_in_db_async, args["db_user"],
+            args["db_password"], args["db_name"], "mysql", genes_to_check
+        )
+
+    comparison_results, presence_db_df = await asyncio.gather(
+        asyncio.to_thread(
+            checkpoint.run_stage, run_folder, "comparison", comparison_hash,
+            compare_gp_td_data, args, *comparison_args
+        ),
+        db_check
+    )
+
+    return (*comparison_results, presence_db_df)
+
+
+def parse_inputs(args: dict, td_config: dict) -> tuple:
+    """ Parse the test directory and the HGNC dump and get the signedoff
+    panels from Panelapp
+
+    Args:
+        args (dict): Command line arguments
+        td_config (dict): Test directory parser config
+
+    Returns:
+        tuple: Test directory data, HGNC data and signedoff panels
+    """
 
-    td_config = utils.load_config(args["config"])
-    blacklist_config = utils.load_config("configs/blacklist.json")
     td_data = utils.parse_td(args["test_directory"], td_config)
     hgnc_data = utils.parse_hgnc_dump(args["hgnc_dump"])
-    genepanels_data = utils.parse_genepanels(args["genepanels"])
     signedoff_panels = queries.get_all_signedoff_panels()
 
-    ### processing logic ###
+    return td_data, hgnc_data, signedoff_panels
 
-    target_data = td_data.apply(
-        lambda row: checker.check_target(row, hgnc_data), axis=1
-    )
+
+def check_td_data(
+    td_data: pd.DataFrame, hgnc_data: pd.DataFrame, td_config: dict
+) -> tuple:
+    """ Check the targets and test methods of the test directory
+
+    Args:
+        td_data (pd.DataFrame): Dataframe with the test directory data
+        hgnc_data (pd.DataFrame): Dataframe with the HGNC data
+        td_config (dict): Test directory parser config
+
+    Returns:
+        tuple: Symbol table, target data, test method data, new test methods
+        and unresolved symbols
+    """
+
+    # build the long table of approved/previous/alias symbols once
+    symbol_table = identify.build_symbol_table(hgnc_data)
+
+    target_data = checker.check_targets(td_data, hgnc_data, symbol_table)
+
+    # look for the closest configured test methods to the new test methods
+    test_method_index = fuzzy.TrigramIndex(td_config["ngs_test_methods"])
     test_method_data = td_data.apply(
-        lambda row: checker.check_test_method(row, td_config), axis=1
+        lambda row: checker.check_test_method(
+            row, td_config, test_method_index
+        ), axis=1
     )
 
+    # look for the closest HGNC symbols to the symbols that weren't resolved
+    # and for the symbols mapping to several HGNC ids
+    unresolved_symbols = checker.find_unresolved_symbols(td_data, symbol_table)
+
     target_data = target_data.reindex(
         columns=[
             "Test ID", "Clinical Indication", "Target/Genes",
@@ -39,109 +233,324 @@ def main(args):
     test_method_data = test_method_data.reindex(
         columns=[
             "Test ID", "Clinical Indication", "Test Method",
-            "Potential new test methods"
+            "Potential new test methods", "Closest test methods"
         ]
     )
     # sort test method df to be test method --> test codes
     reformatted_test_method_data = test_method_data.groupby(
         "Test Method"
-    )["Test ID"].apply(list)
+    ).agg({"Test ID": list, "Closest test methods": "first"})
 
     # look for test methods not present in the ngs_test_methods in the config
     new_test_methods = reformatted_test_method_data[
         ~reformatted_test_method_data.index.isin(td_config["ngs_test_methods"])
     ]
 
-    # setup the locus status dict
-    gene_locus_type = utils.get_locus_status_genes(
-        target_data, signedoff_panels, hgnc_data, blacklist_config
+    return (
+        symbol_table, target_data, test_method_data, new_test_methods,
+        unresolved_symbols
     )
 
-    # compare the genepanels data to the test directory data
-    (
-        identical_tests, removed_tests, replaced_tests
-    ) = checker.compare_gp_td(
-        target_data, genepanels_data, signedoff_panels, gene_locus_type,
-        blacklist_config
+
+def get_td_panel_ids(
+    target_data: pd.DataFrame, blacklist_config: dict
+) -> set:
+    """ Get the Panelapp IDs of the panels used by the test directory
+
+    Args:
+        target_data (pd.DataFrame): Dataframe with the test directory data
+        blacklist_config (dict): Dict containing blacklisted panel IDs or genes
+
+    Returns:
+        set: Set of the Panelapp IDs which are accessible through the API
+    """
+
+    return {
+        panel
+        for panels in target_data["Identified panels"]
+        for panel in panels
+        if panel not in blacklist_config["unaccessible_panelapp_panels"]
+    }
+
+
+def check_panel_changes(
+    store_path: Path, signedoff_panels: dict, target_data: pd.DataFrame,
+    blacklist_config: dict, write_versions: bool = True
+) -> pd.DataFrame:
+    """ Compare the panels used in the test directory to the versions stored
+    in previous runs and keep the current versions for the next runs
+
+    Args:
+        store_path (Path): Path to the SQLite store
+        signedoff_panels (dict): Dict containing the signedoff panels
+        target_data (pd.DataFrame): Dataframe with the test directory data
+        blacklist_config (dict): Dict containing blacklisted panel IDs or genes
+        write_versions (bool, optional): Whether to write the current versions
+        in the store. Defaults to True
+
+    Returns:
+        pd.DataFrame: Dataframe with the changed panels and the tests using
+        them
+    """
+
+    td_panel_ids = get_td_panel_ids(target_data, blacklist_config)
+    panel_changes = store.get_panel_changes(
+        store_path, signedoff_panels, td_panel_ids
     )
 
-    # find the new clinical indications in the test directory
-    new_cis = checker.find_new_clinical_indications(
-        target_data, genepanels_data
+    if write_versions:
+        store.write_panel_versions(store_path, signedoff_panels, td_panel_ids)
+
+    # only the tests using the changed panels are affected by the changes
+    panel_changes["tests"] = [
+        ", ".join(
+            utils.get_tests_using_panels(target_data, [panel_id])["Test ID"]
+        )
+        for panel_id in panel_changes["panel_id"]
+    ]
+
+    return panel_changes
+
+
+def get_td_genes(
+    target_data: pd.DataFrame, signedoff_panels: dict,
+    hgnc_data: pd.DataFrame, blacklist_config: dict
+) -> tuple:
+    """ Get the genes of the tests and their locus status
+
+    Args:
+        target_data (pd.DataFrame): Dataframe with the test directory data
+        signedoff_panels (dict): Dict containing the signedoff panels
+        hgnc_data (pd.DataFrame): Dataframe with the HGNC data
+        blacklist_config (dict): Dict containing blacklisted panel IDs or genes
+
+    Returns:
+        tuple: Gene table, locus status of the genes and genes to check in the
+        database
+    """
+
+    # build the long table of the genes of every test once
+    gene_table = utils.build_td_gene_table(
+        target_data, signedoff_panels, blacklist_config, hgnc_data
     )
 
-    # sort data from the dataframes using the same columns
-    for df in [new_cis, target_data, test_method_data]:
-        df.sort_values(["Test Method", "Test ID"], inplace=True)
+    # setup the locus status dict
+    gene_locus_type = utils.get_locus_status_genes(
+        target_data, signedoff_panels, hgnc_data, blacklist_config, gene_table
+    )
 
     # get all the genes to check in the database from the target dataframe
     genes_to_check = utils.get_genes_from_td_target(
-        target_data, signedoff_panels, gene_locus_type, blacklist_config
+        target_data, signedoff_panels, gene_locus_type, blacklist_config,
+        gene_table
     )
 
-    # check the presence of genes and clinical transcript in the given database
-    presence_db_df = checker.check_if_genes_present_in_db(
-        args["db_user"], args["db_password"], args["db_name"], "mysql",
-        genes_to_check
-    )
+    return gene_table, gene_locus_type, genes_to_check
 
-    ### output logic ###
+
+def main(args):
+    ### setup logic ###
+
+    command_line = " ".join(sys.argv)
+
+    logs.setup_logging(args["log_level"], args["json_log"])
+
+    if args["profile"] or args["profile_trace"]:
+        profiling.PROFILER.enabled = True
+
+    backend.set_backend(args["backend"])
+
+    # the inputs are checked before the output folder is created and the
+    # stages are run
+    preflight.check_inputs(args, "configs/blacklist.json")
+
+    # the configs are validated before any input is parsed
+    td_config = utils.load_config(args["config"])
+    blacklist_config = utils.load_config(
+        "configs/blacklist.json", config.BlacklistConfig
+    )
 
     output_folder = Path(args["output"])
 
-    created_output_folder = output.mkdir_output_folder(output_folder)
+    if args["resume"]:
+        # the stages that have a checkpoint in the run folder and which inputs
+        # didn't change are not run again
+        created_output_folder = Path(args["resume"])
+        output_folder = created_output_folder.parent
+
+        assert created_output_folder.is_dir(), (
+            f"{created_output_folder} is not a folder"
+        )
+    else:
+        created_output_folder = output.mkdir_output_folder(output_folder)
+
     output.log_command_line(created_output_folder, command_line)
 
-    # filter tests have None in both the removed and added columns
-    filtered_df = utils.filter_out_df(
-        identical_tests, removed=None, added=None
+    if args["store"]:
+        store_path = Path(args["store"])
+    else:
+        store_path = output_folder / "results.db"
+
+    # inputs of the run hashed in the store
+    run_inputs = {
+        "test_directory": args["test_directory"],
+        "hgnc_dump": args["hgnc_dump"],
+        "genepanels": args["genepanels"],
+        "config": args["config"],
+        "blacklist_config": "configs/blacklist.json",
+        "db_snapshot": args["db_snapshot"],
+    }
+
+    # the hash of every stage includes the hash of the stages it depends on
+    inputs_hash = checkpoint.get_stage_hash(
+        files=[args["test_directory"], args["hgnc_dump"], args["config"]]
     )
-    output.output_table(
-        identical_tests, "identical_tests.html", created_output_folder, filtered_df
+    targets_hash = checkpoint.get_stage_hash(
+        inputs_hash, values=[args["shard"]]
+    )
+    panel_changes_hash = checkpoint.get_stage_hash(
+        targets_hash, files=["configs/blacklist.json"],
+        values=[str(store_path)]
+    )
+    genes_hash = checkpoint.get_stage_hash(
+        targets_hash, files=["configs/blacklist.json"]
+    )
+    comparison_hash = checkpoint.get_stage_hash(
+        genes_hash, files=[args["genepanels"]],
+        values=[args["chunksize"], get_file_compression(args)]
+    )
+    db_hash = checkpoint.get_stage_hash(
+        genes_hash, files=[args["db_snapshot"]],
+        values=[args["db_user"], args["db_name"]]
     )
 
-    output.output_table(removed_tests, "removed_tests.html", created_output_folder)
-
-    # filter out tests have None in both the removed and added columns
-    filtered_df = utils.filter_out_df(replaced_tests, removed=None, added=None)
-    output.output_table(
-        replaced_tests, "replaced_tests.html", created_output_folder, filtered_df
+    td_data, hgnc_data, signedoff_panels = checkpoint.run_stage(
+        created_output_folder, "inputs", inputs_hash, parse_inputs, args,
+        td_config
     )
 
-    # filter out tests that have empty lists in the Identified panels and
-    # Identified genes
-    filtered_df = target_data.loc[
-        (
-            target_data["Identified panels"].str.len() == 0
-        ) &
-        (
-            target_data["Identified genes"].str.len() == 0
+    if args["shard"]:
+        # only the tests of the clinical indication codes of the shard are
+        # checked
+        td_data = shard.select_td_shard(
+            td_data, *shard.parse_shard(args["shard"])
         )
-    ]
-    output.output_table(
-        target_data, "targets.html", created_output_folder, filtered_df
+
+    ### processing logic ###
+
+    (
+        symbol_table, target_data, test_method_data, new_test_methods,
+        unresolved_symbols
+    ) = checkpoint.run_stage(
+        created_output_folder, "targets", targets_hash, check_td_data,
+        td_data, hgnc_data, td_config
     )
 
-    # filter out tests that have an empty string in the Potential new test
-    # methods column
-    output.output_test_methods(
-        new_test_methods, "test_methods.html", created_output_folder
+    # the shards are written in the store by merge_shards.py once merged
+    panel_changes = checkpoint.run_stage(
+        created_output_folder, "panel_changes", panel_changes_hash,
+        check_panel_changes, store_path, signedoff_panels, target_data,
+        blacklist_config, not args["shard"]
     )
 
-    # filter to get tests that have False in the presence_in_db or
-    # has_clinical_transcript columns
-    filtered_df = presence_db_df[
-        (
-            ~presence_db_df["presence_in_db"]
-        ) |
-        (
-            ~presence_db_df["has_clinical_transcript"]
+    gene_table, gene_locus_type, genes_to_check = checkpoint.run_stage(
+        created_output_folder, "genes", genes_hash, get_td_genes, target_data,
+        signedoff_panels, hgnc_data, blacklist_config
+    )
+
+    # check the presence of genes and clinical transcript in the given database
+    # while comparing the genepanels data to the test directory data
+    (
+        identical_tests, removed_tests, replaced_tests, new_cis,
+        genepanels_data, presence_db_df
+    ) = asyncio.run(
+        compare_and_check_db(
+            args, genes_to_check, created_output_folder, comparison_hash,
+            db_hash, target_data, signedoff_panels, gene_locus_type,
+            blacklist_config, created_output_folder, gene_table
         )
-    ]
-    output.output_table(
-        presence_db_df, "presence_in_db.html", created_output_folder, filtered_df
     )
 
+    # sort data from the dataframes using the same columns
+    for df in [new_cis, target_data, test_method_data]:
+        df.sort_values(["Test Method", "Test ID"], inplace=True)
+
+    ### output logic ###
+
+    if args["shard"]:
+        # keep the results of the shard for merge_shards.py
+        shard.write_shard_results(
+            created_output_folder, *shard.parse_shard(args["shard"]), {
+                "identical_tests": identical_tests,
+                "removed_tests": removed_tests,
+                "replaced_tests": replaced_tests,
+                "ci_positions": shard.get_ci_positions(genepanels_data),
+                "new_cis": new_cis,
+                "targets": target_data,
+                "test_methods": test_method_data,
+                "new_test_methods": new_test_methods,
+                "presence_in_db": presence_db_df,
+                "panel_changes": panel_changes,
+                "unresolved_symbols": unresolved_symbols,
+                # data written in the store by merge_shards.py
+                "panels": {
+                    int(panel_id): signedoff_panels[int(panel_id)]
+                    for panel_id in get_td_panel_ids(
+                        target_data, blacklist_config
+                    )
+                },
+                "gene_table": gene_table,
+                "symbol_table": symbol_table,
+                "genepanels": genepanels_data,
+                # the inputs are hashed by the shard as they can be missing
+                # where the shards are merged
+                "inputs": run_inputs,
+                "input_hashes": store.get_input_hashes(run_inputs),
+            }
+        )
+
+    # the reports are independent so they are rendered concurrently
+    reports = output.get_reports(
+        created_output_folder, target_data, new_test_methods, presence_db_df,
+        panel_changes, unresolved_symbols, identical_tests, removed_tests,
+        replaced_tests
+    )
+    output.output_reports(reports, get_file_compression(args))
+
+    # a shard is only a part of a run, merge_shards.py stores the whole run
+    if not args["shard"]:
+        # store the result tables of the run along with the hashes of the
+        # inputs
+        run_id = store.write_run(
+            store_path, created_output_folder, command_line, run_inputs,
+            tables={
+                "targets": target_data,
+                "test_methods": test_method_data,
+                "identical_tests": identical_tests,
+                "removed_tests": removed_tests,
+                "replaced_tests": replaced_tests,
+                "presence_in_db": presence_db_df,
+            }
+        )
+
+        # index the genes to answer which tests contain a gene with
+        # query_gene.py, the genepanels data isn't kept in streaming mode
+        store.write_gene_index(
+            store_path, run_id, gene_table, symbol_table, genepanels_data
+        )
+
+    # the checkpoints are only needed to resume a run that failed
+    checkpoint.remove_checkpoints(created_output_folder)
+
+    if profiling.PROFILER.enabled:
+        profiling.PROFILER.log_summary()
+
+        if args["profile_trace"]:
+            profiling.PROFILER.export_chrome_trace(args["profile_trace"])
+
+    if args["bundle"]:
+        output.bundle_output_folder(created_output_folder, args["compress"])
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -162,11 +571,23 @@ if __name__ == "__main__":
         help="Genepanels file to compare against the provided test directory"
     )
 
-    parser.add_argument("db_user", help="Username of the database to check")
     parser.add_argument(
-        "db_password", help="Username's password of the database to check"
+        "db_user", nargs="?", help="Username of the database to check"
+    )
+    parser.add_argument(
+        "db_password", nargs="?",
+        help="Username's password of the database to check"
+    )
+    parser.add_argument(
+        "db_name", nargs="?", help="Name of the database to check"
+    )
+    parser.add_argument(
+        "--db_snapshot",
+        help=(
+            "Snapshot of the database created with export_db_snapshot.py to "
+            "use instead of the database credentials"
+        )
     )
-    parser.add_argument("db_name", help="Name of the database to check")
 
     parser.add_argument(
         "-c", "--config", help="Test directory parser config file",
@@ -175,5 +596,104 @@ if __name__ == "__main__":
     parser.add_argument(
         "-o", "--output", help="Output folder", default="td_checker_output"
     )
+    parser.add_argument(
+        "-s", "--store",
+        help=(
+            "SQLite store where the results of every run are kept, defaults "
+            "to results.db in the output folder"
+        )
+    )
+    parser.add_argument(
+        "--chunksize", type=int, default=None,
+        help=(
+            "Stream the genepanels file by chunks of N rows to keep memory "
+            "usage bounded. The genepanels file needs to be sorted by clinical "
+            "indication and the comparison results are appended to TSV files "
+            "instead of being output as HTML"
+        )
+    )
+    parser.add_argument(
+        "--resume",
+        help=(
+            "Output folder of a previous run to resume. The stages which "
+            "inputs didn't change are loaded from the checkpoints written in "
+            "that folder instead of being run again"
+        )
+    )
+    parser.add_argument(
+        "--shard",
+        help=(
+            "Only check the tests and clinical indications of the i/N shard "
+            "e.g. 2/4, split using their clinical indication code. The results "
+            "of the shards are merged with merge_shards.py"
+        )
+    )
+    parser.add_argument(
+        "--compress", choices=list(output.COMPRESSION_EXTENSIONS),
+        help=(
+            "Compress the reports and data files of the run. zstd requires "
+            "the zstandard package"
+        )
+    )
+    parser.add_argument(
+        "--bundle", action="store_true", default=False,
+        help=(
+            "Bundle the output folder of the run in a single tar file, "
+            "compressed as a whole if --compress is given"
+        )
+    )
+    parser.add_argument(
+        "--backend", choices=backend.BACKENDS, default=backend.get_backend(),
+        help=(
+            "Backend of the dataframe stages, pyarrow parses the genepanels "
+            "file, builds the symbol table, groups the genepanels data and "
+            "filters the reports with Arrow. Defaults to the "
+            f"{backend.BACKEND_ENV_VARIABLE} environment variable or pandas"
+        )
+    )
+    parser.add_argument(
+        "--log_level", default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Minimum level of the logged messages"
+    )
+    parser.add_argument(
+        "--json_log",
+        help=(
+            "Also write the logged messages to this file as JSON lines, "
+            "including the time taken and the rows/s of every stage"
+        )
+    )
+    parser.add_argument(
+        "--profile", action="store_true", default=False,
+        help=(
+            "Log the number of calls and the time spent in the main "
+            "functions at the end of the run. Can also be turned on by setting "
+            f"the {profiling.PROFILING_ENV_VARIABLE} environment variable"
+        )
+    )
+    parser.add_argument(
+        "--profile_trace",
+        help=(
+            "Write the profiled calls to this JSON file in the Chrome trace "
+            "format (implies --profile)"
+        )
+    )
     args = vars(parser.parse_args())
+
+    if not output.is_compression_available(args["compress"]):
+        parser.error(
+            "--compress zstd requires the zstandard package to be installed"
+        )
+
+    if not args["db_snapshot"] and not all(
+        args[arg] for arg in ["db_user", "db_password", "db_name"]
+    ):
+        parser.error(
+            "the database credentials are required if --db_snapshot is not "
+            "given"
+        )
+
+    if args["shard"] and (args["chunksize"] or args["bundle"]):
+        parser.error("--shard can't be combined with --chunksize or --bundle")
+
     main(args)
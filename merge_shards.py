@@ -0,0 +1,107 @@
+import argparse
+from pathlib import Path
+import sys
+
+from test_directory_checker import logs, output, shard, store
+
+
+def main(args):
+    command_line = " ".join(sys.argv)
+
+    logs.setup_logging()
+
+    output_folder = Path(args["output"])
+    created_output_folder = output.mkdir_output_folder(output_folder)
+    output.log_command_line(created_output_folder, command_line)
+
+    if args["store"]:
+        store_path = Path(args["store"])
+    else:
+        store_path = output_folder / "results.db"
+
+    results = shard.merge_shard_results(
+        shard.load_shard_results(args["shard_results"])
+    )
+
+    compression = None if args["bundle"] else args["compress"]
+
+    reports = output.get_reports(
+        created_output_folder, results["targets"], results["new_test_methods"],
+        results["presence_in_db"], results["panel_changes"],
+        results["unresolved_symbols"], results["identical_tests"],
+        results["removed_tests"], results["replaced_tests"]
+    )
+    output.output_reports(reports, compression)
+
+    # the shards are stored as a single run with the inputs hashed by the
+    # shards
+    store.write_panel_versions(
+        store_path, results["panels"], results["panels"].keys()
+    )
+    run_id = store.write_run(
+        store_path, created_output_folder, command_line, results["inputs"],
+        tables={
+            "targets": results["targets"],
+            "test_methods": results["test_methods"],
+            "identical_tests": results["identical_tests"],
+            "removed_tests": results["removed_tests"],
+            "replaced_tests": results["replaced_tests"],
+            "presence_in_db": results["presence_in_db"],
+        },
+        input_hashes=results["input_hashes"]
+    )
+    store.write_gene_index(
+        store_path, run_id, results["gene_table"], results["symbol_table"],
+        results["genepanels"]
+    )
+
+    if args["bundle"]:
+        output.bundle_output_folder(created_output_folder, args["compress"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Merge the results of the shards of a run of main.py with --shard "
+            "and output the reports of the whole run"
+        )
+    )
+    parser.add_argument(
+        "shard_results", nargs="+",
+        help=(
+            "shard_i_of_N.pkl files written in the output folders of the "
+            "shards, one per shard"
+        )
+    )
+    parser.add_argument(
+        "-o", "--output", help="Output folder", default="td_checker_output"
+    )
+    parser.add_argument(
+        "-s", "--store",
+        help=(
+            "SQLite store where the merged run is kept, defaults to results.db "
+            "in the output folder"
+        )
+    )
+    parser.add_argument(
+        "--compress", choices=list(output.COMPRESSION_EXTENSIONS),
+        help=(
+            "Compress the reports of the run. zstd requires the zstandard "
+            "package"
+        )
+    )
+    parser.add_argument(
+        "--bundle", action="store_true", default=False,
+        help=(
+            "Bundle the output folder of the run in a single tar file, "
+            "compressed as a whole if --compress is given"
+        )
+    )
+    args = vars(parser.parse_args())
+
+    if not output.is_compression_available(args["compress"]):
+        parser.error(
+            "--compress zstd requires the zstandard package to be installed"
+        )
+
+    main(args)
@@ -0,0 +1,36 @@
+import argparse
+from pathlib import Path
+
+from test_directory_checker import store
+
+
+def main(args):
+    for gene in args["genes"]:
+        entries = store.query_gene(Path(args["store"]), gene)
+
+        if entries.empty:
+            print(f"{gene}: not found in the index")
+        else:
+            print(entries.to_string(index=False))
+
+        print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Get the tests of the test directory and the clinical indications "
+            "of the genepanels file containing the given genes using the "
+            "index written by the latest run of main.py"
+        )
+    )
+    parser.add_argument(
+        "genes", nargs="+",
+        help="HGNC IDs or approved, previous or alias symbols of the genes"
+    )
+    parser.add_argument(
+        "-s", "--store", help="SQLite store of main.py",
+        default="td_checker_output/results.db"
+    )
+    args = vars(parser.parse_args())
+    main(args)
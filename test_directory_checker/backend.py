@@ -0,0 +1,139 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import compute as pc
+
+# environment variable to select the backend without the command line option
+BACKEND_ENV_VARIABLE = "TD_CHECKER_BACKEND"
+
+# "pandas" runs the dataframe stages with pandas object columns, "pyarrow"
+# runs them on Arrow arrays with the multithreaded pyarrow readers and compute
+# functions. The functions using the backend take and return the same pandas
+# objects whatever the backend
+BACKENDS = ("pandas", "pyarrow")
+
+_backend = os.environ.get(BACKEND_ENV_VARIABLE, "pandas")
+
+assert _backend in BACKENDS, (
+    f"{BACKEND_ENV_VARIABLE} should be one of {', '.join(BACKENDS)}"
+)
+
+
+def set_backend(backend: str):
+    """ Set the backend used by the dataframe stages
+
+    Args:
+        backend (str): "pandas" or "pyarrow"
+    """
+
+    global _backend
+
+    assert backend in BACKENDS, (
+        f"'{backend}' should be one of {', '.join(BACKENDS)}"
+    )
+
+    _backend = backend
+
+
+def get_backend() -> str:
+    """ Get the backend used by the dataframe stages
+
+    Returns:
+        str: "pandas" or "pyarrow"
+    """
+
+    return _backend
+
+
+def use_arrow() -> bool:
+    """ Get whether the dataframe stages run with the pyarrow backend
+
+    Returns:
+        bool: True if the backend is pyarrow
+    """
+
+    return _backend == "pyarrow"
+
+
+def to_arrow(df: pd.DataFrame, columns: list = None) -> pa.Table:
+    """ Convert the columns of a dataframe to an Arrow table with a single
+    chunk per column. None and NaN become nulls
+
+    Args:
+        df (pd.DataFrame): Dataframe to convert
+        columns (list, optional): Columns to convert. Defaults to None i.e.
+        all the columns
+
+    Returns:
+        pa.Table: Arrow table without the index of the dataframe
+    """
+
+    if columns is not None:
+        df = df[columns]
+
+    return pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+
+
+def to_pandas(table: pa.Table) -> pd.DataFrame:
+    """ Convert an Arrow table to a dataframe with numpy columns, nulls in the
+    string columns are converted to None
+
+    Args:
+        table (pa.Table): Arrow table to convert
+
+    Returns:
+        pd.DataFrame: Dataframe with a default index
+    """
+
+    return table.to_pandas()
+
+
+def to_numpy(array) -> np.ndarray:
+    """ Convert an Arrow array or chunked array to a numpy array, strings are
+    converted to Python objects
+
+    Args:
+        array (pa.Array | pa.ChunkedArray): Arrow array
+
+    Returns:
+        np.ndarray: Numpy array
+    """
+
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+
+    return array.to_numpy(zero_copy_only=False)
+
+
+def get_filter_mask(series: pd.Series, value) -> np.ndarray:
+    """ Get the mask of the rows to keep when filtering out a value of a
+    column using the Arrow compute functions. Missing values are filtered out
+    if value is None, otherwise they are kept like with pandas
+
+    Args:
+        series (pd.Series): Column to filter
+        value: Value to filter out or None for missing values
+
+    Returns:
+        np.ndarray: Boolean array of the rows to keep
+    """
+
+    try:
+        array = pa.array(series, from_pandas=True)
+
+        if value is None:
+            mask = pc.is_valid(array)
+        else:
+            mask = pc.fill_null(pc.not_equal(array, value), True)
+
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # columns Arrow can't represent or compare to the value e.g. mixed
+        # types are filtered with pandas
+        if value is None:
+            return series.notna().to_numpy()
+
+        return (series != value).to_numpy()
+
+    return to_numpy(mask)
@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import os
+from pathlib import Path
+import pickle
+import shutil
+import time
+from typing import Callable, Iterable
+
+from test_directory_checker.logs import count_rows, get_throughput
+from test_directory_checker.utils import get_file_hash
+
+logger = logging.getLogger(__name__)
+
+# folder of the run folder where the checkpoints are written
+CHECKPOINT_FOLDER = "checkpoints"
+
+
+def get_stage_hash(
+    previous_hash: str = None, files: Iterable = (), values: Iterable = ()
+) -> str:
+    """ Get the hash of the inputs of a stage. Stages depending on previous
+    stages include the hash of the previous stage so that a change in the
+    inputs of a stage invalidates the stages after it
+
+    Args:
+        previous_hash (str, optional): Hash of the previous stage. Defaults to
+        None
+        files (Iterable, optional): Input files of the stage, None for inputs
+        that weren't given. Defaults to ()
+        values (Iterable, optional): Other inputs of the stage e.g. command
+        line arguments. Defaults to ()
+
+    Returns:
+        str: SHA256 of the inputs
+    """
+
+    stage_hash = hashlib.sha256(str(previous_hash).encode())
+
+    for file in files:
+        stage_hash.update(str(file and get_file_hash(file)).encode())
+
+    for value in values:
+        stage_hash.update(repr(value).encode())
+
+    return stage_hash.hexdigest()
+
+
+def get_checkpoint_path(run_folder: Path, stage: str) -> Path:
+    """ Get the path of the checkpoint of a stage
+
+    Args:
+        run_folder (Path): Output folder of the run
+        stage (str): Name of the stage
+
+    Returns:
+        Path: Path to the checkpoint
+    """
+
+    return Path(run_folder) / CHECKPOINT_FOLDER / f"{stage}.pkl"
+
+
+def write_checkpoint(run_folder: Path, stage: str, stage_hash: str, data):
+    """ Write the result of a stage along with the hash of its inputs
+
+    Args:
+        run_folder (Path): Output folder of the run
+        stage (str): Name of the stage
+        stage_hash (str): Hash of the inputs of the stage
+        data: Result of the stage
+    """
+
+    checkpoint = get_checkpoint_path(run_folder, stage)
+    checkpoint.parent.mkdir(exist_ok=True)
+    tmp_checkpoint = checkpoint.with_name(f".{checkpoint.name}.tmp")
+
+    with open(tmp_checkpoint, "wb") as f:
+        pickle.dump(
+            {"stage_hash": stage_hash, "data": data}, f,
+            protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+    # the checkpoint is only complete once moved
+    os.replace(tmp_checkpoint, checkpoint)
+
+
+def remove_checkpoints(run_folder: Path):
+    """ Remove the checkpoints of a run once all its stages are done so that
+    the intermediate results are not kept in the run folder and its bundle
+
+    Args:
+        run_folder (Path): Output folder of the run
+    """
+
+    shutil.rmtree(Path(run_folder) / CHECKPOINT_FOLDER, ignore_errors=True)
+
+
+def load_checkpoint(run_folder: Path, stage: str, stage_hash: str) -> tuple:
+    """ Load the result of a stage if its checkpoint exists and the hash of
+    its inputs still matches
+
+    Args:
+        run_folder (Path): Output folder of the run
+        stage (str): Name of the stage
+        stage_hash (str): Hash of the current inputs of the stage
+
+    Returns:
+        tuple: Tuple containing whether the checkpoint was loaded and the
+        result of the stage
+    """
+
+    checkpoint = get_checkpoint_path(run_folder, stage)
+
+    if not checkpoint.exists():
+        return False, None
+
+    with open(checkpoint, "rb") as f:
+        data = pickle.load(f)
+
+    if data["stage_hash"] != stage_hash:
+        return False, None
+
+    logger.info(
+        "Loaded the '%s' stage from %s", stage, checkpoint,
+        extra={"stage": stage, "checkpoint": str(checkpoint)}
+    )
+
+    return True, data["data"]
+
+
+def log_stage(stage: str, data, elapsed: float):
+    """ Log the time taken by a stage and the number of rows it output
+
+    Args:
+        stage (str): Name of the stage
+        data: Result of the stage
+        elapsed (float): Time taken by the stage in seconds
+    """
+
+    throughput = get_throughput(count_rows(data), elapsed)
+    logger.info(
+        "Ran the '%s' stage in %.2fs (%s rows)", stage, elapsed,
+        throughput["rows"], extra={"stage": stage, **throughput}
+    )
+
+
+def run_stage(
+    run_folder: Path, stage: str, stage_hash: str, function: Callable, *args
+):
+    """ Load the result of a stage from its checkpoint or run the stage and
+    write its checkpoint
+
+    Args:
+        run_folder (Path): Output folder of the run
+        stage (str): Name of the stage
+        stage_hash (str): Hash of the inputs of the stage
+        function (Callable): Function running the stage
+        *args: Arguments of the function
+
+    Returns:
+        Result of the stage
+    """
+
+    loaded, data = load_checkpoint(run_folder, stage, stage_hash)
+
+    if not loaded:
+        start = time.perf_counter()
+        data = function(*args)
+        log_stage(stage, data, time.perf_counter() - start)
+        write_checkpoint(run_folder, stage, stage_hash, data)
+
+    return data
+
+
+async def run_async_stage(
+    run_folder: Path, stage: str, stage_hash: str, function: Callable, *args
+):
+    """ Same as run_stage for a coroutine function
+
+    Args:
+        run_folder (Path): Output folder of the run
+        stage (str): Name of the stage
+        stage_hash (str): Hash of the inputs of the stage
+        function (Callable): Coroutine function running the stage
+        *args: Arguments of the function
+
+    Returns:
+        Result of the stage
+    """
+
+    loaded, data = load_checkpoint(run_folder, stage, stage_hash)
+
+    if not loaded:
+        start = time.perf_counter()
+        data = await function(*args)
+        log_stage(stage, data, time.perf_counter() - start)
+        write_checkpoint(run_folder, stage, stage_hash, data)
+
+    return data
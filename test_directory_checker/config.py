@@ -0,0 +1,153 @@
+from dataclasses import dataclass, field, fields
+
+
+def get_init_fields(config_class: type) -> list:
+    """ Get the fields of a config class read from the JSON config i.e.
+    without the fields computed from the other ones
+
+    Args:
+        config_class (type): Config class
+
+    Returns:
+        list: List of the dataclass fields
+    """
+
+    return [
+        config_field for config_field in fields(config_class)
+        if config_field.init
+    ]
+
+
+@dataclass(frozen=True)
+class Config:
+    """ Immutable config validated when loaded. The values can also be
+    accessed like with the dict of the JSON config i.e. config["key"]
+    """
+
+    def __getitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+
+        return getattr(self, key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in {config_field.name for config_field in fields(self)}
+
+    def get(self, key: str, default=None):
+        return self[key] if key in self else default
+
+    @classmethod
+    def get_errors(cls, data: dict) -> list:
+        """ Check the data of a JSON config against the fields of the config
+
+        Args:
+            data (dict): Data of the JSON config
+
+        Returns:
+            list: List of the problems found in the data
+        """
+
+        if not isinstance(data, dict):
+            return ["the config should be a JSON object"]
+
+        errors = []
+
+        for config_field in get_init_fields(cls):
+            if config_field.name not in data:
+                if config_field.default is None:
+                    continue
+
+                errors.append(f"'{config_field.name}' is missing")
+                continue
+
+            value = data[config_field.name]
+
+            if config_field.type in (frozenset, tuple):
+                if not isinstance(value, list) or not all(
+                    isinstance(element, (str, int)) for element in value
+                ):
+                    errors.append(
+                        f"'{config_field.name}' should be a list of strings"
+                    )
+
+            elif (
+                not isinstance(value, config_field.type) or
+                isinstance(value, bool)
+            ):
+                errors.append(
+                    f"'{config_field.name}' should be of type "
+                    f"{config_field.type.__name__}"
+                )
+
+        return errors
+
+    @classmethod
+    def from_dict(cls, data: dict, source: str = "config"):
+        """ Validate the data of a JSON config and build the config. The
+        lists are converted to frozensets or tuples of strings
+
+        Args:
+            data (dict): Data of the JSON config
+            source (str, optional): Name of the config for the error message.
+            Defaults to "config"
+
+        Returns:
+            Config: Config of the class it is called on
+        """
+
+        errors = cls.get_errors(data)
+
+        assert not errors, (
+            f"'{source}' is not a valid config: {'; '.join(errors)}"
+        )
+
+        return cls(
+            **{
+                config_field.name: (
+                    config_field.type(
+                        str(element) for element in data[config_field.name]
+                    )
+                    if config_field.type in (frozenset, tuple)
+                    else data[config_field.name]
+                )
+                for config_field in get_init_fields(cls)
+                if config_field.name in data
+            }
+        )
+
+
+@dataclass(frozen=True)
+class TDConfig(Config):
+    """ Test directory parser config """
+
+    sheet_of_interest: str
+    header_index: int
+    clinical_indication_column_code: str
+    clinical_indication_column_name: str
+    panel_column: str
+    test_method_column: str
+    ngs_column: str
+    # values of the NGS column of the tests checked
+    ngs_type: frozenset
+    # test methods handled by the test directory parser, in the order of the
+    # config so that the closest test methods are found in a stable order
+    ngs_test_methods: tuple
+    name: str = None
+    # set of the test methods for the membership checks of every test
+    ngs_test_method_set: frozenset = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(
+            self, "ngs_test_method_set", frozenset(self.ngs_test_methods)
+        )
+
+
+@dataclass(frozen=True)
+class BlacklistConfig(Config):
+    """ Panels and genes excluded from the checks """
+
+    # panelapp ids which are not accessible through the API because they have
+    # been retired or they are in development
+    unaccessible_panelapp_panels: frozenset
+    # genes without transcripts e.g. TRAC or IGHM
+    genes_with_no_transcripts: frozenset
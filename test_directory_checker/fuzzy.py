@@ -0,0 +1,126 @@
+import difflib
+from typing import Iterable
+
+import numpy as np
+
+
+def get_trigrams(string: str) -> set:
+    """ Get the trigrams of a string, padded so that the start and the end of
+    the string weigh more in the similarity
+
+    Args:
+        string (str): String to get the trigrams of
+
+    Returns:
+        set: Set of trigrams of the lowercased string
+    """
+
+    padded_string = f"  {string.lower()} "
+
+    return {
+        padded_string[i:i + 3] for i in range(len(padded_string) - 2)
+    }
+
+
+class TrigramIndex:
+    """ Index of strings by trigram to find the closest strings to a query
+    without comparing the query to every indexed string. The strings sharing
+    the most trigrams with the query are then ranked using the similarity
+    ratio of difflib which handles swapped characters better
+    """
+
+    def __init__(self, strings: Iterable):
+        self.strings = list(dict.fromkeys(strings))
+        self.nb_trigrams = np.zeros(len(self.strings), dtype=np.int64)
+        postings = {}
+
+        for position, string in enumerate(self.strings):
+            trigrams = get_trigrams(string)
+            self.nb_trigrams[position] = len(trigrams)
+
+            for trigram in trigrams:
+                postings.setdefault(trigram, []).append(position)
+
+        self.postings = {
+            trigram: np.array(positions, dtype=np.int64)
+            for trigram, positions in postings.items()
+        }
+
+    def search(
+        self, query: str, limit: int = 3, min_similarity: float = 0.6,
+        nb_candidates: int = 50
+    ) -> list:
+        """ Find the closest indexed strings to the query
+
+        Args:
+            query (str): String to look for
+            limit (int, optional): Maximum number of strings returned.
+            Defaults to 3
+            min_similarity (float, optional): Minimum similarity of the
+            returned strings. Defaults to 0.6
+            nb_candidates (int, optional): Number of strings sharing the most
+            trigrams with the query to rank. Defaults to 50
+
+        Returns:
+            list: List of tuples containing the string and its similarity,
+            sorted by decreasing similarity
+        """
+
+        trigrams = get_trigrams(query)
+        postings = [
+            self.postings[trigram]
+            for trigram in trigrams
+            if trigram in self.postings
+        ]
+
+        if not postings:
+            return []
+
+        # count the trigrams shared with the query for every string sharing
+        # at least one
+        nb_shared = np.bincount(
+            np.concatenate(postings), minlength=len(self.strings)
+        )
+        candidates = np.flatnonzero(nb_shared)
+        nb_shared = nb_shared[candidates]
+        jaccard_indexes = nb_shared / (
+            len(trigrams) + self.nb_trigrams[candidates] - nb_shared
+        )
+
+        # keep the best candidates in order of indexing for the ties
+        candidates = candidates[
+            np.lexsort((candidates, -jaccard_indexes))[:nb_candidates]
+        ]
+
+        sequence_matcher = difflib.SequenceMatcher()
+        sequence_matcher.set_seq2(query.lower())
+        results = []
+
+        for candidate in sorted(candidates):
+            sequence_matcher.set_seq1(self.strings[candidate].lower())
+            similarity = sequence_matcher.ratio()
+
+            if similarity >= min_similarity:
+                results.append((self.strings[candidate], similarity))
+
+        # stable sort to keep the order of indexing for the ties
+        results.sort(key=lambda result: result[1], reverse=True)
+
+        return results[:limit]
+
+
+def format_candidates(candidates: list) -> str:
+    """ Format the candidates from TrigramIndex.search for outputting
+
+    Args:
+        candidates (list): List of tuples containing the string and its
+        similarity
+
+    Returns:
+        str: Candidates with their similarity
+    """
+
+    return ", ".join(
+        f"{candidate} ({similarity:.2f})"
+        for candidate, similarity in candidates
+    )
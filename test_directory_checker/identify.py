@@ -1,15 +1,30 @@
+import functools
+import logging
+from typing import Callable, Iterable
+
 import regex
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+from pyarrow import compute as pc
+
+from test_directory_checker import backend, profiling
+
+logger = logging.getLogger(__name__)
 
 
-def identify_target(target: str, hgnc_dump: pd.DataFrame) -> list:
+@profiling.profile
+def identify_target(
+    target: str, hgnc_dump: pd.DataFrame, symbol_table: pd.DataFrame = None
+) -> list:
     """ Identify the target as gene or panel using regex
 
     Args:
         target (str): String for the target extracted from the test directory
         hgnc_dump (pd.DataFrame): Pandas Dataframe containing the HGNC data
+        symbol_table (pd.DataFrame, optional): Symbol table built from the
+        HGNC dump. Defaults to None i.e. built from the HGNC dump
 
     Returns:
         list: List of 2 elements containing the identified panels and the
@@ -19,8 +34,9 @@ def identify_target(target: str, hgnc_dump: pd.DataFrame) -> list:
     panels = []
     genes = []
 
-    potential_panel_targets = regex.findall(r"\([0-9&\ ]+\)", target)
-    potential_gene_targets = regex.findall(r"[A-Z]+[A-Z0-9\-]+", target)
+    potential_panel_targets, potential_gene_targets = get_potential_targets(
+        target
+    )
 
     # regex to identify panelapp panels
     if potential_panel_targets:
@@ -31,107 +47,367 @@ def identify_target(target: str, hgnc_dump: pd.DataFrame) -> list:
 
     # regex to identify gene symbol
     elif potential_gene_targets:
-        for potential_gene in potential_gene_targets:
-            hgnc_id_data = find_hgnc_id(potential_gene, hgnc_dump)
+        if symbol_table is None:
+            symbol_table = build_symbol_table(hgnc_dump)
 
-            if hgnc_id_data["HGNC ID"]:
-                genes.append(hgnc_id_data["HGNC ID"])
+        hgnc_id_data = resolve_symbols(potential_gene_targets, symbol_table)
+        genes.extend(hgnc_id_data["HGNC ID"].dropna().to_list())
 
     return panels, genes
 
 
-def find_hgnc_id(gene_symbol, hgnc_dump):
-    """ Find hgnc id using the hgnc dump
+def get_potential_targets(target: str) -> tuple:
+    """ Get the potential panels and gene symbols in the target using regex
 
     Args:
-        gene_symbol (str): Gene symbol
-        hgnc_dump (pd.Dataframe): Hgnc dump dataframe
+        target (str): String for the target extracted from the test directory
+
+    Returns:
+        tuple: Tuple containing the list of potential panels and the list of
+        potential gene symbols
+    """
+
+    potential_panel_targets = regex.findall(r"\([0-9&\ ]+\)", target)
+    potential_gene_targets = regex.findall(r"[A-Z]+[A-Z0-9\-]+", target)
+
+    return potential_panel_targets, potential_gene_targets
 
-    Raises:
-        Exception: if a panel has escaped previous checks
+
+def get_gene_symbols(target: str) -> list:
+    """ Get the unique potential gene symbols of a gene target
+
+    Args:
+        target (str): String for the target extracted from the test directory
 
     Returns:
-        str: Hgnc id
+        list: List of the potential gene symbols in the order of the target
     """
 
-    df_res = pd.Series(
-        [gene_symbol, None, None, None], index=[
-            "Gene symbol", "HGNC ID", "Previous", "Alias"
-        ]
+    potential_panel_targets, potential_gene_targets = get_potential_targets(
+        target
     )
 
-    hgnc_id = None
+    # the gene symbols are not looked at if the target has panels
+    if potential_panel_targets:
+        return []
 
-    # pattern is the gene symbol and only the gene symbol
-    pattern = fr"^{gene_symbol}$"
-    # try and match the gene symbol in the Approved symbol column
-    data = hgnc_dump[
-        hgnc_dump["Approved symbol"].str.match(pattern, na=False)
-    ]["HGNC ID"]
-    # prepare dataframes for aliases and previous symbols
-    previous_symbols = hgnc_dump[["Previous symbols", "HGNC ID"]]
-    alias_symbols = hgnc_dump[["Alias symbols", "HGNC ID"]]
+    return list(dict.fromkeys(potential_gene_targets))
 
-    # match failed, need to use previous and alias symbols
-    if len(data.index) == 0:
-        if regex.match(r"[A-Z]+[A-Z0-9]+", gene_symbol):
-            # previous and alias symbols in hgnc are separated by commas which
-            # breaks the pattern matching so i split the appropriate columns
-            # creating a df with one column per splitted element
-            splitted_previous_symbols = previous_symbols["Previous symbols"].str.split(",", expand=True)
-            splitted_alias_symbols = alias_symbols["Alias symbols"].str.split(",", expand=True)
-            # copy pasted thing to do the pattern matching for every element of
-            # the splitted column
-            previous_symbols_match = np.column_stack(
-                [
-                    splitted_previous_symbols[col].str.strip().str.match(pattern, na=False)
-                    for col in splitted_previous_symbols
-                ]
-            )
-            alias_symbols_match = np.column_stack(
-                [
-                    splitted_alias_symbols[col].str.strip().str.match(pattern, na=False)
-                    for col in splitted_alias_symbols
-                ]
-            )
-            # go back to a dataframe using the numpy array to get the matching
-            # rows
-            df_previous_symbols = previous_symbols.loc[previous_symbols_match.any(axis=1)]
-            df_alias_symbols = alias_symbols.loc[alias_symbols_match.any(axis=1)]
-
-            # check the size of the dataframes and do the appropriate action
-            if len(df_previous_symbols) == 0 and len(df_alias_symbols) == 0:
-                # couldn't find a previous or alias symbol
-                return df_res
-
-            elif len(df_previous_symbols) == 1 and len(df_alias_symbols) == 0:
-                # found only a previous symbol, return the HGNC id
-                hgnc_id = df_previous_symbols["HGNC ID"].to_list()[0]
-                df_res.at["Previous"] = True
-                df_res.at["Alias"] = False
-
-            elif len(df_previous_symbols) == 0 and len(df_alias_symbols) == 1:
-                # found only a alias symbol, return the HGNC id
-                hgnc_id = df_alias_symbols["HGNC ID"].to_list()[0]
-                df_res.at["Previous"] = False
-                df_res.at["Alias"] = True
-
-            elif len(df_previous_symbols) >= 1 and len(df_alias_symbols) >= 1:
-                # found previous and alias symbols, cry
-                df_res.at["Previous"] = True
-                df_res.at["Alias"] = True
-
-            elif len(df_previous_symbols) >= 1:
-                df_res.at["Previous"] = True
-                df_res.at["Alias"] = False
-
-            elif len(df_alias_symbols) >= 1:
-                df_res.at["Previous"] = False
-                df_res.at["Alias"] = True
 
+def get_unresolved_symbols(target: str, symbol_table: pd.DataFrame) -> list:
+    """ Get the potential gene symbols of a gene target which are not an
+    approved, previous or alias symbol
+
+    Args:
+        target (str): String for the target extracted from the test directory
+        symbol_table (pd.DataFrame): Symbol table built from the HGNC dump
+
+    Returns:
+        list: List of the unresolved symbols in the order of the target
+    """
+
+    return [
+        symbol
+        for symbol in get_gene_symbols(target)
+        if symbol not in symbol_table.index
+    ]
+
+
+def get_cached_target_identifier(
+    hgnc_dump: pd.DataFrame, symbol_table: pd.DataFrame = None,
+    maxsize: int = 4096
+) -> Callable:
+    """ Get a function identifying targets with a bounded LRU memo of the
+    previously identified targets, for when targets are checked one by one
+    e.g. interactively
+
+    Args:
+        hgnc_dump (pd.DataFrame): Pandas Dataframe containing the HGNC data
+        symbol_table (pd.DataFrame, optional): Symbol table built from the
+        HGNC dump. Defaults to None i.e. built from the HGNC dump
+        maxsize (int, optional): Maximum number of targets kept in the memo.
+        Defaults to 4096
+
+    Returns:
+        Callable: Function taking a target and returning the identified panels
+        and the identified genes like identify_target
+    """
+
+    if symbol_table is None:
+        symbol_table = build_symbol_table(hgnc_dump)
+
+    @functools.lru_cache(maxsize=maxsize)
+    def _identify_target(target):
+        panels, genes = identify_target(target, hgnc_dump, symbol_table)
+        return tuple(panels), tuple(genes)
+
+    def identify_cached_target(target: str) -> list:
+        hits = _identify_target.cache_info().hits
+        panels, genes = _identify_target(target)
+
+        if _identify_target.cache_info().hits > hits:
+            profiling.PROFILER.count_cache_hit("identify.identify_target")
+
+        # copies so that the memo can't be modified by the caller
+        return list(panels), list(genes)
+
+    identify_cached_target.cache_info = _identify_target.cache_info
+    identify_cached_target.cache_clear = _identify_target.cache_clear
+
+    return identify_cached_target
+
+
+@profiling.profile
+def build_symbol_table(hgnc_dump: pd.DataFrame) -> pd.DataFrame:
+    """ Build a long table of every symbol in the HGNC dump i.e. one row per
+    approved, previous or alias symbol. This is meant to be built once per run
+    and passed around to resolve symbols using joins
+
+    Args:
+        hgnc_dump (pd.DataFrame): Pandas Dataframe containing the HGNC data
+
+    Returns:
+        pd.DataFrame: Dataframe indexed by symbol with the "HGNC ID" and
+        "Kind" (approved, previous or alias) columns
+    """
+
+    if backend.use_arrow():
+        symbol_table = get_arrow_symbols(hgnc_dump)
     else:
-        hgnc_id = data.iloc[0]
+        symbol_table = get_pandas_symbols(hgnc_dump)
+
+    symbol_table = symbol_table[
+        symbol_table["Symbol"].notna() & (symbol_table["Symbol"] != "")
+    ].drop_duplicates()
+
+    logger.debug(
+        "Built the symbol table with %s symbols for %s genes",
+        len(symbol_table), len(hgnc_dump)
+    )
+
+    return symbol_table.set_index("Symbol")
+
+
+def get_pandas_symbols(hgnc_dump: pd.DataFrame) -> pd.DataFrame:
+    """ Get one row per approved, previous or alias symbol of the HGNC dump
+    using pandas
+
+    Args:
+        hgnc_dump (pd.DataFrame): Pandas Dataframe containing the HGNC data
+
+    Returns:
+        pd.DataFrame: Dataframe with the "Symbol", "HGNC ID" and "Kind" columns
+    """
+
+    approved_symbols = hgnc_dump[["Approved symbol", "HGNC ID"]].rename(
+        columns={"Approved symbol": "Symbol"}
+    )
+    approved_symbols["Kind"] = "approved"
+    tables = [approved_symbols]
+
+    for column, kind in [
+        ("Previous symbols", "previous"), ("Alias symbols", "alias")
+    ]:
+        # previous and alias symbols in hgnc are separated by commas so one
+        # row per symbol is created
+        symbols = hgnc_dump[[column, "HGNC ID"]].dropna(subset=[column])
+        symbols = symbols.assign(
+            Symbol=symbols[column].str.split(",")
+        ).explode("Symbol")
+        symbols["Symbol"] = symbols["Symbol"].str.strip()
+        symbols["Kind"] = kind
+        tables.append(symbols[["Symbol", "HGNC ID", "Kind"]])
+
+    return pd.concat(tables, ignore_index=True)
+
+
+def get_arrow_symbols(hgnc_dump: pd.DataFrame) -> pd.DataFrame:
+    """ Get one row per approved, previous or alias symbol of the HGNC dump
+    using the Arrow compute functions. Gives the same rows as
+    get_pandas_symbols
+
+    Args:
+        hgnc_dump (pd.DataFrame): Pandas Dataframe containing the HGNC data
+
+    Returns:
+        pd.DataFrame: Dataframe with the "Symbol", "HGNC ID" and "Kind" columns
+    """
+
+    table = backend.to_arrow(
+        hgnc_dump,
+        ["HGNC ID", "Approved symbol", "Previous symbols", "Alias symbols"]
+    )
+    symbols = [backend.to_numpy(table["Approved symbol"])]
+    hgnc_ids = [backend.to_numpy(table["HGNC ID"])]
+    kinds = [np.repeat("approved", len(table))]
+
+    for column, kind in [
+        ("Previous symbols", "previous"), ("Alias symbols", "alias")
+    ]:
+        # previous and alias symbols in hgnc are separated by commas so one
+        # row per symbol is created, nulls don't create rows
+        split_symbols = pc.split_pattern(
+            table[column].combine_chunks().cast(pa.string()), ","
+        )
+        parent_rows = pc.list_parent_indices(split_symbols)
+
+        symbols.append(
+            backend.to_numpy(
+                pc.utf8_trim_whitespace(pc.list_flatten(split_symbols))
+            )
+        )
+        hgnc_ids.append(
+            backend.to_numpy(pc.take(table["HGNC ID"], parent_rows))
+        )
+        kinds.append(np.repeat(kind, len(parent_rows)))
+
+    return pd.DataFrame(
+        {
+            "Symbol": np.concatenate(symbols),
+            "HGNC ID": np.concatenate(hgnc_ids),
+            "Kind": np.concatenate(kinds).astype(object),
+        }
+    )
+
+
+def find_ambiguous_symbols(
+    symbol_table: pd.DataFrame, symbols: Iterable = None
+) -> pd.DataFrame:
+    """ Find the symbols that map to several HGNC ids
+
+    Args:
+        symbol_table (pd.DataFrame): Dataframe from build_symbol_table
+        symbols (Iterable, optional): Symbols to restrict the search to.
+        Defaults to None i.e. all the symbols of the table
+
+    Returns:
+        pd.DataFrame: Dataframe with the ambiguous symbols and their HGNC ids
+        along with the kind of symbol they are matched through e.g.
+        "HGNC:1 (approved), HGNC:2 (alias)"
+    """
+
+    if symbols is not None:
+        symbol_table = symbol_table[symbol_table.index.isin(list(symbols))]
+
+    nb_hgnc_ids = symbol_table.groupby(level=0)["HGNC ID"].nunique()
+    ambiguous = symbol_table[
+        symbol_table.index.isin(nb_hgnc_ids[nb_hgnc_ids > 1].index)
+    ]
+
+    hgnc_ids = (
+        ambiguous["HGNC ID"] + " (" + ambiguous["Kind"] + ")"
+    ).groupby(level=0).agg(lambda x: ", ".join(sorted(set(x))))
+
+    return pd.DataFrame(
+        {"Symbol": hgnc_ids.index, "HGNC IDs": hgnc_ids.to_numpy()},
+        columns=["Symbol", "HGNC IDs"]
+    )
+
+
+@profiling.profile
+def resolve_symbols(
+    gene_symbols: Iterable, symbol_table: pd.DataFrame
+) -> pd.DataFrame:
+    """ Find the HGNC ids of multiple gene symbols using one join on the
+    symbol table. An approved symbol match always wins, otherwise the previous
+    and alias symbols are used if they point to only one HGNC id
+
+    Args:
+        gene_symbols (Iterable): Gene symbols to resolve
+        symbol_table (pd.DataFrame): Dataframe from build_symbol_table
+
+    Returns:
+        pd.DataFrame: Dataframe with one row per gene symbol given and the
+        "Gene symbol", "HGNC ID", "Previous" and "Alias" columns
+    """
+
+    gene_symbols = pd.Series(list(gene_symbols), dtype=object)
+
+    df_res = pd.DataFrame(
+        {
+            "Gene symbol": gene_symbols,
+            "HGNC ID": None,
+            "Previous": None,
+            "Alias": None,
+        }, dtype=object
+    )
+
+    matches = df_res[["Gene symbol"]].join(
+        symbol_table, on="Gene symbol", how="inner"
+    )
+
+    # approved symbols match first, keep the first HGNC id in the dump order
+    approved_matches = matches[matches["Kind"] == "approved"]
+    approved_matches = approved_matches[
+        ~approved_matches.index.duplicated()
+    ]
+    df_res.loc[approved_matches.index, "HGNC ID"] = approved_matches[
+        "HGNC ID"
+    ]
+
+    # match failed, need to use previous and alias symbols
+    other_matches = matches[
+        (matches["Kind"] != "approved") &
+        ~matches.index.isin(approved_matches.index) &
+        matches["Gene symbol"].str.match(r"[A-Z]+[A-Z0-9]+")
+    ]
+
+    if other_matches.empty:
+        return df_res
+
+    grouped_matches = other_matches.groupby(
+        [other_matches.index, "Kind"]
+    )["HGNC ID"]
+    nb_hgnc_ids = grouped_matches.nunique().unstack(fill_value=0).reindex(
+        columns=["previous", "alias"], fill_value=0
+    )
+    first_hgnc_ids = grouped_matches.first().unstack().reindex(
+        columns=["previous", "alias"]
+    )
+
+    df_res.loc[nb_hgnc_ids.index, "Previous"] = (
+        nb_hgnc_ids["previous"] >= 1
+    ).astype(object)
+    df_res.loc[nb_hgnc_ids.index, "Alias"] = (
+        nb_hgnc_ids["alias"] >= 1
+    ).astype(object)
+
+    # only a single previous or a single alias symbol gives an HGNC id, the
+    # other cases are ambiguous
+    only_previous = nb_hgnc_ids[
+        (nb_hgnc_ids["previous"] == 1) & (nb_hgnc_ids["alias"] == 0)
+    ].index
+    only_alias = nb_hgnc_ids[
+        (nb_hgnc_ids["previous"] == 0) & (nb_hgnc_ids["alias"] == 1)
+    ].index
+    df_res.loc[only_previous, "HGNC ID"] = first_hgnc_ids.loc[
+        only_previous, "previous"
+    ]
+    df_res.loc[only_alias, "HGNC ID"] = first_hgnc_ids.loc[
+        only_alias, "alias"
+    ]
+
+    return df_res
+
+
+@profiling.profile
+def find_hgnc_id(gene_symbol, hgnc_dump, symbol_table=None):
+    """ Find hgnc id using the hgnc dump
+
+    Args:
+        gene_symbol (str): Gene symbol
+        hgnc_dump (pd.Dataframe): Hgnc dump dataframe
+        symbol_table (pd.DataFrame, optional): Symbol table built from the
+        hgnc dump. Defaults to None i.e. built from the hgnc dump
+
+    Returns:
+        pd.Series: Series with the gene symbol, the hgnc id and whether the
+        previous and alias symbols were matched
+    """
 
-    df_res.at["HGNC ID"] = hgnc_id
+    if symbol_table is None:
+        symbol_table = build_symbol_table(hgnc_dump)
 
+    df_res = resolve_symbols([gene_symbol], symbol_table).iloc[0]
+    df_res.name = None
     return df_res
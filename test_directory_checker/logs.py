@@ -0,0 +1,118 @@
+import json
+import logging
+from pathlib import Path
+
+import pandas as pd
+
+# logger of the package, the modules log to its children using
+# logging.getLogger(__name__)
+PACKAGE_LOGGER = "test_directory_checker"
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+# attributes of every log record, the other attributes are the extra fields
+# passed to the logging calls e.g. the stage and its throughput
+RECORD_ATTRIBUTES = set(
+    vars(logging.LogRecord("", logging.INFO, "", 0, "", None, None))
+) | {"message", "asctime"}
+
+# handlers added by setup_logging, removed when it is called again
+_handlers = []
+
+
+class JsonFormatter(logging.Formatter):
+    """ Format the log records as one JSON object per line with their extra
+    fields
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        data.update(
+            {
+                key: value
+                for key, value in vars(record).items()
+                if key not in RECORD_ATTRIBUTES
+            }
+        )
+
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(data, default=str)
+
+
+def setup_logging(level: str = "INFO", json_log: Path = None):
+    """ Setup the logging of the package: messages are written to stderr and
+    optionally to a JSON lines file
+
+    Args:
+        level (str, optional): Minimum level of the messages. Defaults to
+        "INFO"
+        json_log (Path, optional): Path to the JSON lines file. Defaults to
+        None i.e. no JSON file
+    """
+
+    package_logger = logging.getLogger(PACKAGE_LOGGER)
+
+    for handler in _handlers:
+        package_logger.removeHandler(handler)
+        handler.close()
+
+    _handlers.clear()
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    _handlers.append(console_handler)
+
+    if json_log:
+        json_handler = logging.FileHandler(json_log)
+        json_handler.setFormatter(JsonFormatter())
+        _handlers.append(json_handler)
+
+    for handler in _handlers:
+        package_logger.addHandler(handler)
+
+    package_logger.setLevel(level)
+
+
+def count_rows(data) -> int:
+    """ Count the rows of the dataframes in the result of a stage
+
+    Args:
+        data: Result of a stage i.e. a dataframe or a tuple containing
+        dataframes
+
+    Returns:
+        int: Number of rows of the dataframes
+    """
+
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        return len(data)
+
+    if isinstance(data, tuple):
+        return sum(count_rows(element) for element in data)
+
+    return 0
+
+
+def get_throughput(rows: int, elapsed: float) -> dict:
+    """ Get the extra fields describing the throughput of a stage
+
+    Args:
+        rows (int): Number of rows processed
+        elapsed (float): Time taken in seconds
+
+    Returns:
+        dict: Dict with the "rows", "elapsed" and "rows_per_second" fields
+    """
+
+    return {
+        "rows": rows,
+        "elapsed": round(elapsed, 6),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed else None,
+    }
@@ -1,12 +1,268 @@
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import functools
+import gzip
+import os
 from pathlib import Path
+import shutil
+import tarfile
+import uuid
 
 from jinja2 import Environment, FileSystemLoader
 import pandas as pd
 
-from test_directory_checker.utils import check_if_output_folder_exists, get_date
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from test_directory_checker.utils import (
+    check_if_output_folder_exists, filter_out_df, get_date, is_empty
+)
 
 ROOT_DIR = Path(__file__).absolute().parents[0]
 
+# the templates are loaded once and compiled templates are cached by the
+# environment
+ENVIRONMENT = Environment(
+    loader=FileSystemLoader(ROOT_DIR.joinpath("template")), auto_reload=False
+)
+
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+
+@functools.lru_cache(maxsize=None)
+def get_template(template_name: str):
+    """ Get the compiled template from the module environment
+
+    Args:
+        template_name (str): Name of the template file
+
+    Returns:
+        jinja2.Template: Compiled template
+    """
+
+    return ENVIRONMENT.get_template(template_name)
+
+
+def get_compressed_path(output_file: Path, compression: str = None) -> Path:
+    """ Get the path of the output file with the extension of the compression
+
+    Args:
+        output_file (Path): Path to the uncompressed output file
+        compression (str, optional): "gzip", "zstd" or None for no
+        compression. Defaults to None
+
+    Returns:
+        Path: Path to the output file
+    """
+
+    if compression is None:
+        return Path(output_file)
+
+    assert compression in COMPRESSION_EXTENSIONS, (
+        f"Compression should be one of {', '.join(COMPRESSION_EXTENSIONS)}"
+    )
+
+    return Path(f"{output_file}{COMPRESSION_EXTENSIONS[compression]}")
+
+
+def is_compression_available(compression: str = None) -> bool:
+    """ Check that the package needed by a compression is installed so that a
+    run fails before its stages rather than when writing its outputs
+
+    Args:
+        compression (str, optional): "gzip", "zstd" or None for no
+        compression. Defaults to None
+
+    Returns:
+        bool: Whether the compression can be used
+    """
+
+    return compression != "zstd" or zstandard is not None
+
+
+def compress(data: bytes, compression: str = None) -> bytes:
+    """ Compress the data. gzip data is compressed without timestamp so that
+    the same data is always compressed the same way
+
+    Args:
+        data (bytes): Data to compress
+        compression (str, optional): "gzip", "zstd" or None for no
+        compression. Defaults to None
+
+    Returns:
+        bytes: Compressed data
+    """
+
+    if compression is None:
+        return data
+
+    if compression == "gzip":
+        return gzip.compress(data, mtime=0)
+
+    assert zstandard, (
+        "The zstandard package needs to be installed to use zstd compression"
+    )
+
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def write_file_atomically(
+    content: str, output_file: Path, compression: str = None
+) -> Path:
+    """ Write the content to a temporary file in the same folder and move it
+    to the output file so that the output file is never partially written
+
+    Args:
+        content (str): Content to write
+        output_file (Path): Path to the output file
+        compression (str, optional): "gzip", "zstd" or None for no
+        compression. Defaults to None
+
+    Returns:
+        Path: Path to the written file, with the compression extension
+    """
+
+    output_file = get_compressed_path(output_file, compression)
+    # the temporary file is created with open so that it gets the permissions
+    # of the umask, tempfile would only make it readable by the user
+    tmp_file = output_file.with_name(
+        f".{output_file.name}.{uuid.uuid4().hex}"
+    )
+
+    try:
+        with open(tmp_file, "xb") as f:
+            f.write(compress(content.encode("utf-8"), compression))
+
+        # a rewritten output file keeps its permissions
+        if output_file.exists():
+            shutil.copymode(output_file, tmp_file)
+
+        os.replace(tmp_file, output_file)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+
+    return output_file
+
+
+def output_reports(
+    reports: list, compression: str = None, max_workers: int = None
+):
+    """ Render and write the given reports concurrently
+
+    Args:
+        reports (list): List of tuples containing the output function i.e.
+        output_table or output_test_methods and its arguments
+        compression (str, optional): "gzip", "zstd" or None for no
+        compression. Defaults to None
+        max_workers (int, optional): Number of threads. Defaults to None i.e.
+        one thread per report
+    """
+
+    max_workers = max_workers or max(len(reports), 1)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(output_function, *args, compression=compression)
+            for output_function, *args in reports
+        ]
+
+    # raise the first error encountered
+    for future in futures:
+        future.result()
+
+
+def get_reports(
+    output_folder: Path, target_data: pd.DataFrame,
+    new_test_methods: pd.DataFrame, presence_db_df: pd.DataFrame,
+    panel_changes: pd.DataFrame, unresolved_symbols: pd.DataFrame,
+    identical_tests: pd.DataFrame = None, removed_tests: pd.DataFrame = None,
+    replaced_tests: pd.DataFrame = None
+) -> list:
+    """ Get the reports of a run to pass to output_reports
+
+    Args:
+        output_folder (Path): Output folder of the run
+        target_data (pd.DataFrame): Dataframe with the targets of the tests
+        new_test_methods (pd.DataFrame): Dataframe with the new test methods
+        presence_db_df (pd.DataFrame): Dataframe with the presence of the genes
+        in the database
+        panel_changes (pd.DataFrame): Dataframe with the changed panels
+        unresolved_symbols (pd.DataFrame): Dataframe with the unresolved
+        symbols
+        identical_tests (pd.DataFrame, optional): Identical tests. Defaults to
+        None i.e. already written in streaming mode
+        removed_tests (pd.DataFrame, optional): Removed tests. Defaults to None
+        replaced_tests (pd.DataFrame, optional): Replaced tests. Defaults to
+        None
+
+    Returns:
+        list: List of tuples containing the output function and its arguments
+    """
+
+    reports = []
+
+    # the comparison results have already been written in streaming mode
+    if identical_tests is not None:
+        # filter tests have None in both the removed and added columns
+        filtered_df = filter_out_df(identical_tests, removed=None, added=None)
+        reports.append((
+            output_table, identical_tests, "identical_tests.html",
+            output_folder, filtered_df
+        ))
+
+        reports.append((
+            output_table, removed_tests, "removed_tests.html", output_folder
+        ))
+
+        # filter out tests have None in both the removed and added columns
+        filtered_df = filter_out_df(replaced_tests, removed=None, added=None)
+        reports.append((
+            output_table, replaced_tests, "replaced_tests.html",
+            output_folder, filtered_df
+        ))
+
+    # filter out tests that have empty lists in the Identified panels and
+    # Identified genes
+    filtered_df = filter_out_df(
+        target_data, how="all", **{
+            "Identified panels": is_empty, "Identified genes": is_empty
+        }
+    )
+    reports.append((
+        output_table, target_data, "targets.html", output_folder, filtered_df
+    ))
+
+    # filter out tests that have an empty string in the Potential new test
+    # methods column
+    reports.append((
+        output_test_methods, new_test_methods, "test_methods.html",
+        output_folder
+    ))
+
+    # filter to get tests that have False in the presence_in_db or
+    # has_clinical_transcript columns
+    filtered_df = filter_out_df(
+        presence_db_df, presence_in_db=True, has_clinical_transcript=True
+    )
+    reports.append((
+        output_table, presence_db_df, "presence_in_db.html", output_folder,
+        filtered_df
+    ))
+
+    reports.append((
+        output_table, panel_changes, "panel_changes.html", output_folder
+    ))
+
+    reports.append((
+        output_table, unresolved_symbols, "unresolved_symbols.html",
+        output_folder
+    ))
+
+    return reports
+
 
 def mkdir_output_folder(output_folder: Path):
     """ Create the output folder
@@ -42,32 +298,105 @@ def log_command_line(output_folder: Path, command_line: str):
         f.write(command_line)
 
 
-def output_test_methods(table: pd.Series, output_name: str, output_folder: Path):
-    """ Output the test methods as a 2 column dataframe which will contain the
-    test methods not present in the config and the associated test IDs
+def bundle_output_folder(output_folder: Path, compression: str = None) -> Path:
+    """ Bundle the output folder of a run in a single tar file next to it and
+    remove the folder
+
+    Args:
+        output_folder (Path): Path to the output folder of the run
+        compression (str, optional): "gzip", "zstd" or None for no
+        compression. Defaults to None
+
+    Returns:
+        Path: Path to the tar bundle
+    """
+
+    output_folder = Path(output_folder)
+    bundle = get_compressed_path(
+        output_folder.with_name(f"{output_folder.name}.tar"), compression
+    )
+    tmp_bundle = bundle.with_name(f".{bundle.name}.tmp")
+
+    with open(tmp_bundle, "wb") as f:
+        if compression == "zstd":
+            assert zstandard, (
+                "The zstandard package needs to be installed to use zstd "
+                "compression"
+            )
+            stream = zstandard.ZstdCompressor().stream_writer(f, closefd=False)
+        elif compression == "gzip":
+            stream = gzip.GzipFile(fileobj=f, mode="wb", mtime=0)
+        else:
+            stream = contextlib.nullcontext(f)
+
+        with stream as stream_f, tarfile.open(
+            fileobj=stream_f, mode="w|"
+        ) as tar:
+            tar.add(output_folder, arcname=output_folder.name)
+
+    os.replace(tmp_bundle, bundle)
+    shutil.rmtree(output_folder)
+
+    return bundle
+
+
+def append_table(
+    table: pd.DataFrame, output_name: str, output_folder: Path,
+    compression: str = None
+):
+    """ Append the data to a TSV file, the header is written if the file
+    doesn't exist yet. Compressed data is appended as a new gzip member or
+    zstd frame which are read back as one file
+
+    Args:
+        table (pd.DataFrame): Dataframe to append to the file
+        output_name (str): Name of the TSV file
+        output_folder (Path): Folder of the output
+        compression (str, optional): "gzip", "zstd" or None for no
+        compression. Defaults to None
+    """
+
+    output_file = get_compressed_path(output_folder / output_name, compression)
+    content = table.to_csv(
+        sep="\t", index=False, header=not output_file.exists()
+    )
+
+    with open(output_file, "ab") as f:
+        f.write(compress(content.encode("utf-8"), compression))
+
+
+def output_test_methods(
+    table: pd.DataFrame, output_name: str, output_folder: Path,
+    compression: str = None
+):
+    """ Output the test methods as a dataframe which will contain the test
+    methods not present in the config, the associated test IDs and the
+    closest test methods in the config
 
     Args:
-        table (pd.Series): Series containing the test methods and the test IDs associated
+        table (pd.DataFrame): Series or dataframe containing the test methods and
+        the test IDs associated
         output_name (str): Output name of the file
         output_folder (Path): Output folder
+        compression (str, optional): "gzip", "zstd" or None for no
+        compression. Defaults to None
     """
 
-    environment = Environment(loader=FileSystemLoader(
-        ROOT_DIR.joinpath("template")
-    ))
-    template = environment.get_template("table_template.html")
+    template = get_template("table_template.html")
+    if isinstance(table, pd.Series):
+        table = table.to_frame()
+
     content = template.render(
-        filtered_tables=[table.to_frame().to_html()],
+        filtered_tables=[table.to_html()],
         title=output_name,
     )
 
-    with open(output_folder / output_name, mode="w", encoding="utf-8") as f:
-        f.write(content)
+    write_file_atomically(content, output_folder / output_name, compression)
 
 
 def output_table(
     full_table: pd.DataFrame, output_name: str, output_folder: Path,
-    *filtered_tables
+    *filtered_tables, compression: str = None
 ):
     """ Output HTML of the data
 
@@ -78,17 +407,15 @@ def output_table(
         output_folder (Path): Folder of the output
         *filtered_tables: List of filtered down tables originating from
         full_table
+        compression (str, optional): "gzip", "zstd" or None for no
+        compression. Defaults to None
     """
 
-    environment = Environment(loader=FileSystemLoader(
-        ROOT_DIR.joinpath("template")
-    ))
-    template = environment.get_template("table_template.html")
+    template = get_template("table_template.html")
     content = template.render(
         filtered_tables=[table.to_html() for table in filtered_tables],
         title=output_name,
         full_table=full_table.to_html()
     )
 
-    with open(output_folder / output_name, mode="w", encoding="utf-8") as f:
-        f.write(content)
+    write_file_atomically(content, output_folder / output_name, compression)
@@ -0,0 +1,481 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import logging
+from pathlib import Path
+import re
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect
+
+from test_directory_checker.checker import create_async_db_engine
+from test_directory_checker.config import BlacklistConfig, TDConfig
+from test_directory_checker.utils import HGNC_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# number of rows read from the inputs to check their content
+SAMPLE_ROWS = 100
+
+# the genepanels file can have the Panelapp id column or not
+GENEPANELS_NB_COLUMNS = (3, 4)
+
+# tables and columns of the database queried by the checker
+DB_SCHEMA = {
+    "gene": ["hgnc_id"],
+    "genes2transcripts": ["clinical_transcript"],
+}
+
+# timeout in seconds to connect to the database, the default timeout of the
+# driver is 60s
+DB_CONNECT_TIMEOUT = 2
+
+# arrays of the database snapshot written by export_db_snapshot.py
+SNAPSHOT_ARRAYS = ["hgnc_numbers", "clinical_transcripts"]
+
+HGNC_ID_PATTERN = re.compile(r"^HGNC:\d+$")
+
+
+def check_file_exists(file) -> list:
+    """ Check that an input file exists
+
+    Args:
+        file (str): Path to the file
+
+    Returns:
+        list: List of the problems found
+    """
+
+    if not Path(file).is_file():
+        return [f"'{file}' doesn't exist"]
+
+    return []
+
+
+def load_json(config_file) -> dict:
+    """ Load a JSON config without validating it
+
+    Args:
+        config_file (str): Path to the config
+
+    Returns:
+        dict: Data of the config, None if it can't be read
+    """
+
+    try:
+        with open(config_file) as f:
+            return json.load(f)
+
+    except (OSError, ValueError):
+        return None
+
+
+def check_config(config_file, config_class: type = TDConfig) -> list:
+    """ Check that a config is a JSON file containing the keys of its config
+    class with the expected types
+
+    Args:
+        config_file (str): Path to the config
+        config_class (type, optional): Class of the config. Defaults to
+        TDConfig
+
+    Returns:
+        list: List of the problems found
+    """
+
+    problems = check_file_exists(config_file)
+
+    if problems:
+        return problems
+
+    data = load_json(config_file)
+
+    if data is None:
+        return [f"'{config_file}' is not a valid JSON file"]
+
+    return config_class.get_errors(data)
+
+
+def check_test_directory(test_directory, config_file) -> list:
+    """ Check that the sheet and the columns given in the config are found in
+    the first rows of the test directory
+
+    Args:
+        test_directory (str): Path to the test directory
+        config_file (str): Path to the test directory parser config
+
+    Returns:
+        list: List of the problems found
+    """
+
+    problems = check_file_exists(test_directory)
+
+    if problems:
+        return problems
+
+    data = load_json(config_file)
+
+    # the test directory can't be checked without a valid config, the
+    # problems of the config are reported by its own check
+    if data is None or TDConfig.get_errors(data):
+        return []
+
+    td_config = TDConfig.from_dict(data, config_file)
+
+    try:
+        sample = pd.read_excel(
+            test_directory, sheet_name=td_config["sheet_of_interest"],
+            header=td_config["header_index"], nrows=SAMPLE_ROWS
+        )
+
+    except ValueError as e:
+        return [f"'{test_directory}' can't be read: {e}"]
+
+    missing_columns = [
+        column
+        for column in [
+            td_config["clinical_indication_column_code"],
+            td_config["clinical_indication_column_name"],
+            td_config["panel_column"],
+            td_config["test_method_column"],
+            td_config["ngs_column"]
+        ]
+        if column not in sample.columns
+    ]
+
+    if missing_columns:
+        problems.append(
+            f"the header of the '{td_config['sheet_of_interest']}' sheet "
+            f"(row {td_config['header_index'] + 1}) is missing the following "
+            f"columns: {', '.join(missing_columns)}. Check the header_index "
+            "of the config"
+        )
+
+    elif sample.empty:
+        problems.append(
+            f"the '{td_config['sheet_of_interest']}' sheet has no rows below "
+            "its header"
+        )
+
+    return problems
+
+
+def check_hgnc_dump(hgnc_dump) -> list:
+    """ Check that the HGNC dump has the columns used by the checker and HGNC
+    IDs in its first rows
+
+    Args:
+        hgnc_dump (str): Path to the HGNC dump
+
+    Returns:
+        list: List of the problems found
+    """
+
+    problems = check_file_exists(hgnc_dump)
+
+    if problems:
+        return problems
+
+    sample = pd.read_csv(
+        hgnc_dump, delimiter="\t", nrows=SAMPLE_ROWS, dtype=str
+    )
+
+    missing_columns = [
+        column for column in HGNC_COLUMNS if column not in sample.columns
+    ]
+
+    if missing_columns:
+        problems.append(
+            f"'{hgnc_dump}' is missing the following columns: "
+            f"{', '.join(missing_columns)}. Check the boxes for these columns "
+            "when downloading the HGNC dump"
+        )
+
+    if "HGNC ID" in sample.columns:
+        invalid_ids = [
+            hgnc_id
+            for hgnc_id in sample["HGNC ID"]
+            if not HGNC_ID_PATTERN.match(str(hgnc_id))
+        ]
+
+        if invalid_ids:
+            problems.append(
+                f"the 'HGNC ID' column of '{hgnc_dump}' contains invalid HGNC "
+                f"IDs e.g. '{invalid_ids[0]}'"
+            )
+
+    return problems
+
+
+def check_genepanels(genepanels) -> list:
+    """ Check the number of columns and the HGNC IDs of the first rows of the
+    genepanels file
+
+    Args:
+        genepanels (str): Path to the genepanels file
+
+    Returns:
+        list: List of the problems found
+    """
+
+    problems = check_file_exists(genepanels)
+
+    if problems:
+        return problems
+
+    line_number = 0
+
+    with open(genepanels) as f:
+        for line_number, line in enumerate(f, 1):
+            if line_number > SAMPLE_ROWS:
+                break
+
+            fields = line.rstrip("\r\n").split("\t")
+
+            if len(fields) not in GENEPANELS_NB_COLUMNS:
+                problems.append(
+                    f"line {line_number} of '{genepanels}' has {len(fields)} "
+                    "columns instead of "
+                    f"{' or '.join(map(str, GENEPANELS_NB_COLUMNS))}"
+                )
+
+            elif not HGNC_ID_PATTERN.match(fields[2]):
+                problems.append(
+                    f"line {line_number} of '{genepanels}' has '{fields[2]}' "
+                    "in the gene column instead of an HGNC ID"
+                )
+
+            # one problem per file is enough to spot a malformed file
+            if problems:
+                break
+
+    if line_number == 0:
+        problems.append(f"'{genepanels}' is empty")
+
+    return problems
+
+
+def check_db_snapshot(snapshot_file) -> list:
+    """ Check that the database snapshot contains the arrays written by
+    export_db_snapshot.py. The arrays are not loaded
+
+    Args:
+        snapshot_file (str): Path to the database snapshot
+
+    Returns:
+        list: List of the problems found
+    """
+
+    problems = check_file_exists(snapshot_file)
+
+    if problems:
+        return problems
+
+    try:
+        with np.load(snapshot_file) as snapshot:
+            arrays = snapshot.files
+
+    except (OSError, ValueError) as e:
+        return [f"'{snapshot_file}' is not a database snapshot: {e}"]
+
+    missing_arrays = [
+        array for array in SNAPSHOT_ARRAYS if array not in arrays
+    ]
+
+    if missing_arrays:
+        problems.append(
+            f"'{snapshot_file}' is missing the following arrays: "
+            f"{', '.join(missing_arrays)}. Export it again using "
+            "export_db_snapshot.py"
+        )
+
+    return problems
+
+
+def get_schema_problems(connection) -> list:
+    """ Check that the tables and columns of the database queried by the
+    checker exist
+
+    Args:
+        connection (sqlalchemy.engine.Connection): Connection to the database
+
+    Returns:
+        list: List of the problems found
+    """
+
+    inspector = inspect(connection)
+    tables = set(inspector.get_table_names())
+    problems = []
+
+    for table, columns in DB_SCHEMA.items():
+        if table not in tables:
+            problems.append(f"the '{table}' table is missing")
+            continue
+
+        table_columns = {
+            column["name"] for column in inspector.get_columns(table)
+        }
+        missing_columns = [
+            column for column in columns if column not in table_columns
+        ]
+
+        if missing_columns:
+            problems.append(
+                f"the '{table}' table is missing the following columns: "
+                f"{', '.join(missing_columns)}"
+            )
+
+    return problems
+
+
+async def check_db_schema_async(
+    username: str, pwd: str, db: str, db_type: str
+) -> list:
+    """ Connect to the database and check its schema
+
+    Args:
+        username (str): Username to the database
+        pwd (str): Corresponding password to the username
+        db (str): Database name
+        db_type (str): Database type, either MySQL or SQLite
+
+    Returns:
+        list: List of the problems found
+    """
+
+    engine = create_async_db_engine(
+        username, pwd, db, db_type, DB_CONNECT_TIMEOUT
+    )
+
+    try:
+        async with engine.connect() as conn:
+            return await conn.run_sync(get_schema_problems)
+
+    finally:
+        await engine.dispose()
+
+
+def check_db_schema(
+    username: str, pwd: str, db: str, db_type: str = "mysql"
+) -> list:
+    """ Check that the database can be reached and contains the tables queried
+    by the checker
+
+    Args:
+        username (str): Username to the database
+        pwd (str): Corresponding password to the username
+        db (str): Database name
+        db_type (str, optional): Database type, either MySQL or SQLite.
+        Defaults to "mysql"
+
+    Returns:
+        list: List of the problems found
+    """
+
+    if db_type == "sqlite":
+        problems = check_file_exists(db)
+
+        if problems:
+            return problems
+
+    try:
+        return asyncio.run(check_db_schema_async(username, pwd, db, db_type))
+
+    except Exception as e:
+        return [f"can't connect to the '{db}' database: {e}"]
+
+
+def get_preflight_checks(args: dict, blacklist_config: str) -> dict:
+    """ Get the checks of the inputs of a run of main.py
+
+    Args:
+        args (dict): Command line arguments
+        blacklist_config (str): Path to the blacklist config
+
+    Returns:
+        dict: Dict of the checks, with the name of the input as key and the
+        function and its arguments as value
+    """
+
+    checks = {
+        "config": (check_config, args["config"], TDConfig),
+        "blacklist config": (check_config, blacklist_config, BlacklistConfig),
+        "test directory": (
+            check_test_directory, args["test_directory"], args["config"]
+        ),
+        "HGNC dump": (check_hgnc_dump, args["hgnc_dump"]),
+        "genepanels": (check_genepanels, args["genepanels"]),
+    }
+
+    if args["db_snapshot"]:
+        checks["database snapshot"] = (check_db_snapshot, args["db_snapshot"])
+    else:
+        checks["database"] = (
+            check_db_schema, args["db_user"], args["db_password"],
+            args["db_name"]
+        )
+
+    return checks
+
+
+def run_preflight_checks(checks: dict, max_workers: int = None) -> list:
+    """ Run the checks of the inputs in parallel. Every check only reads the
+    beginning of its input so that the problems are found in a few seconds
+
+    Args:
+        checks (dict): Dict of the checks, with the name of the input as key
+        and the function and its arguments as value
+        max_workers (int, optional): Number of threads. Defaults to None i.e.
+        one thread per check
+
+    Returns:
+        list: List of the problems found, prefixed with the name of the input
+    """
+
+    max_workers = max_workers or max(len(checks), 1)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            name: executor.submit(function, *args)
+            for name, (function, *args) in checks.items()
+        }
+
+    problems = []
+
+    # every problem is reported, including the errors of the checks
+    for name, future in futures.items():
+        try:
+            check_problems = future.result()
+        except Exception as e:
+            check_problems = [f"the check failed: {e!r}"]
+
+        problems.extend(f"{name}: {problem}" for problem in check_problems)
+
+    return problems
+
+
+def check_inputs(args: dict, blacklist_config: str):
+    """ Check the inputs of a run of main.py before any stage is run and
+    report all the problems found at once
+
+    Args:
+        args (dict): Command line arguments
+        blacklist_config (str): Path to the blacklist config
+    """
+
+    start = time.perf_counter()
+    problems = run_preflight_checks(
+        get_preflight_checks(args, blacklist_config)
+    )
+
+    assert not problems, (
+        "The inputs of the run have the following problems:\n- " +
+        "\n- ".join(problems)
+    )
+
+    logger.info(
+        "Checked the inputs in %.2fs", time.perf_counter() - start,
+        extra={"stage": "preflight"}
+    )
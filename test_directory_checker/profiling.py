@@ -0,0 +1,183 @@
+import functools
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# environment variable to turn on profiling without the command line flag
+PROFILING_ENV_VARIABLE = "TD_CHECKER_PROFILE"
+
+
+class Profiler:
+    """ Count the calls, cache hits and cumulative time of the instrumented
+    functions and keep the timed events for the Chrome trace export
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get(
+            PROFILING_ENV_VARIABLE, ""
+        ).lower() not in ("", "0", "false")
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """ Remove all the recorded data """
+
+        self.calls = {}
+        self.cache_hits = {}
+        self.total_time = {}
+        self.events = []
+        self.origin = time.perf_counter_ns()
+
+    def record(self, name: str, start: int, end: int):
+        """ Record a timed call
+
+        Args:
+            name (str): Name of the instrumented function or block
+            start (int): Start of the call from time.perf_counter_ns
+            end (int): End of the call from time.perf_counter_ns
+        """
+
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            self.total_time[name] = self.total_time.get(name, 0) + end - start
+            self.events.append((name, start, end, threading.get_ident()))
+
+    def count_cache_hit(self, name: str, hits: int = 1):
+        """ Count cache hits for the given name
+
+        Args:
+            name (str): Name of the instrumented function or block
+            hits (int, optional): Number of cache hits. Defaults to 1
+        """
+
+        if not self.enabled:
+            return
+
+        with self.lock:
+            self.cache_hits[name] = self.cache_hits.get(name, 0) + hits
+
+    def summary(self) -> pd.DataFrame:
+        """ Get the summary table of the recorded data
+
+        Returns:
+            pd.DataFrame: Dataframe with the number of calls, cache hits,
+            cumulative and mean time in seconds per instrumented name, sorted
+            by cumulative time
+        """
+
+        names = sorted(set(self.calls) | set(self.cache_hits))
+        summary_df = pd.DataFrame(
+            {
+                "name": names,
+                "calls": [self.calls.get(name, 0) for name in names],
+                "cache_hits": [self.cache_hits.get(name, 0) for name in names],
+                "total_time": [
+                    self.total_time.get(name, 0) / 1e9 for name in names
+                ],
+            }
+        )
+        summary_df["mean_time"] = (
+            summary_df["total_time"] / summary_df["calls"].where(
+                summary_df["calls"] > 0
+            )
+        )
+
+        return summary_df.sort_values(
+            "total_time", ascending=False
+        ).reset_index(drop=True)
+
+    def log_summary(self):
+        """ Log the summary table, the rows are also passed as an extra field
+        for the JSON log
+        """
+
+        summary_df = self.summary()
+
+        logger.info(
+            "Profiling summary:\n%s", summary_df.to_string(index=False),
+            extra={"profile": summary_df.to_dict("records")}
+        )
+
+    def export_chrome_trace(self, trace_file: Path):
+        """ Write the recorded events in the Chrome trace event format which
+        can be opened in chrome://tracing or https://ui.perfetto.dev
+
+        Args:
+            trace_file (Path): Path to the JSON file to write
+        """
+
+        pid = os.getpid()
+
+        trace_events = [
+            {
+                "name": name, "ph": "X", "pid": pid, "tid": tid,
+                "ts": (start - self.origin) / 1000,
+                "dur": (end - start) / 1000,
+            }
+            for name, start, end, tid in self.events
+        ]
+
+        with open(trace_file, "w") as f:
+            json.dump({"traceEvents": trace_events}, f)
+
+
+PROFILER = Profiler()
+
+
+class track:
+    """ Context manager timing a block of code when profiling is on
+
+    Args:
+        name (str): Name of the block in the summary and trace
+    """
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if PROFILER.enabled:
+            self.start = time.perf_counter_ns()
+
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            PROFILER.record(self.name, self.start, time.perf_counter_ns())
+
+
+def profile(func):
+    """ Decorator timing every call of a function when profiling is on. When
+    it is off, the only cost is checking the flag
+
+    Args:
+        func (Callable): Function to instrument
+
+    Returns:
+        Callable: Instrumented function
+    """
+
+    name = f"{func.__module__.split('.')[-1]}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not PROFILER.enabled:
+            return func(*args, **kwargs)
+
+        start = time.perf_counter_ns()
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            PROFILER.record(name, start, time.perf_counter_ns())
+
+    return wrapper
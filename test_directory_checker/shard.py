@@ -0,0 +1,447 @@
+import os
+from pathlib import Path
+import pickle
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from test_directory_checker import identify, utils
+
+# name of the file containing the partial results of a shard in its run folder
+SHARD_RESULTS_FILE = "shard_{}_of_{}.pkl"
+
+
+def parse_shard(shard: str) -> tuple:
+    """ Parse the shard given on the command line i.e. 2/4 --> (2, 4)
+
+    Args:
+        shard (str): Shard in the "i/N" format, with i between 1 and N
+
+    Returns:
+        tuple: Index of the shard and number of shards
+    """
+
+    shard_index, _, nb_shards = shard.partition("/")
+
+    assert shard_index.isdigit() and nb_shards.isdigit(), (
+        f"'{shard}' is not in the i/N format"
+    )
+
+    shard_index, nb_shards = int(shard_index), int(nb_shards)
+
+    assert 1 <= shard_index <= nb_shards, (
+        f"Shard index {shard_index} is not between 1 and {nb_shards}"
+    )
+
+    return shard_index, nb_shards
+
+
+def get_shard_mask(
+    test_ids: pd.Series, shard_index: int, nb_shards: int
+) -> np.ndarray:
+    """ Get the tests belonging to a shard. The tests are split using the
+    CRC32 of their clinical indication code i.e. R130.1 --> R130 so that the
+    tests sharing a clinical indication code are compared in the same shard
+
+    Args:
+        test_ids (pd.Series): Test IDs
+        shard_index (int): Index of the shard, between 1 and nb_shards
+        nb_shards (int): Number of shards
+
+    Returns:
+        np.ndarray: Boolean array of the tests belonging to the shard
+    """
+
+    ci_codes = test_ids.astype(str).str.split(".").str[0]
+
+    return np.fromiter(
+        (
+            zlib.crc32(ci_code.encode()) % nb_shards == shard_index - 1
+            for ci_code in ci_codes
+        ), dtype=bool, count=len(ci_codes)
+    )
+
+
+def select_td_shard(
+    td_data: pd.DataFrame, shard_index: int, nb_shards: int
+) -> pd.DataFrame:
+    """ Select the tests of the test directory belonging to a shard. The
+    index of the rows is kept to put the tests back in order when merging
+
+    Args:
+        td_data (pd.DataFrame): Dataframe with the test directory data
+        shard_index (int): Index of the shard, between 1 and nb_shards
+        nb_shards (int): Number of shards
+
+    Returns:
+        pd.DataFrame: Dataframe with the tests of the shard
+    """
+
+    return td_data[get_shard_mask(td_data["Test ID"], shard_index, nb_shards)]
+
+
+def select_genepanels_shard(
+    genepanels_df: pd.DataFrame, shard_index: int, nb_shards: int
+) -> pd.DataFrame:
+    """ Select the clinical indications of the genepanels data belonging to a
+    shard. The index of the rows is kept to put the clinical indications back
+    in order when merging
+
+    Args:
+        genepanels_df (pd.DataFrame): Dataframe with genepanels data
+        shard_index (int): Index of the shard, between 1 and nb_shards
+        nb_shards (int): Number of shards
+
+    Returns:
+        pd.DataFrame: Dataframe with the clinical indications of the shard
+    """
+
+    ci_keys = utils.build_ci_key_table(genepanels_df)
+    shard_cis = ci_keys.loc[
+        get_shard_mask(ci_keys["test_id"], shard_index, nb_shards),
+        "gemini_name"
+    ]
+    return genepanels_df[genepanels_df["ci"].isin(shard_cis)]
+
+
+def get_ci_positions(genepanels_df: pd.DataFrame) -> pd.Series:
+    """ Get the position of the clinical indications in the genepanels file
+    i.e. the index of their first row
+
+    Args:
+        genepanels_df (pd.DataFrame): Dataframe with genepanels data
+
+    Returns:
+        pd.Series: Series with the gemini names as index and their position as
+        values
+    """
+
+    return genepanels_df.index.to_series().groupby(
+        genepanels_df["ci"].to_numpy(), sort=False
+    ).min()
+
+
+def write_shard_results(
+    run_folder: Path, shard_index: int, nb_shards: int, results: dict
+) -> Path:
+    """ Write the partial results of a shard in its run folder
+
+    Args:
+        run_folder (Path): Output folder of the run
+        shard_index (int): Index of the shard, between 1 and nb_shards
+        nb_shards (int): Number of shards
+        results (dict): Dict of the result tables of the shard
+
+    Returns:
+        Path: Path to the shard results file
+    """
+
+    shard_file = Path(run_folder) / SHARD_RESULTS_FILE.format(
+        shard_index, nb_shards
+    )
+    tmp_shard_file = shard_file.with_name(f".{shard_file.name}.tmp")
+
+    with open(tmp_shard_file, "wb") as f:
+        pickle.dump(
+            {
+                "shard_index": shard_index, "nb_shards": nb_shards,
+                "results": results
+            }, f, protocol=pickle.HIGHEST_PROTOCOL
+        )
+
+    # the shard results are only complete once moved
+    os.replace(tmp_shard_file, shard_file)
+
+    return shard_file
+
+
+def load_shard_results(shard_files: list) -> list:
+    """ Load the partial results of every shard of a run and check that none
+    is missing
+
+    Args:
+        shard_files (list): Paths to the shard results files
+
+    Returns:
+        list: List of the result dicts of the shards ordered by shard index
+    """
+
+    shards = {}
+
+    for shard_file in shard_files:
+        with open(shard_file, "rb") as f:
+            shard = pickle.load(f)
+
+        assert shard["shard_index"] not in shards, (
+            f"Shard {shard['shard_index']} is given more than once"
+        )
+        shards[shard["shard_index"]] = shard
+
+    nb_shards = {shard["nb_shards"] for shard in shards.values()}
+
+    assert len(nb_shards) == 1, (
+        f"The shards come from runs with different numbers of shards: "
+        f"{sorted(nb_shards)}"
+    )
+
+    missing_shards = set(range(1, nb_shards.pop() + 1)).difference(shards)
+
+    assert not missing_shards, f"Missing shards: {sorted(missing_shards)}"
+
+    return [shards[shard_index]["results"] for shard_index in sorted(shards)]
+
+
+def concat_tables(tables: list) -> pd.DataFrame:
+    """ Concatenate the tables of the shards. Empty tables are skipped so that
+    they don't change the dtypes of the columns
+
+    Args:
+        tables (list): List of dataframes
+
+    Returns:
+        pd.DataFrame: Concatenated dataframe
+    """
+
+    non_empty_tables = [table for table in tables if not table.empty]
+
+    if not non_empty_tables:
+        return tables[0]
+
+    return pd.concat(non_empty_tables)
+
+
+def merge_comparison_tables(tables: list, ci_positions: list) -> pd.DataFrame:
+    """ Merge the identical, removed or replaced tests of the shards in the
+    order of the clinical indications in the genepanels file
+
+    Args:
+        tables (list): List of the dataframes of the shards
+        ci_positions (list): List of the positions of the clinical indications
+        of the shards
+
+    Returns:
+        pd.DataFrame: Merged dataframe
+    """
+
+    merged_table = concat_tables(tables)
+    positions = merged_table["gemini_name"].map(pd.concat(ci_positions))
+
+    # the rows of a clinical indication come from the same shard and stay in
+    # their order
+    return merged_table.iloc[
+        np.argsort(positions.to_numpy(), kind="stable")
+    ].reset_index(drop=True)
+
+
+def merge_td_tables(tables: list) -> pd.DataFrame:
+    """ Merge the tables of the shards which rows are tests of the test
+    directory, in the order of the test directory
+
+    Args:
+        tables (list): List of the dataframes of the shards
+
+    Returns:
+        pd.DataFrame: Merged dataframe
+    """
+
+    return concat_tables(tables).sort_index()
+
+
+def merge_new_test_methods(
+    test_method_data: pd.DataFrame, tables: list
+) -> pd.DataFrame:
+    """ Merge the new test methods of the shards. The tests of a test method
+    can come from several shards so they are grouped again
+
+    Args:
+        test_method_data (pd.DataFrame): Merged test method data in the order
+        of the test directory
+        tables (list): List of the new test methods dataframes of the shards
+
+    Returns:
+        pd.DataFrame: Dataframe with the new test methods and their tests
+    """
+
+    new_test_methods = {
+        test_method for table in tables for test_method in table.index
+    }
+    reformatted_test_method_data = test_method_data.groupby(
+        "Test Method"
+    ).agg({"Test ID": list, "Closest test methods": "first"})
+
+    return reformatted_test_method_data[
+        reformatted_test_method_data.index.isin(new_test_methods)
+    ]
+
+
+def merge_presence_in_db(tables: list) -> pd.DataFrame:
+    """ Merge the presence of the genes in the database of the shards. Genes
+    shared by tests of several shards are only kept once
+
+    Args:
+        tables (list): List of the dataframes of the shards
+
+    Returns:
+        pd.DataFrame: Merged dataframe sorted by gene
+    """
+
+    return concat_tables(tables).drop_duplicates("gene").sort_values(
+        "gene"
+    ).reset_index(drop=True)
+
+
+def merge_panel_changes(
+    target_data: pd.DataFrame, tables: list
+) -> pd.DataFrame:
+    """ Merge the panel changes of the shards. The tests using the panels are
+    looked for again in the merged test directory data
+
+    Args:
+        target_data (pd.DataFrame): Merged target data in the order of the
+        test directory
+        tables (list): List of the dataframes of the shards
+
+    Returns:
+        pd.DataFrame: Merged dataframe sorted by panel ID
+    """
+
+    panel_changes = concat_tables(tables).drop_duplicates(
+        "panel_id"
+    ).sort_values("panel_id").reset_index(drop=True)
+    panel_changes["tests"] = [
+        ", ".join(
+            utils.get_tests_using_panels(target_data, [panel_id])["Test ID"]
+        )
+        for panel_id in panel_changes["panel_id"]
+    ]
+
+    return panel_changes
+
+
+def merge_unresolved_symbols(
+    target_data: pd.DataFrame, tables: list
+) -> pd.DataFrame:
+    """ Merge the unresolved and ambiguous symbols of the shards. The symbols
+    and their tests are ordered like checker.find_unresolved_symbols does for
+    the whole test directory
+
+    Args:
+        target_data (pd.DataFrame): Merged target data in the order of the
+        test directory
+        tables (list): List of the dataframes of the shards
+
+    Returns:
+        pd.DataFrame: Dataframe with the unresolved and ambiguous symbols, the
+        tests using them, the closest HGNC symbols and the HGNC ids
+    """
+
+    # a symbol is unresolved or ambiguous whatever the shard it was found in
+    reported_symbols = {
+        symbol: (candidates, hgnc_ids)
+        for table in tables
+        for symbol, candidates, hgnc_ids in zip(
+            table["Symbol"], table["Closest symbols"], table["HGNC IDs"]
+        )
+    }
+
+    codes, unique_targets = pd.factorize(
+        target_data["Target/Genes"], use_na_sentinel=False
+    )
+    tests_per_target = {}
+
+    for code, test_id in zip(codes, target_data["Test ID"]):
+        tests_per_target.setdefault(code, []).append(test_id)
+
+    tests_per_symbol = {}
+
+    for code, target in enumerate(unique_targets):
+        for symbol in identify.get_gene_symbols(target):
+            if symbol in reported_symbols:
+                tests_per_symbol.setdefault(symbol, []).extend(
+                    tests_per_target[code]
+                )
+
+    return pd.DataFrame(
+        {
+            "Symbol": list(tests_per_symbol),
+            "Test ID": list(tests_per_symbol.values()),
+            "Closest symbols": [
+                reported_symbols[symbol][0] for symbol in tests_per_symbol
+            ],
+            "HGNC IDs": [
+                reported_symbols[symbol][1] for symbol in tests_per_symbol
+            ],
+        },
+        columns=["Symbol", "Test ID", "Closest symbols", "HGNC IDs"]
+    )
+
+
+def merge_shard_results(shard_results: list) -> dict:
+    """ Merge the partial results of the shards into the results of a run on
+    the whole test directory and genepanels file
+
+    Args:
+        shard_results (list): List of the result dicts of the shards
+
+    Returns:
+        dict: Dict of the merged result tables
+    """
+
+    def get_tables(name):
+        return [results[name] for results in shard_results]
+
+    assert all(
+        results["input_hashes"] == shard_results[0]["input_hashes"]
+        for results in shard_results
+    ), "The shards were run on different inputs"
+
+    target_data = merge_td_tables(get_tables("targets"))
+    test_method_data = merge_td_tables(get_tables("test_methods"))
+    ci_positions = get_tables("ci_positions")
+
+    merged_results = {
+        "identical_tests": merge_comparison_tables(
+            get_tables("identical_tests"), ci_positions
+        ),
+        "removed_tests": merge_comparison_tables(
+            get_tables("removed_tests"), ci_positions
+        ),
+        "replaced_tests": merge_comparison_tables(
+            get_tables("replaced_tests"), ci_positions
+        ),
+        "new_cis": merge_td_tables(get_tables("new_cis")),
+        "new_test_methods": merge_new_test_methods(
+            test_method_data, get_tables("new_test_methods")
+        ),
+        "presence_in_db": merge_presence_in_db(get_tables("presence_in_db")),
+        "panel_changes": merge_panel_changes(
+            target_data, get_tables("panel_changes")
+        ),
+        "unresolved_symbols": merge_unresolved_symbols(
+            target_data, get_tables("unresolved_symbols")
+        ),
+        "targets": target_data,
+        "test_methods": test_method_data,
+        # data of the whole run for the store
+        "panels": {
+            panel_id: panel
+            for panels in get_tables("panels")
+            for panel_id, panel in panels.items()
+        },
+        "gene_table": concat_tables(get_tables("gene_table")),
+        # every shard has the symbol table of the whole HGNC dump
+        "symbol_table": shard_results[0]["symbol_table"],
+        "genepanels": concat_tables(get_tables("genepanels")).sort_index(),
+        # the inputs are the same for every shard
+        "inputs": shard_results[0]["inputs"],
+        "input_hashes": shard_results[0]["input_hashes"],
+    }
+
+    # sort data from the dataframes using the same columns as main.py
+    for name in ["new_cis", "targets", "test_methods"]:
+        merged_results[name] = merged_results[name].sort_values(
+            ["Test Method", "Test ID"]
+        )
+
+    return merged_results
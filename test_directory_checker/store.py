@@ -0,0 +1,688 @@
+from pathlib import Path
+from typing import Iterable
+
+import pandas as pd
+from sqlalchemy import create_engine, inspect, text
+
+from test_directory_checker.utils import get_date, get_file_hash
+
+# result tables of a run and their key column, indexed with the run id
+RESULT_TABLES = {
+    "targets": "Test ID",
+    "test_methods": "Test ID",
+    "identical_tests": "gemini_name",
+    "removed_tests": "gemini_name",
+    "replaced_tests": "gemini_name",
+    "presence_in_db": "gene",
+}
+
+
+def create_store_engine(store: Path):
+    """ Create the engine for the SQLite store and the tables for the runs if
+    they don't exist
+
+    Args:
+        store (Path): Path to the SQLite store
+
+    Returns:
+        sqlalchemy.engine.Engine: Engine for the store
+    """
+
+    engine = create_engine(f"sqlite:///{store}")
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "run_id INTEGER PRIMARY KEY AUTOINCREMENT, date TEXT NOT NULL, "
+            "output_folder TEXT, command_line TEXT)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS run_inputs ("
+            "run_id INTEGER NOT NULL REFERENCES runs (run_id), "
+            "input TEXT NOT NULL, path TEXT NOT NULL, sha256 TEXT NOT NULL)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_run_inputs_run_id "
+            "ON run_inputs (run_id)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_run_inputs_sha256 "
+            "ON run_inputs (sha256)"
+        ))
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS panel_versions ("
+            "panel_version_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "panel_id INTEGER NOT NULL, version TEXT NOT NULL, "
+            "date TEXT NOT NULL, UNIQUE (panel_id, version))"
+        ))
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS panel_genes ("
+            "panel_version_id INTEGER NOT NULL "
+            "REFERENCES panel_versions (panel_version_id), "
+            "hgnc_id TEXT NOT NULL)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_panel_genes_panel_version_id "
+            "ON panel_genes (panel_version_id)"
+        ))
+
+    return engine
+
+
+def create_read_only_store_engine(store: Path):
+    """ Create a read-only engine for an existing SQLite store so that reading
+    a mistyped store doesn't create an empty one
+
+    Args:
+        store (Path): Path to the SQLite store
+
+    Returns:
+        sqlalchemy.engine.Engine: Read-only engine for the store
+    """
+
+    assert Path(store).is_file(), f"'{store}' doesn't exist"
+
+    return create_engine(f"sqlite:///file:{store}?mode=ro&uri=true")
+
+
+def write_gene_index(
+    store: Path, run_id: int, gene_table: pd.DataFrame,
+    symbol_table: pd.DataFrame, genepanels_df: pd.DataFrame = None
+):
+    """ Write the reverse index of the genes to the tests of the test
+    directory and the clinical indications of the genepanels file, replacing
+    the index of the previous run
+
+    Args:
+        store (Path): Path to the SQLite store
+        run_id (int): ID of the run
+        gene_table (pd.DataFrame): Gene table of the test directory from
+        utils.build_td_gene_table
+        symbol_table (pd.DataFrame): Symbol table from
+        identify.build_symbol_table
+        genepanels_df (pd.DataFrame, optional): Dataframe with the genepanels
+        data. Defaults to None i.e. only the test directory is indexed
+    """
+
+    tables = [
+        pd.DataFrame(
+            {
+                "hgnc_id": gene_table["HGNC ID"].to_numpy(),
+                "origin": "test_directory",
+                "test": gene_table["Test ID"].to_numpy(),
+                "source": gene_table["source"].to_numpy(),
+            }
+        )
+    ]
+
+    if genepanels_df is not None:
+        tables.append(
+            pd.DataFrame(
+                {
+                    "hgnc_id": genepanels_df["gene"].to_numpy(),
+                    "origin": "genepanels",
+                    "test": genepanels_df["ci"].to_numpy(),
+                    "source": genepanels_df["panel"].to_numpy(),
+                }
+            )
+        )
+
+    gene_index = pd.concat(tables, ignore_index=True).drop_duplicates()
+    gene_index.insert(0, "run_id", run_id)
+
+    # only keep the symbols of the indexed genes
+    gene_symbols = symbol_table[
+        symbol_table["HGNC ID"].isin(gene_index["hgnc_id"])
+    ].reset_index().rename(
+        columns={"Symbol": "symbol", "HGNC ID": "hgnc_id", "Kind": "kind"}
+    )[["symbol", "hgnc_id", "kind"]]
+
+    engine = create_store_engine(store)
+
+    with engine.begin() as conn:
+        gene_index.to_sql("gene_index", conn, if_exists="replace", index=False)
+        gene_symbols.to_sql(
+            "gene_symbols", conn, if_exists="replace", index=False
+        )
+        conn.execute(text(
+            "CREATE INDEX ix_gene_index_hgnc_id ON gene_index (hgnc_id)"
+        ))
+        # symbols are matched ignoring the case e.g. C1orf112
+        conn.execute(text(
+            "CREATE INDEX ix_gene_symbols_symbol ON gene_symbols "
+            "(symbol COLLATE NOCASE)"
+        ))
+
+    engine.dispose()
+
+
+def query_gene(store: Path, gene: str) -> pd.DataFrame:
+    """ Get the tests and clinical indications containing a gene from the
+    reverse index of the latest run
+
+    Args:
+        store (Path): Path to the SQLite store
+        gene (str): HGNC ID or approved, previous or alias symbol
+
+    Returns:
+        pd.DataFrame: Dataframe with the HGNC ID and approved symbol of the
+        gene, and the origin (test_directory or genepanels), test and source
+        (Panelapp panel, "direct" or genepanels panel) of every entry
+    """
+
+    columns = ["hgnc_id", "symbol", "origin", "test", "source"]
+    gene = gene.strip()
+
+    # symbols keep their case, only the prefix of the HGNC IDs is normalised
+    if gene.upper().startswith("HGNC:"):
+        gene = f"HGNC:{gene[5:]}"
+
+    engine = create_read_only_store_engine(store)
+
+    if not inspect(engine).has_table("gene_index"):
+        engine.dispose()
+        return pd.DataFrame(columns=columns)
+
+    with engine.connect() as conn:
+        entries = pd.read_sql(
+            text(
+                "SELECT gene_index.hgnc_id, gene_symbols.symbol, "
+                "gene_index.origin, gene_index.test, gene_index.source "
+                "FROM gene_index LEFT JOIN gene_symbols ON "
+                "gene_symbols.hgnc_id = gene_index.hgnc_id AND "
+                "gene_symbols.kind = 'approved' "
+                "WHERE gene_index.hgnc_id = :gene OR gene_index.hgnc_id IN "
+                "(SELECT hgnc_id FROM gene_symbols WHERE symbol = :gene "
+                "COLLATE NOCASE) "
+                "ORDER BY gene_index.hgnc_id, gene_index.origin DESC, "
+                "gene_index.test, gene_index.source"
+            ),
+            conn, params={"gene": gene}
+        )
+
+    engine.dispose()
+    return entries[columns]
+
+
+def format_table_for_store(df: pd.DataFrame) -> pd.DataFrame:
+    """ Convert the list columns of a result table to strings so that they
+    can be stored
+
+    Args:
+        df (pd.DataFrame): Result table
+
+    Returns:
+        pd.DataFrame: Result table with list columns joined by commas
+    """
+
+    df = df.reset_index(drop=True)
+
+    for column in df.columns[df.dtypes == object]:
+        is_list = df[column].map(
+            lambda x: isinstance(x, (list, tuple, set))
+        )
+
+        if is_list.any():
+            df[column] = df[column].map(
+                lambda x: ", ".join(map(str, x))
+                if isinstance(x, (list, tuple, set)) else x
+            )
+
+    return df
+
+
+def add_missing_columns(conn, table_name: str, df: pd.DataFrame):
+    """ Add the columns of a result table missing from its table in the store
+    so that the results of a newer version of the checker can be appended to
+    a store created by an older one
+
+    Args:
+        conn (sqlalchemy.engine.Connection): Connection to the store
+        table_name (str): Name of the result table
+        df (pd.DataFrame): Result table to append
+    """
+
+    inspector = inspect(conn)
+
+    # the table is created by to_sql with all the columns
+    if not inspector.has_table(table_name):
+        return
+
+    table_columns = {
+        column["name"] for column in inspector.get_columns(table_name)
+    }
+
+    for column, dtype in df.dtypes.items():
+        if column in table_columns:
+            continue
+
+        column_type = {
+            "b": "INTEGER", "i": "INTEGER", "u": "INTEGER", "f": "REAL"
+        }.get(dtype.kind, "TEXT")
+        conn.execute(text(
+            f'ALTER TABLE "{table_name}" ADD COLUMN "{column}" {column_type}'
+        ))
+
+
+def get_input_hashes(inputs: dict) -> dict:
+    """ Hash the input files of a run
+
+    Args:
+        inputs (dict): Dict of input names and paths to the input files, None
+        paths are skipped
+
+    Returns:
+        dict: Dict of input names and SHA256 of the input files
+    """
+
+    return {
+        input_name: get_file_hash(path)
+        for input_name, path in inputs.items()
+        if path is not None
+    }
+
+
+def write_run(
+    store: Path, output_folder: Path, command_line: str, inputs: dict,
+    tables: dict, input_hashes: dict = None
+) -> int:
+    """ Write the results of a run in the store along with the run metadata
+
+    Args:
+        store (Path): Path to the SQLite store
+        output_folder (Path): Output folder of the run
+        command_line (str): Command line of the run
+        inputs (dict): Dict of input names and paths to the input files which
+        get hashed
+        tables (dict): Dict of result table names and dataframes, None
+        dataframes are skipped
+        input_hashes (dict, optional): Dict of input names and SHA256 of the
+        input files from get_input_hashes. Defaults to None i.e. the input
+        files are hashed
+
+    Returns:
+        int: ID of the run in the store
+    """
+
+    if input_hashes is None:
+        input_hashes = get_input_hashes(inputs)
+
+    engine = create_store_engine(store)
+
+    with engine.begin() as conn:
+        run_id = conn.execute(
+            text(
+                "INSERT INTO runs (date, output_folder, command_line) "
+                "VALUES (:date, :output_folder, :command_line)"
+            ),
+            {
+                "date": get_date(), "output_folder": str(output_folder),
+                "command_line": command_line
+            }
+        ).lastrowid
+
+        for input_name, path in inputs.items():
+            if path is None:
+                continue
+
+            conn.execute(
+                text(
+                    "INSERT INTO run_inputs (run_id, input, path, sha256) "
+                    "VALUES (:run_id, :input, :path, :sha256)"
+                ),
+                {
+                    "run_id": run_id, "input": input_name, "path": str(path),
+                    "sha256": input_hashes[input_name]
+                }
+            )
+
+        for table_name, df in tables.items():
+            assert table_name in RESULT_TABLES, (
+                f"'{table_name}' is not one of {', '.join(RESULT_TABLES)}"
+            )
+
+            if df is None:
+                continue
+
+            df = format_table_for_store(df)
+            df.insert(0, "run_id", run_id)
+            add_missing_columns(conn, table_name, df)
+            df.to_sql(table_name, conn, if_exists="append", index=False)
+            conn.execute(text(
+                f'CREATE INDEX IF NOT EXISTS "ix_{table_name}_run_id" ON '
+                f'"{table_name}" (run_id, "{RESULT_TABLES[table_name]}")'
+            ))
+
+    engine.dispose()
+
+    return run_id
+
+
+def get_runs(store: Path) -> pd.DataFrame:
+    """ Get the runs in the store
+
+    Args:
+        store (Path): Path to the SQLite store
+
+    Returns:
+        pd.DataFrame: Dataframe with the metadata of the runs
+    """
+
+    engine = create_store_engine(store)
+
+    with engine.connect() as conn:
+        runs = pd.read_sql(text("SELECT * FROM runs ORDER BY run_id"), conn)
+
+    engine.dispose()
+    return runs
+
+
+def get_run_table(store: Path, table_name: str, run_id: int) -> pd.DataFrame:
+    """ Get a result table for a run
+
+    Args:
+        store (Path): Path to the SQLite store
+        table_name (str): Name of the result table
+        run_id (int): ID of the run
+
+    Returns:
+        pd.DataFrame: Result table of the run
+    """
+
+    assert table_name in RESULT_TABLES, (
+        f"'{table_name}' is not one of {', '.join(RESULT_TABLES)}"
+    )
+
+    engine = create_store_engine(store)
+
+    # result tables are only created when a run has data for them
+    if not inspect(engine).has_table(table_name):
+        engine.dispose()
+        return pd.DataFrame()
+
+    with engine.connect() as conn:
+        df = pd.read_sql(
+            text(f'SELECT * FROM "{table_name}" WHERE run_id = :run_id'),
+            conn, params={"run_id": int(run_id)}
+        )
+
+    engine.dispose()
+    return df.drop(columns="run_id")
+
+
+def get_changes_since_last_run(
+    store: Path, table_name: str, run_id: int = None
+) -> pd.DataFrame:
+    """ Get the rows of a result table that changed between a run and the run
+    before it
+
+    Args:
+        store (Path): Path to the SQLite store
+        table_name (str): Name of the result table
+        run_id (int, optional): ID of the run. Defaults to None i.e. the
+        latest run
+
+    Returns:
+        pd.DataFrame: Dataframe with the rows that appeared ("added") or
+        disappeared ("removed") in the "change" column
+    """
+
+    run_ids = get_runs(store)["run_id"]
+
+    if run_id is None:
+        run_id = run_ids.max()
+
+    previous_run_ids = run_ids[run_ids < run_id]
+
+    current_df = get_run_table(store, table_name, run_id)
+
+    if previous_run_ids.empty:
+        return current_df.assign(change="added")
+
+    previous_df = get_run_table(store, table_name, previous_run_ids.max())
+
+    if previous_df.empty or current_df.empty:
+        return pd.concat(
+            [
+                previous_df.assign(change="removed"),
+                current_df.assign(change="added")
+            ], ignore_index=True
+        )
+
+    merged_df = previous_df.merge(current_df, how="outer", indicator=True)
+    changes = merged_df[merged_df["_merge"] != "both"].copy()
+    changes["change"] = changes["_merge"].map(
+        {"left_only": "removed", "right_only": "added"}
+    ).astype(str)
+
+    return changes.drop(columns="_merge").reset_index(drop=True)
+
+
+def get_trend(store: Path, table_name: str) -> pd.DataFrame:
+    """ Get the number of rows of a result table for every run
+
+    Args:
+        store (Path): Path to the SQLite store
+        table_name (str): Name of the result table
+
+    Returns:
+        pd.DataFrame: Dataframe with the run id, date and number of rows
+    """
+
+    assert table_name in RESULT_TABLES, (
+        f"'{table_name}' is not one of {', '.join(RESULT_TABLES)}"
+    )
+
+    engine = create_store_engine(store)
+
+    if not inspect(engine).has_table(table_name):
+        engine.dispose()
+        return get_runs(store)[["run_id", "date"]].assign(nb_rows=0)
+
+    with engine.connect() as conn:
+        trend = pd.read_sql(
+            text(
+                "SELECT runs.run_id, runs.date, COUNT(results.run_id) AS "
+                f'nb_rows FROM runs LEFT JOIN "{table_name}" AS results ON '
+                "runs.run_id = results.run_id GROUP BY runs.run_id "
+                "ORDER BY runs.run_id"
+            ),
+            conn
+        )
+
+    engine.dispose()
+    return trend
+
+
+def write_panel_versions(
+    store: Path, signedoff_panels: dict, panel_ids: Iterable
+):
+    """ Write the gene content of the current version of the given panels in
+    the store if that version isn't stored yet
+
+    Args:
+        store (Path): Path to the SQLite store
+        signedoff_panels (dict): Dict containing Panelapp IDs as keys and panel
+        objects as values
+        panel_ids (Iterable): Panelapp IDs of the panels to store
+    """
+
+    engine = create_store_engine(store)
+
+    with engine.begin() as conn:
+        for panel_id in panel_ids:
+            panel = signedoff_panels[int(panel_id)]
+
+            panel_version = {
+                "panel_id": int(panel_id), "version": panel.get_version()
+            }
+
+            inserted = conn.execute(
+                text(
+                    "INSERT OR IGNORE INTO panel_versions "
+                    "(panel_id, version, date) "
+                    "VALUES (:panel_id, :version, :date)"
+                ),
+                {**panel_version, "date": get_date()}
+            ).rowcount == 1
+
+            # the version was already stored. lastrowid is not reset by an
+            # ignored insert so the id is selected using the version
+            if not inserted:
+                continue
+
+            panel_version_id = conn.execute(
+                text(
+                    "SELECT panel_version_id FROM panel_versions "
+                    "WHERE panel_id = :panel_id AND version = :version"
+                ),
+                panel_version
+            ).scalar_one()
+
+            genes = {gene["hgnc_id"] for gene in panel.get_genes()}
+
+            if genes:
+                conn.execute(
+                    text(
+                        "INSERT INTO panel_genes (panel_version_id, hgnc_id) "
+                        "VALUES (:panel_version_id, :hgnc_id)"
+                    ),
+                    [
+                        {"panel_version_id": panel_version_id, "hgnc_id": gene}
+                        for gene in sorted(genes)
+                    ]
+                )
+
+    engine.dispose()
+
+
+def get_panel_genes(store: Path, panel_id: int, version: str) -> set:
+    """ Get the genes of a stored panel version
+
+    Args:
+        store (Path): Path to the SQLite store
+        panel_id (int): Panelapp ID
+        version (str): Version of the panel
+
+    Returns:
+        set: Set of HGNC ids, None if the version isn't stored
+    """
+
+    engine = create_store_engine(store)
+
+    with engine.connect() as conn:
+        panel_version_id = conn.execute(
+            text(
+                "SELECT panel_version_id FROM panel_versions "
+                "WHERE panel_id = :panel_id AND version = :version"
+            ),
+            {"panel_id": int(panel_id), "version": version}
+        ).scalar()
+
+        if panel_version_id is None:
+            genes = None
+        else:
+            genes = set(
+                conn.execute(
+                    text(
+                        "SELECT hgnc_id FROM panel_genes "
+                        "WHERE panel_version_id = :panel_version_id"
+                    ),
+                    {"panel_version_id": panel_version_id}
+                ).scalars()
+            )
+
+    engine.dispose()
+    return genes
+
+
+def get_panel_diff(
+    store: Path, panel_id: int, old_version: str, new_version: str
+) -> tuple:
+    """ Get the genes added and removed between 2 stored versions of a panel
+
+    Args:
+        store (Path): Path to the SQLite store
+        panel_id (int): Panelapp ID
+        old_version (str): Old version of the panel
+        new_version (str): New version of the panel
+
+    Returns:
+        tuple: Sets of the added genes and of the removed genes
+    """
+
+    old_genes = get_panel_genes(store, panel_id, old_version)
+    new_genes = get_panel_genes(store, panel_id, new_version)
+
+    assert old_genes is not None, (
+        f"Version {old_version} of panel {panel_id} is not in the store"
+    )
+    assert new_genes is not None, (
+        f"Version {new_version} of panel {panel_id} is not in the store"
+    )
+
+    return new_genes - old_genes, old_genes - new_genes
+
+
+def get_panel_changes(
+    store: Path, signedoff_panels: dict, panel_ids: Iterable
+) -> pd.DataFrame:
+    """ Compare the current version of the given panels to their latest stored
+    version. The panels whose current version is already stored are skipped so
+    that a version bump is only reported once
+
+    Args:
+        store (Path): Path to the SQLite store
+        signedoff_panels (dict): Dict containing Panelapp IDs as keys and panel
+        objects as values
+        panel_ids (Iterable): Panelapp IDs of the panels to check
+
+    Returns:
+        pd.DataFrame: Dataframe with the panels which version changed, their
+        previous and current versions and the genes added and removed
+    """
+
+    engine = create_store_engine(store)
+
+    with engine.connect() as conn:
+        stored_versions = pd.read_sql(
+            text(
+                "SELECT panel_version_id, panel_id, version FROM "
+                "panel_versions ORDER BY panel_version_id"
+            ),
+            conn
+        )
+
+    engine.dispose()
+
+    data = []
+
+    for panel_id in sorted({int(panel_id) for panel_id in panel_ids}):
+        current_version = signedoff_panels[panel_id].get_version()
+        panel_versions = stored_versions.loc[
+            stored_versions["panel_id"] == panel_id, "version"
+        ]
+
+        # new panel or version already seen
+        if panel_versions.empty or (panel_versions == current_version).any():
+            continue
+
+        previous_version = panel_versions.iloc[-1]
+        previous_genes = get_panel_genes(store, panel_id, previous_version)
+        current_genes = {
+            gene["hgnc_id"] for gene in signedoff_panels[panel_id].get_genes()
+        }
+
+        data.append(
+            [
+                panel_id, previous_version, current_version,
+                ", ".join(sorted(current_genes - previous_genes)),
+                ", ".join(sorted(previous_genes - current_genes)),
+            ]
+        )
+
+    return pd.DataFrame(
+        data, columns=[
+            "panel_id", "previous_version", "version", "added", "removed"
+        ]
+    )
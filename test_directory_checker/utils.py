@@ -1,10 +1,100 @@
 import datetime
+import hashlib
 import json
+import logging
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, NamedTuple
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+from pyarrow import compute as pc
+from pyarrow import csv
+from scipy import sparse
+
+from test_directory_checker import backend, profiling
+from test_directory_checker.config import Config, TDConfig
+
+logger = logging.getLogger(__name__)
+
+# columns of the HGNC dump used by the checker
+HGNC_COLUMNS = [
+    "HGNC ID", "Approved symbol", "Previous symbols", "Alias symbols",
+    "Locus group", "Chromosome"
+]
+
+
+class TDTest(NamedTuple):
+    """ Test from the test directory with its identified targets """
+
+    test_id: str
+    clinical_indication: str
+    target: str
+    panels: tuple
+    genes: tuple
+    test_method: str
+
+
+TD_TEST_COLUMNS = [
+    "Test ID", "Clinical Indication", "Target/Genes", "Identified panels",
+    "Identified genes", "Test Method"
+]
+
+
+class TDGeneMatrix(NamedTuple):
+    """ Sparse test by gene matrix of the genes we capture, with an empty last
+    row for the tests without genes
+    """
+
+    matrix: sparse.csr_matrix
+    tests: pd.Index
+    gene_codes: dict
+
+
+class TDComparisonData(NamedTuple):
+    """ Test directory side of the comparison, built once per run and used for
+    every genepanels chunk
+    """
+
+    keys: pd.DataFrame
+    tests: list
+    genes_per_test: dict
+    gene_matrix: TDGeneMatrix
+
+
+class ColumnarResults:
+    """ Accumulate rows of results directly into one list per column so that
+    the output dataframe is built once from the columns
+    """
+
+    def __init__(self, columns: list):
+        self.columns = {column: [] for column in columns}
+
+    def append(self, *row_data: dict):
+        """ Append a row using the values of the given dicts. Columns missing
+        from the dicts get None
+
+        Args:
+            *row_data: Dicts containing values for the columns of the row
+        """
+
+        for column, values in self.columns.items():
+            value = None
+
+            for data in row_data:
+                if column in data:
+                    value = data[column]
+
+            values.append(value)
+
+    def to_df(self) -> pd.DataFrame:
+        """ Build the dataframe from the accumulated columns
+
+        Returns:
+            pd.DataFrame: Dataframe with one column per accumulated column
+        """
+
+        return pd.DataFrame(self.columns, columns=list(self.columns))
 
 
 def get_date():
@@ -17,6 +107,25 @@ def get_date():
     return datetime.datetime.now().strftime("%y%m%d")
 
 
+def get_file_hash(file_path) -> str:
+    """ Get the SHA256 hash of a file
+
+    Args:
+        file_path (str): Path to the file
+
+    Returns:
+        str: Hexadecimal SHA256 hash of the file content
+    """
+
+    file_hash = hashlib.sha256()
+
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            file_hash.update(block)
+
+    return file_hash.hexdigest()
+
+
 def check_if_output_folder_exists(output_path: Path, date: str, counter: int):
     """ Check if the output folder exists
 
@@ -69,11 +178,17 @@ def parse_td(test_directory, config):
         ].isin(config["ngs_type"])
     ]
 
+    logger.debug(
+        "Kept %s NGS tests out of the %s tests of the test directory",
+        len(filtered_data), len(data)
+    )
+
     return filtered_data
 
 
 def parse_hgnc_dump(hgnc_file):
-    """ Parse HGNC dump file
+    """ Parse HGNC dump file. Only the columns used by the checker are read
+    using the memory-mapped file and the pyarrow CSV reader
 
     Args:
         hgnc_file (str): Path to the HGNC dump
@@ -82,14 +197,36 @@ def parse_hgnc_dump(hgnc_file):
         pd.Dataframe: Dataframe containing the data in the HGNC dump
     """
 
-    df = pd.read_csv(hgnc_file, delimiter="\t")
-    # replace NA by None so that we can handle them
-    df_with_none = df.where(pd.notnull(df), None)
-    return df_with_none
+    with open(hgnc_file) as f:
+        header = f.readline().rstrip("\r\n").split("\t")
+
+    missing_columns = [
+        column for column in HGNC_COLUMNS if column not in header
+    ]
+
+    assert not missing_columns, (
+        f"'{hgnc_file}' is missing the following columns: "
+        f"{', '.join(missing_columns)}. Check the boxes for these columns "
+        "when downloading the HGNC dump"
+    )
+
+    table = csv.read_csv(
+        pa.memory_map(str(hgnc_file)),
+        parse_options=csv.ParseOptions(delimiter="\t"),
+        convert_options=csv.ConvertOptions(
+            include_columns=HGNC_COLUMNS,
+            column_types={column: pa.string() for column in HGNC_COLUMNS},
+            strings_can_be_null=True
+        )
+    )
+
+    # nulls in the string columns are converted to None
+    return table.to_pandas()
 
 
 def parse_genepanels(genepanels):
-    """ Parse genepanels file
+    """ Parse genepanels file. With the pyarrow backend, the file is parsed
+    by the multithreaded pyarrow CSV reader
 
     Args:
         genepanels (str): Path to the genepanels file
@@ -98,27 +235,251 @@ def parse_genepanels(genepanels):
         pd.Dataframe: Dataframe containing the data in the genepanels file
     """
 
-    return pd.read_csv(
-        genepanels, delimiter="\t", names=["ci", "panel", "gene", "panelapp_id"]
+    columns = ["ci", "panel", "gene", "panelapp_id"]
+
+    if backend.use_arrow():
+        # the pyarrow reader needs the number of columns of the file, the
+        # missing columns are added as empty columns like the pandas reader
+        with open(genepanels) as f:
+            nb_columns = len(f.readline().rstrip("\r\n").split("\t"))
+
+        table = csv.read_csv(
+            genepanels,
+            read_options=csv.ReadOptions(column_names=columns[:nb_columns]),
+            parse_options=csv.ParseOptions(delimiter="\t"),
+            convert_options=csv.ConvertOptions(strings_can_be_null=True)
+        )
+
+        for column in columns[nb_columns:]:
+            table = table.append_column(
+                column, pa.nulls(len(table), pa.float64())
+            )
+
+        return backend.to_pandas(table)
+
+    return pd.read_csv(genepanels, delimiter="\t", names=columns)
+
+
+def parse_genepanels_in_chunks(genepanels, chunksize: int):
+    """ Parse genepanels file in chunks of rows. Rows for the clinical
+    indication at the end of a chunk are carried over to the next chunk so
+    that every yielded dataframe contains complete clinical indications. This
+    expects the rows of a clinical indication to be next to each other, which
+    is the case for genepanels files sorted by clinical indication. A clinical
+    indication found again after it was yielded fails the parsing as it would
+    be compared twice with partial genes.
+
+    Args:
+        genepanels (str): Path to the genepanels file
+        chunksize (int): Number of rows to read at once
+
+    Yields:
+        pd.Dataframe: Dataframe containing complete clinical indications from
+        the genepanels file
+    """
+
+    carry_over = None
+    yielded_cis = set()
+
+    for chunk in pd.read_csv(
+        genepanels, delimiter="\t", names=["ci", "panel", "gene", "panelapp_id"],
+        chunksize=chunksize
+    ):
+        if carry_over is not None:
+            chunk = pd.concat([carry_over, chunk], ignore_index=True)
+
+        repeated_cis = yielded_cis.intersection(chunk["ci"].unique())
+
+        assert not repeated_cis, (
+            f"'{genepanels}' is not sorted by clinical indication: "
+            f"{', '.join(sorted(repeated_cis))} found again after their first "
+            "rows. Sort it using 'sort -k1,1' to use --chunksize"
+        )
+
+        # the last clinical indication might continue in the next chunk
+        last_ci = chunk["ci"].iloc[-1]
+        is_last_ci = (chunk["ci"] == last_ci).to_numpy()
+        # only carry over the trailing block of rows for that ci
+        if is_last_ci.all():
+            trailing_start = 0
+        else:
+            trailing_start = len(is_last_ci) - is_last_ci[::-1].argmin()
+
+        carry_over = chunk.iloc[trailing_start:]
+        complete_cis = chunk.iloc[:trailing_start]
+
+        if not complete_cis.empty:
+            yielded_cis.update(complete_cis["ci"].unique())
+            yield complete_cis
+
+    if carry_over is not None and not carry_over.empty:
+        yield carry_over
+
+
+def build_ci_key_table(genepanels_df: pd.DataFrame) -> pd.DataFrame:
+    """ Build the table of the clinical indications in the genepanels data
+    with their test ID and their clinical indication code i.e.
+    R130.1_Short QT syndrome_P --> R130.1 --> R130
+
+    Args:
+        genepanels_df (pd.DataFrame): Dataframe with genepanels data
+
+    Returns:
+        pd.DataFrame: Dataframe with one row per gemini name and the
+        "gemini_name", "test_id" and "ci_code" columns
+    """
+
+    ci_keys = pd.DataFrame({"gemini_name": genepanels_df["ci"].unique()})
+    ci_keys["test_id"] = ci_keys["gemini_name"].str.split("_").str[0]
+    ci_keys["ci_code"] = ci_keys["test_id"].str.split(".").str[0]
+    return ci_keys
+
+
+def get_genepanels_groups(genepanels_df: pd.DataFrame):
+    """ Get the panels and genes of every clinical indication of the
+    genepanels data, in the order of the clinical indications in the file.
+    With the pyarrow backend, the rows are grouped using the dictionary
+    encoding of the clinical indications instead of a pandas groupby
+
+    Args:
+        genepanels_df (pd.DataFrame): Dataframe with genepanels data
+
+    Yields:
+        tuple: Gemini name, list of its unique panels in the order of the file
+        and set of its genes
+    """
+
+    if not backend.use_arrow():
+        for gemini_name, data_for_r_code in genepanels_df.groupby(
+            "ci", sort=False
+        ):
+            yield (
+                gemini_name, list(data_for_r_code["panel"].unique()),
+                set(data_for_r_code["gene"].unique())
+            )
+
+        return
+
+    table = backend.to_arrow(genepanels_df, ["ci", "panel", "gene"])
+    # rows without clinical indication are dropped like with groupby
+    table = table.filter(pc.is_valid(table["ci"]))
+    cis = pc.dictionary_encode(table["ci"]).combine_chunks()
+
+    # the dictionary is in the order of the first rows of the clinical
+    # indications
+    codes = backend.to_numpy(cis.indices)
+    rows = np.argsort(codes, kind="stable")
+    group_starts = np.flatnonzero(np.diff(codes[rows])) + 1
+
+    for gemini_name, panels, genes in zip(
+        cis.dictionary.to_pylist(),
+        np.split(backend.to_numpy(table["panel"])[rows], group_starts),
+        np.split(backend.to_numpy(table["gene"])[rows], group_starts),
+    ):
+        yield gemini_name, list(dict.fromkeys(panels)), set(genes)
+
+
+def build_td_key_table(td_data: pd.DataFrame) -> pd.DataFrame:
+    """ Build the table of the tests in the test directory data with their
+    position and their clinical indication code i.e. R130.1 --> R130
+
+    Args:
+        td_data (pd.DataFrame): Dataframe with test directory data
+
+    Returns:
+        pd.DataFrame: Dataframe with one row per test and the "Test ID",
+        "td_position" and "ci_code" columns
+    """
+
+    td_keys = pd.DataFrame(
+        {
+            "Test ID": td_data["Test ID"].to_numpy(),
+            "td_position": np.arange(len(td_data)),
+        }
+    )
+    td_keys["ci_code"] = td_keys["Test ID"].str.extract(
+        r"^([^.]*)\.", expand=False
+    )
+    return td_keys
+
+
+def get_td_gp_mapping(
+    td_keys: pd.DataFrame, genepanels_df: pd.DataFrame
+) -> pd.DataFrame:
+    """ Map the clinical indications of the genepanels data to the tests of
+    the test directory:
+    - identical: the test ID is found once in the test directory
+    - replaced: tests in the test directory share the clinical indication code
+    - removed: no test in the test directory shares the clinical indication code
+    - bespoke: "C" clinical indications which are not in the test directory
+
+    Args:
+        td_keys (pd.DataFrame): Dataframe from build_td_key_table
+        genepanels_df (pd.DataFrame): Dataframe with genepanels data
+
+    Returns:
+        pd.DataFrame: Dataframe with one row per clinical indication/test
+        couple with the "gemini_name", "test_id", "ci_code", "match",
+        "Test ID" and "td_position" (position of the test in td_data) columns
+    """
+
+    ci_keys = build_ci_key_table(genepanels_df)
+    ci_keys["ci_position"] = np.arange(len(ci_keys))
+
+    is_bespoke = ci_keys["gemini_name"].str.startswith("C")
+    nb_test_id_matches = ci_keys["test_id"].map(
+        td_keys["Test ID"].value_counts()
+    ).fillna(0)
+
+    # test ID found once in the test directory
+    identical = ci_keys[~is_bespoke & (nb_test_id_matches == 1)].merge(
+        td_keys[["Test ID", "td_position"]], left_on="test_id",
+        right_on="Test ID"
     )
+    identical["match"] = "identical"
 
+    # otherwise, use the clinical indication code to find equivalence
+    others = ci_keys[~is_bespoke & (nb_test_id_matches != 1)].merge(
+        td_keys[["ci_code", "Test ID", "td_position"]], on="ci_code",
+        how="left"
+    )
+    others["match"] = np.where(
+        others["td_position"].isna(), "removed", "replaced"
+    )
+
+    bespoke = ci_keys[is_bespoke].assign(match="bespoke")
+
+    mapping = pd.concat([identical, others, bespoke], ignore_index=True)
+    mapping["td_position"] = mapping["td_position"].astype("Int64")
+    mapping = mapping.sort_values(
+        ["ci_position", "td_position"], kind="stable"
+    )
 
-def load_config(config):
-    """ Load the JSON config for the test directory
+    return mapping[
+        ["gemini_name", "test_id", "ci_code", "match", "Test ID", "td_position"]
+    ].reset_index(drop=True)
+
+
+def load_config(config, config_class: type = TDConfig) -> Config:
+    """ Load the JSON config for the test directory and validate it so that
+    invalid configs fail before the inputs are parsed
 
     Args:
         config (str): Path to the config file
+        config_class (type, optional): Class of the config i.e. TDConfig or
+        BlacklistConfig. Defaults to TDConfig
 
     Returns:
-        dict: Dict containing the data in the JSON config
+        Config: Immutable config containing the data in the JSON config
     """
 
-    config = open(config)
-    data = json.load(config)
-    config.close()
-    return data
+    with open(config) as f:
+        data = json.load(f)
+
+    return config_class.from_dict(data, config)
 
 
+@profiling.profile
 def get_all_hgnc_ids_in_target(
     targets: Iterable, signedoff_panels: dict, blacklist_config: dict
 ):
@@ -157,9 +518,304 @@ def get_all_hgnc_ids_in_target(
     return data
 
 
+def get_td_records(td_data: pd.DataFrame) -> list:
+    """ Build the test records of the test directory data once so that they
+    can be used without creating dataframes for every test
+
+    Args:
+        td_data (pd.DataFrame): Dataframe containing the test directory data
+        with the identified panels and genes
+
+    Returns:
+        list: List of TDTest in the order of the dataframe
+    """
+
+    return [
+        TDTest(
+            test_id, ci, target, tuple(panels), tuple(genes), test_method
+        )
+        for (
+            test_id, ci, target, panels, genes, test_method
+        ) in td_data.reindex(columns=TD_TEST_COLUMNS).itertuples(
+            index=False, name=None
+        )
+    ]
+
+
+@profiling.profile
+def build_td_gene_table(
+    target_data: pd.DataFrame, signedoff_panels: dict, blacklist_config: dict,
+    hgnc_dump: pd.DataFrame = None
+) -> pd.DataFrame:
+    """ Build the long table of the genes of every test i.e. one row per test
+    and gene, coming either from a Panelapp panel or directly from the target.
+    This is meant to be built once per run and used by the following steps
+
+    Args:
+        target_data (pd.DataFrame): Dataframe containing the test directory
+        data with the identified panels and genes
+        signedoff_panels (dict): Dict containing Panelapp IDs as keys and panel
+        objects as values
+        blacklist_config (dict): Dict containing blacklisted panel IDs or genes
+        hgnc_dump (pd.DataFrame, optional): Dataframe containing data from the
+        HGNC dump. Defaults to None i.e. the locus status is not added
+
+    Returns:
+        pd.DataFrame: Dataframe with the "Test ID", "source" (Panelapp ID or
+        "direct") and "HGNC ID" columns, and the "included" column containing
+        whether we capture the gene according to its locus type if the HGNC
+        dump is given
+    """
+
+    panel_targets = target_data[["Test ID", "Identified panels"]].explode(
+        "Identified panels"
+    ).dropna().rename(columns={"Identified panels": "source"})
+
+    # some panelapp ids are not accessible through the API because they have
+    # been retired or they are in development
+    panel_targets = panel_targets[
+        ~panel_targets["source"].isin(
+            blacklist_config["unaccessible_panelapp_panels"]
+        )
+    ]
+
+    # get the genes of every panel once
+    panel_ids = panel_targets["source"].unique()
+    panel_genes = pd.DataFrame(
+        [
+            (panel_id, gene["hgnc_id"])
+            for panel_id in panel_ids
+            for gene in signedoff_panels[int(panel_id)].get_genes()
+        ],
+        columns=["source", "HGNC ID"]
+    )
+
+    gene_targets = target_data[["Test ID", "Identified genes"]].explode(
+        "Identified genes"
+    ).dropna().rename(columns={"Identified genes": "HGNC ID"})
+    gene_targets["source"] = "direct"
+
+    gene_table = pd.concat(
+        [panel_targets.merge(panel_genes, on="source"), gene_targets],
+        ignore_index=True
+    ).reindex(columns=["Test ID", "source", "HGNC ID"])
+
+    if hgnc_dump is not None:
+        locus_data = gene_table[["HGNC ID"]].merge(
+            hgnc_dump[["HGNC ID", "Locus group", "Chromosome"]].drop_duplicates(
+                "HGNC ID"
+            ),
+            on="HGNC ID", how="left"
+        )
+
+        # RNA genes and mitochondrial genes are excluded from the genepanels
+        # file because we don't have transcripts for them, same for genes like
+        # TRAC or IGHM
+        gene_table["included"] = ~(
+            locus_data["Locus group"].str.contains(
+                "RNA", regex=False, na=False
+            ).to_numpy() |
+            (locus_data["Chromosome"] == "mitochondria").to_numpy() |
+            gene_table["HGNC ID"].isin(
+                blacklist_config["genes_with_no_transcripts"]
+            ).to_numpy()
+        )
+
+    return gene_table
+
+
+def get_genes_per_test(
+    gene_table: pd.DataFrame, gene_locus_type: dict
+) -> dict:
+    """ Get the genes we capture for every test from the gene table
+
+    Args:
+        gene_table (pd.DataFrame): Dataframe from build_td_gene_table
+        gene_locus_type (dict): Dict containing the outcome of the gene locus
+        type check
+
+    Returns:
+        dict: Dict with the test IDs as keys and the set of genes as values
+    """
+
+    captured_genes = gene_table[
+        gene_table["HGNC ID"].map(gene_locus_type).fillna(False).astype(bool)
+    ]
+
+    return {
+        test_id: set(genes)
+        for test_id, genes in captured_genes.groupby(
+            "Test ID", sort=False
+        )["HGNC ID"]
+    }
+
+
+def build_gene_matrix(
+    keys: pd.Series, genes: pd.Series, gene_codes: dict
+) -> tuple:
+    """ Build a sparse matrix of keys (tests or clinical indications) by genes
+    where the genes are interned using the given gene codes
+
+    Args:
+        keys (pd.Series): Key of every row of the long table
+        genes (pd.Series): Gene of every row of the long table
+        gene_codes (dict): Dict with the genes as keys and their column in the
+        matrix as values
+
+    Returns:
+        tuple: Tuple containing the CSR matrix with one row per unique key
+        and the unique keys in the order of the rows
+    """
+
+    key_codes, unique_keys = pd.factorize(keys)
+    matrix = sparse.csr_matrix(
+        (
+            np.ones(len(key_codes), dtype=np.int32),
+            (key_codes, genes.map(gene_codes).to_numpy())
+        ),
+        shape=(len(unique_keys), len(gene_codes))
+    )
+    # the same gene can come from several targets of a test
+    matrix.data[:] = 1
+
+    return matrix, unique_keys
+
+
+def build_td_gene_matrix(
+    gene_table: pd.DataFrame, gene_locus_type: dict
+) -> TDGeneMatrix:
+    """ Build the sparse test by gene matrix of the genes we capture from the
+    gene table
+
+    Args:
+        gene_table (pd.DataFrame): Gene table of the test directory from
+        build_td_gene_table
+        gene_locus_type (dict): Dict containing the outcome of the gene locus
+        type check
+
+    Returns:
+        TDGeneMatrix: Matrix of the tests, its tests and its gene codes
+    """
+
+    td_genes = gene_table[
+        gene_table["HGNC ID"].map(gene_locus_type).fillna(False).astype(bool)
+    ]
+    gene_codes = {
+        gene: code
+        for code, gene in enumerate(
+            pd.unique(td_genes["HGNC ID"].to_numpy(dtype=object))
+        )
+    }
+    matrix, tests = build_gene_matrix(
+        td_genes["Test ID"], td_genes["HGNC ID"], gene_codes
+    )
+
+    # tests without genes get an empty row
+    matrix = sparse.vstack(
+        [matrix, sparse.csr_matrix((1, len(gene_codes)), dtype=np.int32)],
+        format="csr"
+    )
+
+    return TDGeneMatrix(matrix, pd.Index(tests), gene_codes)
+
+
+def build_td_comparison_data(
+    td_data: pd.DataFrame, gene_table: pd.DataFrame, gene_locus_type: dict
+) -> TDComparisonData:
+    """ Build the test directory side of the comparison once so that it isn't
+    built again for every genepanels chunk
+
+    Args:
+        td_data (pd.DataFrame): Dataframe with the test directory data
+        gene_table (pd.DataFrame): Gene table of the test directory from
+        build_td_gene_table
+        gene_locus_type (dict): Dict containing the outcome of the gene locus
+        type check
+
+    Returns:
+        TDComparisonData: Keys, records, genes and gene matrix of the tests
+    """
+
+    return TDComparisonData(
+        build_td_key_table(td_data), get_td_records(td_data),
+        get_genes_per_test(gene_table, gene_locus_type),
+        build_td_gene_matrix(gene_table, gene_locus_type)
+    )
+
+
+@profiling.profile
+def score_replacements(
+    mapping: pd.DataFrame, genepanels_df: pd.DataFrame,
+    td_gene_matrix: TDGeneMatrix
+) -> pd.DataFrame:
+    """ Score the gene content of the tests potentially replacing a clinical
+    indication of the genepanels file. The shared genes of every candidate
+    pair are counted with one element-wise product of sparse clinical
+    indication by gene and test by gene matrices
+
+    Args:
+        mapping (pd.DataFrame): Dataframe from get_td_gp_mapping
+        genepanels_df (pd.DataFrame): Dataframe with the genepanels data
+        td_gene_matrix (TDGeneMatrix): Matrix of the tests from
+        build_td_gene_matrix
+
+    Returns:
+        pd.DataFrame: Dataframe with the "gemini_name", "Test ID", "jaccard",
+        "overlap", "rank" and "best_match" columns for every candidate
+    """
+
+    candidates = mapping.loc[
+        mapping["match"] == "replaced", ["gemini_name", "Test ID"]
+    ].reset_index(drop=True)
+
+    # the genes which are not in the test directory get the columns after the
+    # columns of the test directory matrix
+    gene_codes = dict(td_gene_matrix.gene_codes)
+
+    for gene in pd.unique(genepanels_df["gene"].to_numpy(dtype=object)):
+        gene_codes.setdefault(gene, len(gene_codes))
+
+    gp_matrix, gp_cis = build_gene_matrix(
+        genepanels_df["ci"], genepanels_df["gene"], gene_codes
+    )
+
+    gp_rows = pd.Index(gp_cis).get_indexer(candidates["gemini_name"])
+    td_rows = td_gene_matrix.tests.get_indexer(candidates["Test ID"])
+    td_rows[td_rows == -1] = len(td_gene_matrix.tests)
+
+    gp_candidates = gp_matrix[gp_rows]
+    td_candidates = td_gene_matrix.matrix[td_rows]
+
+    nb_shared = np.asarray(
+        gp_candidates[:, :len(td_gene_matrix.gene_codes)].multiply(
+            td_candidates
+        ).sum(axis=1)
+    ).ravel()
+    nb_gp_genes = np.diff(gp_candidates.indptr)
+    nb_td_genes = np.diff(td_candidates.indptr)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        candidates["jaccard"] = np.nan_to_num(
+            nb_shared / (nb_gp_genes + nb_td_genes - nb_shared)
+        )
+        candidates["overlap"] = np.nan_to_num(
+            nb_shared / np.minimum(nb_gp_genes, nb_td_genes)
+        )
+
+    candidates["rank"] = candidates.sort_values(
+        ["jaccard", "overlap"], ascending=False, kind="stable"
+    ).groupby("gemini_name", sort=False).cumcount().reindex(
+        candidates.index
+    ) + 1
+    candidates["best_match"] = candidates["rank"] == 1
+
+    return candidates
+
+
+@profiling.profile
 def get_genes_from_td_target(
     td_data: pd.DataFrame, signedoff_panels: dict, gene_locus_type: dict,
-    blacklist_config: dict
+    blacklist_config: dict, gene_table: pd.DataFrame = None
 ) -> tuple:
     """ Extract the genes from the target columns from the test directory
     either from a Panelapp panel or gene symbols and get their HGNC ids.
@@ -170,27 +826,54 @@ def get_genes_from_td_target(
         objects as values
         gene_locus_type (dict): Dict containing the outcome of the gene locus
         type check
+        blacklist_config (dict): Dict containing blacklisted panel IDs or genes
+        gene_table (pd.DataFrame, optional): Gene table built once for the
+        test directory. Defaults to None i.e. built from td_data
 
     Returns:
         tuple: Tuple containing the set of genes for the given targets and the
         gene locus type dict to get updated
     """
 
+    if gene_table is None:
+        gene_table = build_td_gene_table(
+            td_data, signedoff_panels, blacklist_config
+        )
+    else:
+        gene_table = gene_table[gene_table["Test ID"].isin(td_data["Test ID"])]
+
+    return {
+        gene
+        for gene in gene_table["HGNC ID"].unique()
+        if gene_locus_type.get(gene)
+    }
+
+
+def get_genes_from_td_tests(
+    td_tests: Iterable, signedoff_panels: dict, gene_locus_type: dict,
+    blacklist_config: dict
+) -> set:
+    """ Extract the genes from the identified targets of test records and get
+    their HGNC ids
+
+    Args:
+        td_tests (Iterable): Iterable of TDTest
+        signedoff_panels (dict): Dict containing Panelapp IDs as keys and panel
+        objects as values
+        gene_locus_type (dict): Dict containing the outcome of the gene locus
+        type check
+        blacklist_config (dict): Dict containing blacklisted panel IDs or genes
+
+    Returns:
+        set: Set of genes for the given tests
+    """
+
     # get list of HGNC ids for test directory and genepanels
-    identified_targets = np.concatenate(
-        (
-            [
-                target
-                for sublist in td_data["Identified panels"].to_numpy()
-                for target in sublist
-            ],
-            [
-                target
-                for sublist in td_data["Identified genes"].to_numpy()
-                for target in sublist
-            ],
-        ), axis=None
-    )
+    identified_targets = [
+        target
+        for td_test in td_tests
+        for target in (*td_test.panels, *td_test.genes)
+    ]
 
     td_genes = set()
 
@@ -204,35 +887,95 @@ def get_genes_from_td_target(
     return td_genes
 
 
-def filter_out_df(df: pd.DataFrame, **filter_elements) -> pd.DataFrame:
-    """ Filter out rows matching values in a dataframe using a dict of data
+def get_tests_using_panels(
+    td_data: pd.DataFrame, panel_ids: Iterable
+) -> pd.DataFrame:
+    """ Get the tests which targets contain one of the given panels
+
+    Args:
+        td_data (pd.DataFrame): Dataframe containing the test directory data
+        panel_ids (Iterable): Panelapp IDs
+
+    Returns:
+        pd.DataFrame: Dataframe with the tests using the panels
+    """
+
+    panel_ids = {str(panel_id) for panel_id in panel_ids}
+    uses_panels = np.fromiter(
+        (
+            not panel_ids.isdisjoint(panels)
+            for panels in td_data["Identified panels"]
+        ), dtype=bool, count=len(td_data)
+    )
+    return td_data[uses_panels]
+
+
+def filter_out_df(
+    df: pd.DataFrame, how: str = "any", **filter_elements
+) -> pd.DataFrame:
+    """ Filter out rows matching values in a dataframe using a dict of data.
+    The conditions are combined in a single boolean mask so the rows keep
+    their original order.
 
     Args:
         df (pd.DataFrame): Dataframe to be filtered
-        **filter_elements: Kwargs elements to filter with
+        how (str, optional): "any" to keep rows passing at least one of the
+        conditions, "all" to keep rows passing all of them. Defaults to "any".
+        **filter_elements: Kwargs elements to filter with, where the value is
+        either None (filter out missing values), a callable returning the mask
+        of the rows to keep for the column or a value to filter out
 
     Returns:
         pd.DataFrame: Filtered dataframe
     """
 
-    intermediate_data = []
+    assert how in ("any", "all"), f"'{how}' should be 'any' or 'all'"
+
+    # no condition to filter with, the reduction of no masks would fail
+    if not filter_elements:
+        return df
+
+    masks = []
 
     for key, value in filter_elements.items():
-        if value is None:
-            df_to_add = df[~df[key].isna()]
+        if callable(value):
+            mask = np.asarray(value(df[key]), dtype=bool)
+        elif backend.use_arrow():
+            mask = backend.get_filter_mask(df[key], value)
+        elif value is None:
+            mask = df[key].notna().to_numpy()
         else:
-            df_to_add = df[df[key] != value]
+            mask = (df[key] != value).to_numpy()
 
-        intermediate_data.append(df_to_add)
+        masks.append(mask)
 
-    filtered_data = pd.concat(intermediate_data).drop_duplicates()
+    if how == "any":
+        combined_mask = np.logical_or.reduce(masks)
+    else:
+        combined_mask = np.logical_and.reduce(masks)
 
-    return filtered_data
+    return df[combined_mask]
+
+
+def is_empty(series: pd.Series) -> np.ndarray:
+    """ Get the mask of the empty elements of a series of lists
+
+    Args:
+        series (pd.Series): Series of lists
+
+    Returns:
+        np.ndarray: Boolean array which is True for empty lists
+    """
 
+    return np.fromiter(
+        map(len, series), dtype=np.int64, count=len(series)
+    ) == 0
 
+
+@profiling.profile
 def get_locus_status_genes(
     target_data: pd.DataFrame, signedoff_panels: dict, hgnc_dump: pd.DataFrame,
-    blacklist_config: dict
+    blacklist_config: dict, gene_table: pd.DataFrame = None
 ):
     """ Extract the genes from the target columns from the test directory
     either from a Panelapp panel or gene symbols and get their HGNC ids.
@@ -243,89 +986,71 @@ def get_locus_status_genes(
         objects as values
         hgnc_dump (pd.DataFrame): Dataframe containing data from the HGNC dump
         blacklist_config (dict): Dict containing blacklisted panel IDs or genes
+        gene_table (pd.DataFrame, optional): Gene table built once with the
+        HGNC dump. Defaults to None i.e. built from target_data
 
     Returns:
         tuple: Tuple containing the set of genes for the given targets and the
         gene locus type dict to get updated
     """
 
-    # get list of HGNC ids for test directory and genepanels
-    identified_targets = np.concatenate(
-        (
-            [
-                target
-                for sublist in target_data["Identified panels"].to_numpy()
-                for target in sublist
-            ],
-            [
-                target
-                for sublist in target_data["Identified genes"].to_numpy()
-                for target in sublist
-            ],
-        ), axis=None
-    )
-
-    gene_locus_type = {}
-
-    for gene in get_all_hgnc_ids_in_target(
-        identified_targets, signedoff_panels, blacklist_config
-    ):
-        if gene not in gene_locus_type:
-            hgnc_info = hgnc_dump.loc[hgnc_dump["HGNC ID"] == gene]
-
-            # if the gene is TRAC or IGHM, genes that we don't have transcripts
-            # for, removed them for the genes for the content comparison
-            if gene in blacklist_config["genes_with_no_transcripts"]:
-                gene_locus_type[gene] = False
-                continue
+    if gene_table is None:
+        gene_table = build_td_gene_table(
+            target_data, signedoff_panels, blacklist_config, hgnc_dump
+        )
 
-            # RNA genes and mitochondrial genes are excluded from the
-            # genepanels file because we don't have transcripts for
-            # them
-            if (
-                "RNA" in hgnc_info["Locus group"].to_numpy()[0] or
-                hgnc_info["Chromosome"].to_numpy()[0] == "mitochondria"
-            ):
-                gene_locus_type[gene] = False
-            else:
-                gene_locus_type[gene] = True
+    gene_locus_type = gene_table.drop_duplicates("HGNC ID")
 
-    return gene_locus_type
+    return dict(
+        zip(gene_locus_type["HGNC ID"], gene_locus_type["included"])
+    )
 
 
+@profiling.profile
 def format_td_data(
-    df: pd.DataFrame, genepanels_genes: set, signedoff_panels: dict,
-    gene_locus_type: dict, blacklist_config: dict
+    td_tests: Iterable, genepanels_genes: set, signedoff_panels: dict,
+    gene_locus_type: dict, blacklist_config: dict, genes_per_test: dict = None
 ):
-    """ From a dataframe, gather the appropriate data for future outputting.
+    """ From test records, gather the appropriate data for future outputting.
 
     Args:
-        df (pd.DataFrame): Dataframe for a test ID to extract data from
+        td_tests (Iterable): List of TDTest for a test ID to extract data
+        from. A dataframe of the tests is also accepted
         genepanels_genes (set): Set of genes present for a test id in genepanels
         signedoff_panels (dict): Dict containing the data for signedoff panels
         in Panelapp
         gene_locus_type (dict): Dict containing genes and their status
         according to their locus type
         blacklist_config (dict): Dict containing blacklisted panel IDs or genes
+        genes_per_test (dict, optional): Genes of every test from
+        get_genes_per_test. Defaults to None i.e. extracted from the targets
 
     Returns:
         dict: Dict containing the data from the test directory for a specific
         test
     """
 
+    if isinstance(td_tests, pd.DataFrame):
+        td_tests = get_td_records(td_tests)
+
     data = {}
 
     # from the identified targets (panels or list of HGNC ids),
     # output a list of HGNC ids for that test ID
-    td_genes = get_genes_from_td_target(
-        df, signedoff_panels, gene_locus_type, blacklist_config
-    )
+    if genes_per_test is None:
+        td_genes = get_genes_from_td_tests(
+            td_tests, signedoff_panels, gene_locus_type, blacklist_config
+        )
+    else:
+        td_genes = set().union(
+            *[genes_per_test.get(td_test.test_id, set()) for td_test in td_tests]
+        )
 
-    data["td_ci"] = ", ".join(df["Test ID"].to_numpy())
-    data["td_target"] = ", ".join(df["Target/Genes"].to_numpy())
+    data["td_ci"] = ", ".join(td_test.test_id for td_test in td_tests)
+    data["td_target"] = ", ".join(td_test.target for td_test in td_tests)
     data["td_version"] = ", ".join([
         signedoff_panels[int(target)].get_version()
-        for target in df["Identified panels"].to_numpy()[0]
+        for target in td_tests[0].panels
         if target not in blacklist_config["unaccessible_panelapp_panels"]
     ])
     data["td_genes"] = ", ".join(sorted(list(td_genes)))
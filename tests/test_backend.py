@@ -0,0 +1,116 @@
+import pandas as pd
+import pytest
+
+from test_directory_checker import backend, identify, utils
+
+
+@pytest.fixture
+def pyarrow_backend():
+    """ Run the test with the pyarrow backend and restore the backend """
+
+    previous_backend = backend.get_backend()
+    backend.set_backend("pyarrow")
+    yield
+    backend.set_backend(previous_backend)
+
+
+def run_with_backends(function, *args) -> tuple:
+    """ Run the function with the pandas backend then the pyarrow backend
+
+    Args:
+        function (Callable): Function to run
+        *args: Arguments of the function
+
+    Returns:
+        tuple: Results of the function with the pandas and pyarrow backends
+    """
+
+    backend.set_backend("pandas")
+    pandas_result = function(*args)
+    backend.set_backend("pyarrow")
+    pyarrow_result = function(*args)
+
+    return pandas_result, pyarrow_result
+
+
+def test_set_backend(pyarrow_backend):
+    """ Test that only the known backends can be set """
+
+    assert backend.use_arrow()
+
+    with pytest.raises(AssertionError):
+        backend.set_backend("polars")
+
+
+def test_parse_genepanels(genepanels_data, pyarrow_backend):
+    """ Test that both backends parse the genepanels file the same way
+
+    Args:
+        genepanels_data (str): Path to the genepanels file
+    """
+
+    pd.testing.assert_frame_equal(
+        *run_with_backends(utils.parse_genepanels, genepanels_data)
+    )
+
+
+def test_build_symbol_table(hgnc_dump, pyarrow_backend):
+    """ Test that both backends build the same symbol table
+
+    Args:
+        hgnc_dump (str): Path to the HGNC dump
+    """
+
+    pd.testing.assert_frame_equal(
+        *run_with_backends(
+            identify.build_symbol_table, utils.parse_hgnc_dump(hgnc_dump)
+        )
+    )
+
+
+def test_get_genepanels_groups(pyarrow_backend):
+    """ Test that both backends group the genepanels data in the order of the
+    file, including clinical indications which rows aren't next to each other
+    """
+
+    genepanels_df = pd.DataFrame(
+        [
+            ["R2.1_CI", "Panel B", "HGNC:3"], ["R1.1_CI", "Panel A", "HGNC:1"],
+            ["R2.1_CI", "Panel C", "HGNC:4"], ["R1.1_CI", "Panel A", "HGNC:2"],
+            ["R2.1_CI", "Panel B", "HGNC:3"],
+        ],
+        columns=["ci", "panel", "gene"]
+    )
+
+    pandas_groups, pyarrow_groups = run_with_backends(
+        lambda df: list(utils.get_genepanels_groups(df)), genepanels_df
+    )
+
+    assert pyarrow_groups == pandas_groups == [
+        ("R2.1_CI", ["Panel B", "Panel C"], {"HGNC:3", "HGNC:4"}),
+        ("R1.1_CI", ["Panel A"], {"HGNC:1", "HGNC:2"}),
+    ]
+
+
+def test_filter_out_df(pyarrow_backend):
+    """ Test that both backends filter out the same rows, including columns
+    Arrow can't compare to the value
+    """
+
+    df = pd.DataFrame(
+        {
+            "removed": [None, "HGNC:1", None, float("nan")],
+            "presence_in_db": [True, False, True, True],
+            "mixed": [1, "1", None, 2],
+        }
+    )
+
+    for filter_elements in [
+        {"removed": None}, {"removed": "HGNC:1"}, {"presence_in_db": True},
+        {"removed": None, "presence_in_db": True}, {"mixed": 1},
+    ]:
+        pd.testing.assert_frame_equal(
+            *run_with_backends(
+                lambda df: utils.filter_out_df(df, **filter_elements), df
+            )
+        )
@@ -1,3 +1,4 @@
+import asyncio
 import json
 from pathlib import Path
 
@@ -6,7 +7,10 @@ import pandas as pd
 from panelapp import queries
 import pytest
 
-from test_directory_checker import checker, output, utils
+from test_directory_checker import (
+    checker, fuzzy, identify, output, shard, utils
+)
+from test_directory_checker.config import TDConfig
 
 
 @pytest.fixture
@@ -22,6 +26,23 @@ def setup_config(config):
     yield data
 
 
+@pytest.fixture
+def setup_td_config(setup_config):
+    yield TDConfig.from_dict(
+        {
+            "sheet_of_interest": "R&ID indications",
+            "header_index": 1,
+            "clinical_indication_column_code": "Test ID",
+            "clinical_indication_column_name": "Clinical Indication",
+            "panel_column": "Target/Genes",
+            "test_method_column": "Test Method",
+            "ngs_column": "Technology",
+            "ngs_type": ["NGS"],
+            **setup_config
+        }
+    )
+
+
 @pytest.fixture
 def setup_blacklist(blacklist_config):
     config = open(blacklist_config)
@@ -103,16 +124,100 @@ def test_check_target_gene(setup_hgnc_dump):
     np.testing.assert_array_equal(processed_row, expected_row)
 
 
-def test_check_test_method_exists(setup_config):
+def test_check_target_previous_gene_symbol(setup_hgnc_dump):
+    """ Test for checking a gene target using a previous symbol i.e. PPH1
+    should be resolved to the HGNC id of BMPR2 using the symbol table
+
+    Args:
+        setup_hgnc_dump (function): Fixture that parses the hgnc dump
+    """
+
+    symbol_table = identify.build_symbol_table(setup_hgnc_dump)
+
+    row = pd.Series(
+        ["PPH1"],
+        index=["Target/Genes"]
+    )
+    processed_row = checker.check_target(row, setup_hgnc_dump, symbol_table)
+    expected_row = pd.Series(
+        [
+            "PPH1",
+            [],
+            ["HGNC:1078"]
+        ],
+        index=["Target/Genes", "Identified panels", "Identified genes"]
+    )
+
+    np.testing.assert_array_equal(processed_row, expected_row)
+
+
+def test_check_targets(setup_td_data, setup_hgnc_dump):
+    """ Test that identifying the unique targets once gives the same results
+    as checking every test separately, including when targets are repeated
+
+    Args:
+        setup_td_data (function): Fixture that parses the test directory data
+        setup_hgnc_dump (function): Fixture that parses the hgnc dump
+    """
+
+    symbol_table = identify.build_symbol_table(setup_hgnc_dump)
+    # repeat the tests to have duplicated targets
+    td_data = pd.concat(
+        [setup_td_data, setup_td_data], ignore_index=True
+    ).drop(columns=["Identified panels", "Identified genes"])
+
+    expected_df = td_data.apply(
+        lambda row: checker.check_target(row, setup_hgnc_dump, symbol_table),
+        axis=1
+    )
+    target_df = checker.check_targets(td_data, setup_hgnc_dump, symbol_table)
+
+    pd.testing.assert_frame_equal(target_df, expected_df)
+
+    # the duplicated tests don't share the same lists
+    target_df.loc[0, "Identified genes"].append("HGNC:0")
+    assert target_df.loc[
+        len(setup_td_data), "Identified genes"
+    ] == expected_df.loc[len(setup_td_data), "Identified genes"]
+
+
+def test_get_cached_target_identifier(setup_hgnc_dump):
+    """ Test that the memoized target identification returns the same results
+    as identify_target and only keeps the most recent targets
+
+    Args:
+        setup_hgnc_dump (function): Fixture that parses the hgnc dump
+    """
+
+    identify_cached_target = identify.get_cached_target_identifier(
+        setup_hgnc_dump, maxsize=2
+    )
+
+    for target in ["PPH1", "Short QT syndrome (224)", "PPH1", "SERPING1"]:
+        assert identify_cached_target(target) == identify.identify_target(
+            target, setup_hgnc_dump
+        )
+
+    cache_info = identify_cached_target.cache_info()
+    assert (cache_info.hits, cache_info.misses) == (1, 3)
+    assert cache_info.currsize == 2
+
+    # modifying the results doesn't modify the memo
+    identify_cached_target("PPH1")[1].append("HGNC:0")
+    assert identify_cached_target("PPH1") == ([], ["HGNC:1078"])
+
+
+def test_check_test_method_exists(setup_td_config):
     """ Test that finds an existing test method --> should return a new column
     with an empty string
 
     Args:
-        setup_config (function): Fixture that loads a JSON config file
+        setup_td_config (function): Fixture that loads the JSON config as a
+        TDConfig
     """
 
     row = pd.Series(["Small panel"], index=["Test Method"])
-    processed_row = checker.check_test_method(row, setup_config)
+    processed_row = checker.check_test_method(row, setup_td_config)
     expected_row = pd.Series(
         [
             "Small panel", ""
@@ -124,16 +229,17 @@ def test_check_test_method_exists(setup_config):
     np.testing.assert_array_equal(processed_row, expected_row)
 
 
-def test_check_test_method_not_exists(setup_config):
+def test_check_test_method_not_exists(setup_td_config):
     """ Test that finds a new test method --> should return a new column with
     the name of the new test method
 
     Args:
-        setup_config (function): Fixture that loads a JSON config file
+        setup_td_config (function): Fixture that loads the JSON config as a
+        TDConfig
     """
 
     row = pd.Series(["New test method"], index=["Test Method"])
-    processed_row = checker.check_test_method(row, setup_config)
+    processed_row = checker.check_test_method(row, setup_td_config)
     expected_row = pd.Series(
         [
             "New test method", "New test method"
@@ -145,6 +251,110 @@ def test_check_test_method_not_exists(setup_config):
     np.testing.assert_array_equal(processed_row, expected_row)
 
 
+def test_check_test_method_typo(setup_td_config):
+    """ Test that the closest test methods of the config are given for a new
+    test method with a typo
+
+    Args:
+        setup_td_config (function): Fixture that loads the JSON config as a
+        TDConfig
+    """
+
+    test_method_index = fuzzy.TrigramIndex(setup_td_config.ngs_test_methods)
+
+    row = pd.Series(["WGSS"], index=["Test Method"])
+    processed_row = checker.check_test_method(
+        row, setup_td_config, test_method_index
+    )
+
+    assert processed_row["Potential new test methods"] == "WGSS"
+    assert processed_row["Closest test methods"].startswith("WGS (0.86)")
+
+    row = pd.Series(["WGS"], index=["Test Method"])
+    processed_row = checker.check_test_method(
+        row, setup_td_config, test_method_index
+    )
+
+    assert processed_row["Closest test methods"] == ""
+
+
+def test_find_unresolved_symbols(setup_hgnc_dump):
+    """ Test that the symbols of gene targets which are not HGNC symbols are
+    found along with the tests using them and the closest HGNC symbols
+
+    Args:
+        setup_hgnc_dump (function): Fixture that parses the hgnc dump
+    """
+
+    symbol_table = identify.build_symbol_table(setup_hgnc_dump)
+    td_data = pd.DataFrame(
+        [
+            ["R1.1", "SERPNG1"],
+            ["R2.1", "PPH1, SERPNG1"],
+            ["R3.1", "Test panel (123)"],
+            ["R4.1", "SERPING1"],
+        ],
+        columns=["Test ID", "Target/Genes"]
+    )
+
+    unresolved_symbols = checker.find_unresolved_symbols(td_data, symbol_table)
+
+    assert unresolved_symbols["Symbol"].to_list() == ["SERPNG1"]
+    assert unresolved_symbols["Test ID"].to_list() == [["R1.1", "R2.1"]]
+    assert unresolved_symbols["Closest symbols"].to_list()[0].startswith(
+        "SERPING1"
+    )
+
+
+def test_find_ambiguous_symbols():
+    """ Test that the symbols of gene targets which map to several HGNC ids
+    are reported with their HGNC ids next to the unresolved symbols
+    """
+
+    hgnc_dump = pd.DataFrame(
+        [
+            ["HGNC:1", "GENEA", "OLD1", "GENEB"],
+            ["HGNC:2", "GENEB", None, None],
+            ["HGNC:3", "GENEC", "OLD1", None],
+        ],
+        columns=[
+            "HGNC ID", "Approved symbol", "Previous symbols", "Alias symbols"
+        ]
+    )
+    symbol_table = identify.build_symbol_table(hgnc_dump)
+
+    ambiguous_symbols = identify.find_ambiguous_symbols(symbol_table)
+
+    assert ambiguous_symbols.to_dict("list") == {
+        "Symbol": ["GENEB", "OLD1"],
+        "HGNC IDs": [
+            "HGNC:1 (alias), HGNC:2 (approved)",
+            "HGNC:1 (previous), HGNC:3 (previous)"
+        ],
+    }
+
+    td_data = pd.DataFrame(
+        [
+            ["R1.1", "GENEA, OLD1"],
+            ["R2.1", "GENED, GENEB"],
+            ["R3.1", "Test panel (123)"],
+        ],
+        columns=["Test ID", "Target/Genes"]
+    )
+
+    unresolved_symbols = checker.find_unresolved_symbols(td_data, symbol_table)
+
+    assert unresolved_symbols["Symbol"].to_list() == ["OLD1", "GENED", "GENEB"]
+    assert unresolved_symbols["Test ID"].to_list() == [
+        ["R1.1"], ["R2.1"], ["R2.1"]
+    ]
+    assert unresolved_symbols["Closest symbols"].to_list()[2] == ""
+    assert unresolved_symbols["HGNC IDs"].to_list() == [
+        "HGNC:1 (previous), HGNC:3 (previous)", "",
+        "HGNC:1 (alias), HGNC:2 (approved)"
+    ]
+
+
 def test_compare_gp_td(
     setup_td_data, setup_genepanels_data, setup_hgnc_dump,
     setup_signedoff_panels, setup_blacklist
@@ -233,7 +443,7 @@ def test_compare_gp_td(
                 "R100.2", "Test panel",
                 "3.0",
                 "HGNC:10471, HGNC:11730, HGNC:11998, HGNC:1349, HGNC:1833, HGNC:18674, HGNC:29186, HGNC:3495, HGNC:4171, HGNC:6919",
-                "HGNC:29090", None
+                "HGNC:29090", None, 10 / 11, 1.0, 1, True
             ],
             [
                 "R134.1_Familial hypercholesterolaemia_P",
@@ -241,7 +451,7 @@ def test_compare_gp_td(
                 "HGNC:20001, HGNC:603, HGNC:613, HGNC:6547",
                 "R134.2", "Familial hypercholesterolaemia", "2.0",
                 "HGNC:18640, HGNC:20001, HGNC:603, HGNC:613, HGNC:6547",
-                None, "HGNC:18640"
+                None, "HGNC:18640", 0.8, 1.0, 1, True
             ],
             [
                 "R134.1_Familial hypercholesterolaemia_P",
@@ -249,12 +459,14 @@ def test_compare_gp_td(
                 "HGNC:20001, HGNC:603, HGNC:613, HGNC:6547",
                 "R134.3", "Familial hypercholesterolaemia", "",
                 "HGNC:1228",
-                "HGNC:20001, HGNC:603, HGNC:613, HGNC:6547", "HGNC:1228"
+                "HGNC:20001, HGNC:603, HGNC:613, HGNC:6547", "HGNC:1228",
+                0.0, 0.0, 2, False
             ]
         ],
         columns=[
             "gemini_name", "panel", "genes", "td_ci", "td_target",
-            "td_version", "td_genes", "removed", "added"
+            "td_version", "td_genes", "removed", "added", "jaccard",
+            "overlap", "rank", "best_match"
         ]
     )
 
@@ -304,6 +516,203 @@ def test_compare_gp_td(
     )
 
 
+def test_compare_gp_td_in_chunks(
+    monkeypatch, genepanels_data, setup_td_data, setup_genepanels_data,
+    setup_hgnc_dump, setup_signedoff_panels, setup_blacklist
+):
+    """ Test that comparing the genepanels file by chunks of rows gives the
+    same results as comparing the whole genepanels file at once, with the
+    test directory side of the comparison built once
+
+    Args:
+        monkeypatch (MonkeyPatch): Pytest fixture to count the builds of the
+        test directory side of the comparison
+        genepanels_data (function): Fixture that returns the path to the
+        genepanels file
+        setup_td_data (function): Fixture that parses the test directory data
+        setup_genepanels_data (function): Fixture that parses the genepanels data
+        setup_hgnc_dump (function): Fixture that parses the hgnc dump
+        setup_signedoff_panels (function): Fixture that creates the signedoff
+        panel dictionary
+    """
+
+    gene_locus_type = utils.get_locus_status_genes(
+        setup_td_data, setup_signedoff_panels, setup_hgnc_dump, setup_blacklist
+    )
+
+    expected_tests = checker.compare_gp_td(
+        setup_td_data, setup_genepanels_data, setup_signedoff_panels,
+        gene_locus_type, setup_blacklist
+    )
+
+    chunked_tests = [[], [], []]
+    build_td_comparison_data = utils.build_td_comparison_data
+    nb_builds = []
+
+    def count_builds(*args):
+        nb_builds.append(1)
+        return build_td_comparison_data(*args)
+
+    monkeypatch.setattr(utils, "build_td_comparison_data", count_builds)
+
+    # small chunks to make sure clinical indications are split across chunks
+    for genepanels_chunk, *tests in checker.compare_gp_td_in_chunks(
+        setup_td_data,
+        utils.parse_genepanels_in_chunks(genepanels_data, chunksize=3),
+        setup_signedoff_panels, gene_locus_type, setup_blacklist
+    ):
+        for i, df in enumerate(tests):
+            chunked_tests[i].append(df)
+
+    assert len(chunked_tests[0]) > 1
+    assert len(nb_builds) == 1
+
+    for expected_df, dfs in zip(expected_tests, chunked_tests):
+        chunked_df = pd.concat(dfs, ignore_index=True)
+
+        for col in expected_df.columns:
+            np.testing.assert_array_equal(
+                chunked_df[col].to_numpy(), expected_df[col].to_numpy()
+            )
+
+
+def test_parse_genepanels_in_chunks_unsorted(tmp_path):
+    """ Test that a clinical indication found again in a later chunk of the
+    genepanels file fails the parsing instead of being compared twice
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    genepanels = tmp_path / "genepanels.tsv"
+    genepanels.write_text(
+        "R1.1_A_P\tpanel_1.0\tHGNC:1\n"
+        "R1.1_A_P\tpanel_1.0\tHGNC:2\n"
+        "R2.1_B_P\tpanel_1.0\tHGNC:3\n"
+        "R2.1_B_P\tpanel_1.0\tHGNC:4\n"
+        "R1.1_A_P\tpanel_2.0\tHGNC:5\n"
+    )
+
+    # the clinical indications next to each other are carried over
+    chunks = utils.parse_genepanels_in_chunks(genepanels, chunksize=3)
+
+    assert next(chunks)["gene"].to_list() == ["HGNC:1", "HGNC:2"]
+
+    with pytest.raises(AssertionError, match="R1.1_A_P found again"):
+        list(chunks)
+
+
+@pytest.mark.parametrize("nb_shards", [2, 3, 5])
+def test_compare_gp_td_in_shards(
+    nb_shards, setup_td_data, setup_genepanels_data, setup_hgnc_dump,
+    setup_signedoff_panels, setup_blacklist
+):
+    """ Test that comparing the shards of the test directory and genepanels
+    data separately and merging the results gives the same results as
+    comparing the whole data at once
+
+    Args:
+        nb_shards (int): Number of simulated shards
+        setup_td_data (function): Fixture that parses the test directory data
+        setup_genepanels_data (function): Fixture that parses the genepanels data
+        setup_hgnc_dump (function): Fixture that parses the hgnc dump
+        setup_signedoff_panels (function): Fixture that creates the signedoff
+        panel dictionary
+    """
+
+    gene_locus_type = utils.get_locus_status_genes(
+        setup_td_data, setup_signedoff_panels, setup_hgnc_dump, setup_blacklist
+    )
+
+    expected_tests = checker.compare_gp_td(
+        setup_td_data, setup_genepanels_data, setup_signedoff_panels,
+        gene_locus_type, setup_blacklist
+    )
+    expected_new_cis = checker.find_new_clinical_indications(
+        setup_td_data, setup_genepanels_data
+    )
+
+    sharded_tests = [[], [], []]
+    sharded_new_cis = []
+    ci_positions = []
+
+    for shard_index in range(1, nb_shards + 1):
+        td_shard = shard.select_td_shard(
+            setup_td_data, shard_index, nb_shards
+        )
+        genepanels_shard = shard.select_genepanels_shard(
+            setup_genepanels_data, shard_index, nb_shards
+        )
+
+        tests = checker.compare_gp_td(
+            td_shard, genepanels_shard, setup_signedoff_panels,
+            gene_locus_type, setup_blacklist
+        )
+
+        for i, df in enumerate(tests):
+            sharded_tests[i].append(df)
+
+        sharded_new_cis.append(
+            checker.find_new_clinical_indications(td_shard, genepanels_shard)
+        )
+        ci_positions.append(shard.get_ci_positions(genepanels_shard))
+
+    for expected_df, dfs in zip(expected_tests, sharded_tests):
+        pd.testing.assert_frame_equal(
+            shard.merge_comparison_tables(dfs, ci_positions), expected_df
+        )
+
+    pd.testing.assert_frame_equal(
+        shard.merge_td_tables(sharded_new_cis), expected_new_cis
+    )
+
+
+def test_compare_gp_td_bespoke(
+    caplog, capsys, setup_td_data, setup_genepanels_data, setup_hgnc_dump,
+    setup_signedoff_panels, setup_blacklist
+):
+    """ Test that the bespoke clinical indications are skipped with a single
+    log message counting them instead of a message per clinical indication
+
+    Args:
+        caplog (LogCaptureFixture): Pytest fixture capturing the logs
+        capsys (CaptureFixture): Pytest fixture capturing stdout and stderr
+        setup_td_data (function): Fixture that parses the test directory data
+        setup_genepanels_data (function): Fixture that parses the genepanels data
+        setup_hgnc_dump (function): Fixture that parses the hgnc dump
+        setup_signedoff_panels (function): Fixture that creates the signedoff
+        panel dictionary
+    """
+
+    gene_locus_type = utils.get_locus_status_genes(
+        setup_td_data, setup_signedoff_panels, setup_hgnc_dump, setup_blacklist
+    )
+    genepanels_data = pd.concat(
+        [
+            setup_genepanels_data,
+            pd.DataFrame(
+                [
+                    ["C1.1_Bespoke_P", "Bespoke panel", "HGNC:1"],
+                    ["C2.1_Bespoke_P", "Bespoke panel", "HGNC:2"],
+                ],
+                columns=["ci", "panel", "gene"]
+            )
+        ], ignore_index=True
+    )
+
+    with caplog.at_level("INFO", logger="test_directory_checker.checker"):
+        checker.compare_gp_td(
+            setup_td_data, genepanels_data, setup_signedoff_panels,
+            gene_locus_type, setup_blacklist
+        )
+
+    assert capsys.readouterr().out == ""
+    assert [
+        record.getMessage() for record in caplog.records
+    ] == ["Skipped 2 bespoke 'C' clinical indications"]
+    assert caplog.records[0].bespoke_cis == 2
+
+
 def test_find_new_clinical_indications(setup_td_data, setup_genepanels_data):
     """ Test to find new clinical indications. 4 bespoke tests were added to
     the test directory data that the code is supposed to pick up
@@ -356,6 +765,53 @@ def test_find_new_clinical_indications(setup_td_data, setup_genepanels_data):
         )
 
 
+def test_get_td_gp_mapping(setup_td_data, setup_genepanels_data):
+    """ Test the mapping of the genepanels clinical indications to the test
+    directory tests. A bespoke clinical indication is added to check that it
+    doesn't get mapped
+
+    Args:
+        setup_td_data (function): Fixture that parses the test directory data
+        setup_genepanels_data (function): Fixture that parses the genepanels data
+    """
+
+    genepanels_data = pd.concat(
+        [
+            setup_genepanels_data,
+            pd.DataFrame(
+                [["C1.1_Bespoke test", "Bespoke panel", "HGNC:1228"]],
+                columns=["ci", "panel", "gene"]
+            )
+        ]
+    )
+
+    mapping = utils.get_td_gp_mapping(
+        utils.build_td_key_table(setup_td_data), genepanels_data
+    )
+
+    np.testing.assert_array_equal(
+        mapping["test_id"].to_numpy(),
+        [
+            "R130.1", "R341.1", "R122.1", "R143.1", "R347.1", "R100.1",
+            "R134.1", "R134.1", "R1000.1", "C1.1"
+        ]
+    )
+    np.testing.assert_array_equal(
+        mapping["match"].to_numpy(),
+        [
+            "identical", "identical", "identical", "identical", "identical",
+            "replaced", "replaced", "replaced", "removed", "bespoke"
+        ]
+    )
+    np.testing.assert_array_equal(
+        mapping["Test ID"].fillna("").to_numpy(),
+        [
+            "R130.1", "R341.1", "R122.1", "R143.1", "R347.1", "R100.2",
+            "R134.2", "R134.3", "", ""
+        ]
+    )
+
+
 def test_check_if_genes_in_db(
     setup_td_data, setup_hgnc_dump, setup_signedoff_panels, setup_blacklist
 ):
@@ -435,3 +891,264 @@ def test_check_if_genes_in_db(
         presence_in_db_df, "presence_in_db.html", Path("tests/test_outputs"),
         filtered_df
     )
+
+
+def test_format_td_data_records(
+    setup_td_data, setup_signedoff_panels, setup_hgnc_dump, setup_blacklist
+):
+    """ Test that formatting test records gives the same data as formatting
+    the test directory dataframe
+
+    Args:
+        setup_td_data (function): Fixture that parses the test directory data
+        setup_signedoff_panels (function): Fixture for the signedoff panels
+        setup_hgnc_dump (function): Fixture that parses the hgnc dump
+        setup_blacklist (function): Fixture that parses the blacklist config
+    """
+
+    gene_locus_type = utils.get_locus_status_genes(
+        setup_td_data, setup_signedoff_panels, setup_hgnc_dump,
+        setup_blacklist
+    )
+    td_tests = utils.get_td_records(setup_td_data)
+
+    assert len(td_tests) == len(setup_td_data)
+    assert td_tests[0].test_id == setup_td_data["Test ID"].iloc[0]
+    assert td_tests[0].panels == tuple(
+        setup_td_data["Identified panels"].iloc[0]
+    )
+
+    for position, td_test in enumerate(td_tests):
+        assert utils.format_td_data(
+            [td_test], {"HGNC:1228"}, setup_signedoff_panels, gene_locus_type,
+            setup_blacklist
+        ) == utils.format_td_data(
+            setup_td_data.iloc[[position]], {"HGNC:1228"},
+            setup_signedoff_panels, gene_locus_type, setup_blacklist
+        )
+
+
+def test_build_td_gene_table(
+    setup_td_data, setup_signedoff_panels, setup_hgnc_dump, setup_blacklist
+):
+    """ Test that the gene table contains the genes of the panels and the
+    genes of the targets of every test, and the same locus status as the
+    locus status of every gene
+
+    Args:
+        setup_td_data (function): Fixture that parses the test directory data
+        setup_signedoff_panels (function): Fixture for the signedoff panels
+        setup_hgnc_dump (function): Fixture that parses the hgnc dump
+        setup_blacklist (function): Fixture that parses the blacklist config
+    """
+
+    gene_table = utils.build_td_gene_table(
+        setup_td_data, setup_signedoff_panels, setup_blacklist,
+        setup_hgnc_dump
+    )
+
+    assert gene_table.columns.to_list() == [
+        "Test ID", "source", "HGNC ID", "included"
+    ]
+
+    for td_test in utils.get_td_records(setup_td_data):
+        test_genes = gene_table[gene_table["Test ID"] == td_test.test_id]
+
+        assert set(
+            test_genes.loc[test_genes["source"] == "direct", "HGNC ID"]
+        ) == set(td_test.genes)
+        assert set(
+            test_genes.loc[test_genes["source"] != "direct", "HGNC ID"]
+        ) == utils.get_all_hgnc_ids_in_target(
+            td_test.panels, setup_signedoff_panels, setup_blacklist
+        )
+
+    gene_locus_type = utils.get_locus_status_genes(
+        setup_td_data, setup_signedoff_panels, setup_hgnc_dump,
+        setup_blacklist, gene_table
+    )
+
+    for hgnc_id, included in gene_locus_type.items():
+        hgnc_info = setup_hgnc_dump[setup_hgnc_dump["HGNC ID"] == hgnc_id]
+
+        assert included == (
+            hgnc_id not in setup_blacklist["genes_with_no_transcripts"] and
+            "RNA" not in hgnc_info["Locus group"].to_numpy()[0] and
+            hgnc_info["Chromosome"].to_numpy()[0] != "mitochondria"
+        )
+
+    assert utils.get_genes_from_td_target(
+        setup_td_data, setup_signedoff_panels, gene_locus_type,
+        setup_blacklist, gene_table
+    ) == utils.get_genes_from_td_target(
+        setup_td_data, setup_signedoff_panels, gene_locus_type,
+        setup_blacklist
+    )
+
+
+def test_check_targets_no_tests():
+    """ Test that the targets of a test directory without tests e.g. a shard
+    without tests can be used to build the gene table
+    """
+
+    td_data = pd.DataFrame(
+        columns=[
+            "Test ID", "Clinical Indication", "Target/Genes", "Test Method"
+        ]
+    )
+
+    target_data = checker.check_targets(
+        td_data, pd.DataFrame(columns=utils.HGNC_COLUMNS)
+    )
+
+    assert target_data["Identified panels"].dtype == object
+    assert target_data["Identified genes"].dtype == object
+    assert utils.build_td_gene_table(
+        target_data, {}, {"unaccessible_panelapp_panels": frozenset()}
+    ).empty
+
+
+def test_score_replacements():
+    """ Test the scores and ranks of the tests potentially replacing
+    clinical indications, including a test without any gene
+    """
+
+    genepanels_df = pd.DataFrame(
+        [
+            ["R1.1_CI", "HGNC:1"], ["R1.1_CI", "HGNC:2"],
+            ["R1.1_CI", "HGNC:3"], ["R2.1_CI", "HGNC:4"],
+        ],
+        columns=["ci", "gene"]
+    )
+    gene_table = pd.DataFrame(
+        [
+            ["R1.2", "123", "HGNC:1"], ["R1.2", "123", "HGNC:5"],
+            ["R1.3", "direct", "HGNC:1"], ["R1.3", "direct", "HGNC:2"],
+            ["R1.3", "456", "HGNC:2"], ["R1.3", "456", "HGNC:3"],
+            ["R1.3", "456", "HGNC:6"], ["R2.2", "direct", "HGNC:7"],
+        ],
+        columns=["Test ID", "source", "HGNC ID"]
+    )
+    gene_locus_type = {f"HGNC:{i}": True for i in range(1, 8)}
+    # HGNC:6 is not captured so R1.3 has the same genes as R1.1
+    gene_locus_type["HGNC:6"] = False
+    # the only gene of R2.2 is not captured
+    gene_locus_type["HGNC:7"] = False
+
+    mapping = pd.DataFrame(
+        [
+            ["R1.1_CI", "replaced", "R1.2"], ["R1.1_CI", "replaced", "R1.3"],
+            ["R2.1_CI", "replaced", "R2.2"], ["R3.1_CI", "identical", "R3.1"],
+        ],
+        columns=["gemini_name", "match", "Test ID"]
+    )
+
+    scores = utils.score_replacements(
+        mapping, genepanels_df,
+        utils.build_td_gene_matrix(gene_table, gene_locus_type)
+    )
+
+    assert scores["Test ID"].to_list() == ["R1.2", "R1.3", "R2.2"]
+    np.testing.assert_array_almost_equal(scores["jaccard"], [0.25, 1, 0])
+    np.testing.assert_array_almost_equal(scores["overlap"], [0.5, 1, 0])
+    assert scores["rank"].to_list() == [2, 1, 1]
+    assert scores["best_match"].to_list() == [False, True, True]
+
+
+def test_check_if_genes_in_db_async():
+    """ Test that the asyncio version of the database check gives the same
+    results as the synchronous one using the test SQLite database
+    """
+
+    genes_to_check = {"HGNC:1228", "HGNC:6666", "HGNC:9999"}
+
+    presence_in_db_df = asyncio.run(
+        checker.check_if_genes_present_in_db_async(
+            "", "", "tests/test_files/test_db.db", "sqlite", genes_to_check,
+            batch_size=2
+        )
+    )
+
+    expected_presence_genes = checker.check_if_genes_present_in_db(
+        "", "", "tests/test_files/test_db.db", "sqlite", genes_to_check
+    )
+
+    for col in expected_presence_genes.columns:
+        np.testing.assert_array_equal(
+            presence_in_db_df[col].to_numpy(),
+            expected_presence_genes[col].to_numpy()
+        )
+
+    np.testing.assert_array_equal(
+        presence_in_db_df["has_clinical_transcript"].to_numpy(),
+        [True, False, False]
+    )
+
+
+def test_check_if_genes_in_db_snapshot(tmp_path):
+    """ Test that a snapshot exported from the test SQLite database gives the
+    same results as querying the database directly
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    genes_to_check = {"HGNC:1228", "HGNC:6666", "HGNC:9999", "not_an_id"}
+    snapshot_file = tmp_path / "db_snapshot.npz"
+
+    checker.export_db_snapshot(
+        "", "", "tests/test_files/test_db.db", "sqlite", snapshot_file
+    )
+
+    presence_in_db_df = checker.check_if_genes_present_in_snapshot(
+        snapshot_file, genes_to_check
+    )
+
+    expected_presence_genes = checker.check_if_genes_present_in_db(
+        "", "", "tests/test_files/test_db.db", "sqlite", genes_to_check
+    )
+
+    for col in expected_presence_genes.columns:
+        np.testing.assert_array_equal(
+            presence_in_db_df[col].to_numpy(),
+            expected_presence_genes[col].to_numpy()
+        )
+
+
+def test_filter_out_df():
+    """ Test that the conditions are combined in one mask: by default a row is
+    kept if it passes any condition, with how="all" it has to pass all of them
+    and the rows keep their original order. Without conditions the dataframe
+    is returned as is
+    """
+
+    df = pd.DataFrame(
+        [
+            ["R1.1", None, None, [], []],
+            ["R2.1", None, "HGNC:1", ["123"], []],
+            ["R3.1", "HGNC:2", None, [], []],
+            ["R4.1", "HGNC:3", "HGNC:4", [], ["HGNC:5"]],
+        ],
+        columns=[
+            "Test ID", "removed", "added", "Identified panels",
+            "Identified genes"
+        ]
+    )
+
+    filtered_df = utils.filter_out_df(df, removed=None, added=None)
+    np.testing.assert_array_equal(
+        filtered_df["Test ID"].to_numpy(), ["R2.1", "R3.1", "R4.1"]
+    )
+
+    filtered_df = utils.filter_out_df(
+        df, how="all", **{
+            "Identified panels": utils.is_empty,
+            "Identified genes": utils.is_empty
+        }
+    )
+    np.testing.assert_array_equal(
+        filtered_df["Test ID"].to_numpy(), ["R1.1", "R3.1"]
+    )
+
+    # without conditions nothing is filtered out
+    pd.testing.assert_frame_equal(utils.filter_out_df(df), df)
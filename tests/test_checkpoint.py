@@ -0,0 +1,91 @@
+import asyncio
+
+import pandas as pd
+
+from test_directory_checker import checkpoint
+
+
+def test_run_stage(tmp_path):
+    """ Test that a stage is only run again when the hash of its inputs
+    changes
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    input_file = tmp_path / "input.tsv"
+    input_file.write_text("R1.1\tHGNC:1\n")
+    calls = []
+
+    def stage(value):
+        calls.append(value)
+        return pd.DataFrame({"value": [value]}), {"HGNC:1": True}
+
+    stage_hash = checkpoint.get_stage_hash(files=[input_file, None])
+
+    first_result = checkpoint.run_stage(tmp_path, "stage", stage_hash, stage, 1)
+    second_result = checkpoint.run_stage(
+        tmp_path, "stage", stage_hash, stage, 2
+    )
+
+    assert calls == [1]
+    pd.testing.assert_frame_equal(first_result[0], second_result[0])
+    assert second_result[1] == {"HGNC:1": True}
+    assert checkpoint.get_checkpoint_path(tmp_path, "stage").exists()
+
+    # changing an input file invalidates the stage and the stages after it
+    next_stage_hash = checkpoint.get_stage_hash(stage_hash, values=[100])
+    input_file.write_text("R1.1\tHGNC:2\n")
+    new_stage_hash = checkpoint.get_stage_hash(files=[input_file, None])
+
+    assert new_stage_hash != stage_hash
+    assert checkpoint.get_stage_hash(
+        new_stage_hash, values=[100]
+    ) != next_stage_hash
+
+    checkpoint.run_stage(tmp_path, "stage", new_stage_hash, stage, 3)
+
+    assert calls == [1, 3]
+
+
+def test_run_async_stage(tmp_path):
+    """ Test that the result of a coroutine stage is loaded from its
+    checkpoint
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    calls = []
+
+    async def stage(value):
+        calls.append(value)
+        return value
+
+    for value in [1, 2]:
+        assert asyncio.run(
+            checkpoint.run_async_stage(tmp_path, "stage", "hash", stage, value)
+        ) == 1
+
+    assert calls == [1]
+
+
+def test_remove_checkpoints(tmp_path):
+    """ Test that the checkpoints of a run are removed without touching the
+    other files of the run folder
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    report = tmp_path / "targets.html"
+    report.write_text("report")
+    checkpoint.write_checkpoint(tmp_path, "stage", "hash", 1)
+
+    checkpoint.remove_checkpoints(tmp_path)
+
+    assert not (tmp_path / checkpoint.CHECKPOINT_FOLDER).exists()
+    assert report.exists()
+
+    # a run folder without checkpoints is left as is
+    checkpoint.remove_checkpoints(tmp_path)
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+
+from test_directory_checker import checker, config, utils
+
+TD_CONFIG = {
+    "name": "config",
+    "sheet_of_interest": "R&ID indications",
+    "header_index": 1,
+    "clinical_indication_column_code": "Clinical indication ID",
+    "clinical_indication_column_name": "Clinical Indication",
+    "panel_column": "Target/Genes",
+    "test_method_column": "Test Method",
+    "ngs_column": "Commissioned",
+    "ngs_type": ["Yes"],
+    "ngs_test_methods": ["WGS", "Small panel", "WES", "Small panel"]
+}
+
+
+def write_config(tmp_path, data) -> str:
+    config_path = tmp_path / "config.json"
+
+    with open(config_path, "w") as f:
+        json.dump(data, f)
+
+    return str(config_path)
+
+
+def test_load_td_config(tmp_path):
+    """ Test that the test directory config is loaded as an immutable config
+    keeping the order of the test methods
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    td_config = utils.load_config(write_config(tmp_path, TD_CONFIG))
+
+    assert isinstance(td_config, config.TDConfig)
+    assert td_config["header_index"] == 1
+    assert td_config["ngs_type"] == frozenset({"Yes"})
+    assert td_config["ngs_test_methods"] == (
+        "WGS", "Small panel", "WES", "Small panel"
+    )
+    assert td_config.ngs_test_method_set == {"WGS", "Small panel", "WES"}
+    assert "ngs_column" in td_config
+    assert td_config.get("missing_key") is None
+
+    with pytest.raises(KeyError):
+        td_config["missing_key"]
+
+    with pytest.raises(AttributeError):
+        td_config.header_index = 2
+
+
+def test_load_invalid_config(tmp_path):
+    """ Test that every problem of an invalid config is reported
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    data = {
+        key: value for key, value in TD_CONFIG.items() if key != "panel_column"
+    }
+    data["header_index"] = "1"
+    data["ngs_test_methods"] = "WGS"
+    config_path = write_config(tmp_path, data)
+
+    with pytest.raises(AssertionError) as error:
+        utils.load_config(config_path)
+
+    assert str(error.value) == (
+        f"'{config_path}' is not a valid config: 'header_index' should be of "
+        "type int; 'panel_column' is missing; 'ngs_test_methods' should be a "
+        "list of strings"
+    )
+    assert config.TDConfig.get_errors([]) == [
+        "the config should be a JSON object"
+    ]
+
+
+def test_load_blacklist_config(blacklist_config):
+    """ Test that the blacklist config is loaded with frozensets of strings
+
+    Args:
+        blacklist_config (str): Path to the blacklist config
+    """
+
+    blacklist = utils.load_config(blacklist_config, config.BlacklistConfig)
+
+    assert isinstance(blacklist.unaccessible_panelapp_panels, frozenset)
+    assert all(
+        isinstance(panel_id, str)
+        for panel_id in blacklist.unaccessible_panelapp_panels
+    )
+    assert isinstance(blacklist.genes_with_no_transcripts, frozenset)
+
+
+def test_check_test_method_config(tmp_path):
+    """ Test that the test methods are checked against a loaded config
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    td_config = utils.load_config(write_config(tmp_path, TD_CONFIG))
+
+    assert checker.check_test_method(
+        {"Test Method": "WES"}, td_config
+    )["Potential new test methods"] == ""
+    assert checker.check_test_method(
+        {"Test Method": "Large panel"}, td_config
+    )["Potential new test methods"] == "Large panel"
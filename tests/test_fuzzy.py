@@ -0,0 +1,33 @@
+from test_directory_checker import fuzzy
+
+
+def test_trigram_index_search():
+    """ Test that the closest strings are found, sorted by similarity and
+    limited in number
+    """
+
+    index = fuzzy.TrigramIndex(
+        ["BMPR2", "BMPR1A", "ABCC8", "ABCC9", "SERPING1", "BMPR2"]
+    )
+
+    assert index.strings == ["BMPR2", "BMPR1A", "ABCC8", "ABCC9", "SERPING1"]
+
+    assert [string for string, similarity in index.search("BMRP2")] == [
+        "BMPR2"
+    ]
+
+    results = index.search("BMPR")
+    assert [string for string, similarity in results] == ["BMPR2", "BMPR1A"]
+    assert results[0][1] > results[1][1]
+
+    # ties are in order of indexing
+    assert [
+        string for string, similarity in index.search("ABCC", limit=1)
+    ] == ["ABCC8"]
+
+    assert index.search("serping1") == [("SERPING1", 1.0)]
+    assert index.search("XYZ") == []
+
+    assert fuzzy.format_candidates(index.search("serping1")) == (
+        "SERPING1 (1.00)"
+    )
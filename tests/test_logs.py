@@ -0,0 +1,47 @@
+import json
+import logging
+
+import pandas as pd
+
+from test_directory_checker import checkpoint, logs
+
+
+def test_json_log(tmp_path):
+    """ Test that the stages are logged to the JSON log with their throughput
+    and that the handlers are replaced when the logging is setup again
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    json_log = tmp_path / "log.jsonl"
+    logs.setup_logging("DEBUG", json_log)
+    logs.setup_logging("INFO", json_log)
+
+    try:
+        checkpoint.run_stage(
+            tmp_path, "stage", "hash", lambda: (pd.DataFrame({"a": [1, 2]}),)
+        )
+        logging.getLogger("test_directory_checker.test").debug("Not logged")
+    finally:
+        logs.setup_logging()
+
+    with open(json_log) as f:
+        records = [json.loads(line) for line in f]
+
+    assert len(records) == 1
+    assert records[0]["logger"] == "test_directory_checker.checkpoint"
+    assert records[0]["level"] == "INFO"
+    assert records[0]["stage"] == "stage"
+    assert records[0]["rows"] == 2
+    assert records[0]["rows_per_second"] > 0
+
+
+def test_count_rows():
+    """ Test the count of the rows of the results of the stages """
+
+    df = pd.DataFrame({"a": [1, 2, 3]})
+
+    assert logs.count_rows(df) == 3
+    assert logs.count_rows((df, (df, None), {"a": 1})) == 6
+    assert logs.count_rows(None) == 0
@@ -0,0 +1,166 @@
+import gzip
+import stat
+import tarfile
+
+import pandas as pd
+import pytest
+
+from test_directory_checker import output
+
+
+def test_output_reports(tmp_path):
+    """ Test that the reports rendered concurrently are identical to the
+    reports rendered one by one and that no temporary file is left behind
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    table = pd.DataFrame(
+        [["R1.1", "HGNC:1"], ["R2.1", None]], columns=["Test ID", "added"]
+    )
+    test_methods = pd.Series(
+        [["R1.1"], ["R2.1"]], index=["WGS", "Small panel"]
+    )
+
+    sequential_folder = tmp_path / "sequential"
+    concurrent_folder = tmp_path / "concurrent"
+    sequential_folder.mkdir()
+    concurrent_folder.mkdir()
+
+    output.output_table(table, "table.html", sequential_folder, table[:1])
+    output.output_test_methods(
+        test_methods, "test_methods.html", sequential_folder
+    )
+
+    output.output_reports([
+        (
+            output.output_table, table, "table.html", concurrent_folder,
+            table[:1]
+        ),
+        (
+            output.output_test_methods, test_methods, "test_methods.html",
+            concurrent_folder
+        ),
+    ])
+
+    assert sorted(path.name for path in concurrent_folder.iterdir()) == [
+        "table.html", "test_methods.html"
+    ]
+
+    for report in ["table.html", "test_methods.html"]:
+        assert (concurrent_folder / report).read_bytes() == (
+            sequential_folder / report
+        ).read_bytes()
+
+    # errors in the threads are raised
+    with pytest.raises(AttributeError):
+        output.output_reports([
+            (output.output_table, None, "error.html", concurrent_folder)
+        ])
+
+    assert not (concurrent_folder / "error.html").exists()
+
+
+def test_write_file_atomically_permissions(tmp_path):
+    """ Test that a new output file has the permissions of a file created with
+    open and that a rewritten output file keeps its permissions
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    reference_file = tmp_path / "reference.txt"
+    reference_file.write_text("reference")
+    output_file = tmp_path / "output.txt"
+
+    output.write_file_atomically("first", output_file)
+
+    assert stat.S_IMODE(output_file.stat().st_mode) == stat.S_IMODE(
+        reference_file.stat().st_mode
+    )
+
+    output_file.chmod(0o600)
+    output.write_file_atomically("second", output_file)
+
+    assert output_file.read_text() == "second"
+    assert stat.S_IMODE(output_file.stat().st_mode) == 0o600
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "output.txt", "reference.txt"
+    ]
+
+
+@pytest.mark.parametrize("compression", ["gzip", "zstd"])
+def test_compressed_outputs(tmp_path, compression):
+    """ Test that the compressed reports and appended tables have the same
+    content as the uncompressed ones
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+        compression (str): Compression to test
+    """
+
+    if compression == "zstd":
+        zstandard = pytest.importorskip("zstandard")
+        decompress = zstandard.ZstdDecompressor().stream_reader
+    else:
+        decompress = gzip.open
+
+    table = pd.DataFrame(
+        [["R1.1", "HGNC:1"], ["R2.1", None]], columns=["Test ID", "added"]
+    )
+
+    output.output_table(table, "table.html", tmp_path)
+    output.output_table(table, "table.html", tmp_path, compression=compression)
+
+    output.append_table(table[:1], "table.tsv", tmp_path)
+    output.append_table(table[1:], "table.tsv", tmp_path)
+    output.append_table(table[:1], "table.tsv", tmp_path, compression)
+    output.append_table(table[1:], "table.tsv", tmp_path, compression)
+
+    extension = output.COMPRESSION_EXTENSIONS[compression]
+
+    for output_name in ["table.html", "table.tsv"]:
+        with open(tmp_path / f"{output_name}{extension}", "rb") as f:
+            with decompress(f) as decompressed_f:
+                assert decompressed_f.read() == (
+                    tmp_path / output_name
+                ).read_bytes()
+
+
+def test_is_compression_available(monkeypatch):
+    """ Test that zstd compression is unavailable without the zstandard
+    package
+
+    Args:
+        monkeypatch (MonkeyPatch): Pytest fixture to patch the module
+    """
+
+    monkeypatch.setattr(output, "zstandard", None)
+
+    assert output.is_compression_available(None)
+    assert output.is_compression_available("gzip")
+    assert not output.is_compression_available("zstd")
+
+
+def test_bundle_output_folder(tmp_path):
+    """ Test that the output folder is replaced by a tar bundle containing
+    its files
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    run_folder = tmp_path / "231012-1"
+    run_folder.mkdir()
+    output.log_command_line(run_folder, "main.py")
+
+    bundle = output.bundle_output_folder(run_folder, "gzip")
+
+    assert bundle == tmp_path / "231012-1.tar.gz"
+    assert not run_folder.exists()
+
+    with tarfile.open(bundle, "r:gz") as tar:
+        assert tar.extractfile(
+            "231012-1/command_line.txt"
+        ).read() == b"main.py"
@@ -0,0 +1,212 @@
+import json
+import sqlite3
+
+import pandas as pd
+
+from test_directory_checker import checker, preflight
+
+TD_CONFIG = {
+    "sheet_of_interest": "R&ID indications",
+    "header_index": 1,
+    "clinical_indication_column_code": "Test ID",
+    "clinical_indication_column_name": "Clinical Indication",
+    "panel_column": "Target/Genes",
+    "test_method_column": "Test Method",
+    "ngs_column": "Technology",
+    "ngs_type": ["NGS"],
+    "ngs_test_methods": ["Small panel", "WES"]
+}
+
+
+def write_inputs(tmp_path, td_data: str, td_config: dict) -> tuple:
+    """ Write a test directory Excel file with a title row before its header
+    and its config
+
+    Args:
+        tmp_path (Path): Temporary folder
+        td_data (str): Path to the test directory TSV of the tests
+        td_config (dict): Data of the config
+
+    Returns:
+        tuple: Paths to the test directory and to the config
+    """
+
+    test_directory = tmp_path / "td.xlsx"
+    config_file = tmp_path / "config.json"
+
+    td = pd.read_csv(td_data, sep="\t")
+    td["Technology"] = "NGS"
+    td.to_excel(
+        test_directory, sheet_name="R&ID indications", startrow=1,
+        index=False
+    )
+
+    with open(config_file, "w") as f:
+        json.dump(td_config, f)
+
+    return str(test_directory), str(config_file)
+
+
+def test_preflight_checks(
+    tmp_path, td_data, hgnc_dump, genepanels_data, blacklist_config
+):
+    """ Test that no problem is found for valid inputs and a database with
+    the tables queried by the checker
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+        td_data (str): Path to the test directory TSV
+        hgnc_dump (str): Path to the HGNC dump
+        genepanels_data (str): Path to the genepanels file
+        blacklist_config (str): Path to the blacklist config
+    """
+
+    test_directory, config_file = write_inputs(tmp_path, td_data, TD_CONFIG)
+    checks = preflight.get_preflight_checks(
+        {
+            "test_directory": test_directory, "hgnc_dump": hgnc_dump,
+            "genepanels": genepanels_data, "config": config_file,
+            "db_snapshot": None, "db_user": "", "db_password": "",
+            "db_name": "tests/test_files/test_db.db"
+        },
+        blacklist_config
+    )
+    checks["database"] = (*checks["database"], "sqlite")
+
+    assert preflight.run_preflight_checks(checks) == []
+
+
+def test_preflight_problems(tmp_path, td_data, blacklist_config):
+    """ Test that the problems of every input are reported at once
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+        td_data (str): Path to the test directory TSV
+        blacklist_config (str): Path to the blacklist config
+    """
+
+    test_directory, config_file = write_inputs(
+        tmp_path, td_data, {**TD_CONFIG, "header_index": 0}
+    )
+
+    hgnc_dump = tmp_path / "hgnc_dump.tsv"
+    hgnc_dump.write_text(
+        "HGNC ID\tApproved symbol\tPrevious symbols\tAlias symbols\t"
+        "Chromosome\nHGNC:1100\tBRCA1\t\t\t17q21.31\n"
+    )
+
+    genepanels = tmp_path / "genepanels.tsv"
+    genepanels.write_text(
+        "R208.1_Inherited breast cancer_P\tpanel_1.0\tHGNC:1100\t158\n"
+        "R208.1_Inherited breast cancer_P\tpanel_1.0\tHGNC:1101\t158\textra\n"
+    )
+
+    snapshot = tmp_path / "db_snapshot.npz"
+
+    problems = preflight.run_preflight_checks(
+        preflight.get_preflight_checks(
+            {
+                "test_directory": test_directory,
+                "hgnc_dump": str(hgnc_dump), "genepanels": str(genepanels),
+                "config": config_file, "db_snapshot": str(snapshot)
+            },
+            blacklist_config
+        )
+    )
+
+    assert problems == [
+        (
+            "test directory: the header of the 'R&ID indications' sheet (row "
+            "1) is missing the following columns: Test ID, Clinical "
+            "Indication, Target/Genes, Test Method, Technology. Check the "
+            "header_index of the config"
+        ),
+        (
+            f"HGNC dump: '{hgnc_dump}' is missing the following columns: "
+            "Locus group. Check the boxes for these columns when downloading "
+            "the HGNC dump"
+        ),
+        (
+            f"genepanels: line 2 of '{genepanels}' has 5 columns instead of 3 "
+            "or 4"
+        ),
+        f"database snapshot: '{snapshot}' doesn't exist",
+    ]
+
+
+def test_preflight_invalid_config(tmp_path, blacklist_config):
+    """ Test that the problems of the config and the errors of the checks are
+    reported
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+        blacklist_config (str): Path to the blacklist config
+    """
+
+    config_file = tmp_path / "config.json"
+    config_file.write_text(json.dumps({**TD_CONFIG, "header_index": "1"}))
+
+    def failing_check():
+        raise ValueError("unexpected")
+
+    problems = preflight.run_preflight_checks(
+        {
+            "config": (preflight.check_config, str(config_file)),
+            "blacklist config": (
+                preflight.check_config, blacklist_config,
+                preflight.BlacklistConfig
+            ),
+            "test directory": (
+                preflight.check_test_directory, blacklist_config,
+                str(config_file)
+            ),
+            "other": (failing_check,)
+        }
+    )
+
+    assert problems == [
+        "config: 'header_index' should be of type int",
+        "other: the check failed: ValueError('unexpected')",
+    ]
+
+
+def test_check_db_schema(tmp_path):
+    """ Test that the missing tables and columns of the database are reported
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    db = tmp_path / "db.sqlite"
+
+    with sqlite3.connect(db) as conn:
+        conn.execute("CREATE TABLE gene (id INTEGER, symbol TEXT)")
+
+    assert preflight.check_db_schema("", "", str(db), "sqlite") == [
+        "the 'gene' table is missing the following columns: hgnc_id",
+        "the 'genes2transcripts' table is missing",
+    ]
+
+
+def test_check_db_schema_timeout(monkeypatch):
+    """ Test that the connection to the MySQL database uses a short timeout
+    so that an unreachable database doesn't block the checks
+
+    Args:
+        monkeypatch (MonkeyPatch): Pytest fixture to patch the engine creation
+    """
+
+    engine_kwargs = {}
+
+    def create_async_engine(url, **kwargs):
+        engine_kwargs.update(kwargs)
+        raise ConnectionError("unreachable")
+
+    monkeypatch.setattr(checker, "create_async_engine", create_async_engine)
+
+    assert preflight.check_db_schema("user", "pwd", "db") == [
+        "can't connect to the 'db' database: unreachable"
+    ]
+    assert engine_kwargs["connect_args"] == {
+        "connect_timeout": preflight.DB_CONNECT_TIMEOUT
+    }
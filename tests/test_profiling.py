@@ -0,0 +1,85 @@
+import json
+
+from test_directory_checker import profiling
+
+
+@profiling.profile
+def add(a, b):
+    return a + b
+
+
+def test_log_summary(caplog):
+    """ Test that the profiling summary is logged with its rows as an extra
+    field
+
+    Args:
+        caplog (LogCaptureFixture): Pytest fixture capturing the logs
+    """
+
+    enabled = profiling.PROFILER.enabled
+    profiling.PROFILER.reset()
+
+    try:
+        profiling.PROFILER.enabled = True
+        add(1, 2)
+
+        with caplog.at_level("INFO", logger="test_directory_checker"):
+            profiling.PROFILER.log_summary()
+    finally:
+        profiling.PROFILER.enabled = enabled
+        profiling.PROFILER.reset()
+
+    record = caplog.records[-1]
+
+    assert record.name == "test_directory_checker.profiling"
+    assert "test_profiling.add" in record.getMessage()
+    assert record.profile[0]["name"] == "test_profiling.add"
+    assert record.profile[0]["calls"] == 1
+
+
+def test_profiling(tmp_path):
+    """ Test that the profiled calls are only recorded when profiling is on
+    and that they are exported in the Chrome trace format
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    enabled = profiling.PROFILER.enabled
+    profiling.PROFILER.reset()
+
+    try:
+        profiling.PROFILER.enabled = False
+        assert add(1, 2) == 3
+
+        with profiling.track("block"):
+            pass
+
+        assert profiling.PROFILER.summary().empty
+
+        profiling.PROFILER.enabled = True
+        add(1, 2)
+        add(3, 4)
+        profiling.PROFILER.count_cache_hit("test_profiling.add")
+
+        with profiling.track("block"):
+            pass
+
+        summary = profiling.PROFILER.summary().set_index("name")
+
+        assert summary.loc["test_profiling.add", "calls"] == 2
+        assert summary.loc["test_profiling.add", "cache_hits"] == 1
+        assert summary.loc["block", "calls"] == 1
+
+        trace_file = tmp_path / "trace.json"
+        profiling.PROFILER.export_chrome_trace(trace_file)
+
+        with open(trace_file) as f:
+            trace_events = json.load(f)["traceEvents"]
+
+        assert len(trace_events) == 3
+        assert all(event["ph"] == "X" for event in trace_events)
+
+    finally:
+        profiling.PROFILER.enabled = enabled
+        profiling.PROFILER.reset()
@@ -0,0 +1,296 @@
+import pandas as pd
+import pytest
+
+import main
+from test_directory_checker import checker, shard, store, utils
+from test_directory_checker.config import BlacklistConfig, TDConfig
+
+TD_CONFIG = {
+    "sheet_of_interest": "R&ID indications",
+    "header_index": 1,
+    "clinical_indication_column_code": "Test ID",
+    "clinical_indication_column_name": "Clinical Indication",
+    "panel_column": "Target/Genes",
+    "test_method_column": "Test Method",
+    "ngs_column": "Technology",
+    "ngs_type": ["NGS"],
+    "ngs_test_methods": ["Small panel", "WES", "Single gene"]
+}
+
+HGNC_DUMP = [
+    ["HGNC:1", "GENEX", None, "AMB", "protein-coding gene", "1p36"],
+    ["HGNC:2", "AMB", None, None, "protein-coding gene", "2q11"],
+    ["HGNC:59", "ABCC8", None, None, "protein-coding gene", "11p15.1"],
+    ["HGNC:1100", "BRCA1", None, None, "protein-coding gene", "17q21.31"],
+    ["HGNC:1101", "BRCA2", None, None, "protein-coding gene", "13q13.1"],
+    ["HGNC:1228", "SERPING1", None, "C1NH", "protein-coding gene", "11q12.1"],
+    ["HGNC:3531", "F13A1", None, None, "protein-coding gene", "6p25.1"],
+    ["HGNC:9999", "RNU1", None, None, "non-coding RNA", "1p36"],
+]
+
+TD_TESTS = [
+    ["R1.1", "Breast cancer", "Breast cancer (10)", "Small panel"],
+    ["R2.1", "Angioedema", "SERPING1", "Single gene"],
+    ["R2.2", "Breast cancer", "Breast cancer (10)", "Small pannel"],
+    ["R3.2", "Factor XIII deficiency", "F13A1, ABCC8", "WES"],
+    ["R3.3", "Factor XIII deficiency", "Diabetes (20)", "WES"],
+    ["R4.1", "Cancer", "BRCA1, FOOBAR", "Small pannel"],
+    ["R5.1", "Ambiguous", "AMB", "Large panel"],
+    ["R5.2", "Breast cancer", "Breast cancer (10)", "WES"],
+    ["R6.1", "Diabetes", "Diabetes (20)", "Small pannel"],
+    ["R7.1", "New clinical indication", "RNU1, C1NH", "Single gene"],
+]
+
+GENEPANELS = [
+    ["R1.1_Breast cancer_P", "Breast cancer_1.0", "HGNC:1100"],
+    ["R1.1_Breast cancer_P", "Breast cancer_1.0", "HGNC:1101"],
+    ["R2.1_Angioedema_G", "HGNC:1228_SG_panel_1.0.0", "HGNC:1228"],
+    ["R3.1_Factor XIII deficiency_P", "F13_2.0", "HGNC:59"],
+    ["R3.1_Factor XIII deficiency_P", "F13_2.0", "HGNC:3531"],
+    ["R4.1_Cancer_P", "Cancer_1.0", "HGNC:1100"],
+    ["R8.1_Removed_P", "Removed_1.0", "HGNC:59"],
+    ["C1.1_Bespoke_P", "Bespoke_1.0", "HGNC:1"],
+]
+
+
+def test_parse_shard():
+    """ Test the parsing of the shard given on the command line """
+
+    assert shard.parse_shard("2/4") == (2, 4)
+
+    for invalid_shard in ["0/4", "5/4", "2", "a/4"]:
+        with pytest.raises(AssertionError):
+            shard.parse_shard(invalid_shard)
+
+
+def test_get_shard_mask():
+    """ Test that every test belongs to exactly one shard and that the tests
+    sharing a clinical indication code belong to the same shard
+    """
+
+    test_ids = pd.Series(
+        [f"R{i}.{j}" for i in range(1, 50) for j in range(1, 4)]
+    )
+    masks = [shard.get_shard_mask(test_ids, i, 4) for i in range(1, 5)]
+
+    assert (sum(mask.astype(int) for mask in masks) == 1).all()
+
+    for mask in masks:
+        ci_codes = test_ids.str.split(".").str[0]
+        assert set(ci_codes[mask]).isdisjoint(ci_codes[~mask])
+
+
+def test_merge_shard_results(tmp_path):
+    """ Test that the tables of tests split across shards are put back in the
+    order of the test directory and that missing shards are caught
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    target_data = pd.DataFrame(
+        {
+            "Test ID": ["R1.1", "R2.1", "R1.2", "R3.1"],
+            "Target/Genes": ["GENEA, GENEB", "GENEB", "GENEA", "Panel (1)"],
+            "Identified panels": [[], [], [], ["1"]],
+        }
+    )
+    unresolved_symbols = pd.DataFrame(
+        {
+            "Symbol": ["GENEA", "GENEB"], "Test ID": [[], []],
+            "Closest symbols": ["GENE1 (0.8)", ""],
+            "HGNC IDs": ["", "HGNC:1 (alias), HGNC:2 (approved)"],
+        }
+    )
+
+    shard_files = [
+        shard.write_shard_results(tmp_path, shard_index, 2, {"name": i})
+        for i, shard_index in enumerate([2, 1])
+    ]
+
+    assert shard.load_shard_results(shard_files) == [{"name": 1}, {"name": 0}]
+
+    with pytest.raises(AssertionError):
+        shard.load_shard_results(shard_files[:1])
+
+    shards = [target_data.iloc[[1, 3]], target_data.iloc[[2, 0]]]
+    merged_data = shard.merge_td_tables(shards)
+
+    pd.testing.assert_frame_equal(merged_data, target_data)
+
+    merged_symbols = shard.merge_unresolved_symbols(
+        merged_data, [unresolved_symbols.iloc[[1]], unresolved_symbols]
+    )
+
+    assert merged_symbols["Symbol"].to_list() == ["GENEA", "GENEB"]
+    assert merged_symbols["Test ID"].to_list() == [
+        ["R1.1", "R1.2"], ["R1.1", "R2.1"]
+    ]
+    assert merged_symbols["HGNC IDs"].to_list() == [
+        "", "HGNC:1 (alias), HGNC:2 (approved)"
+    ]
+
+
+class MockPanel:
+    """ Mock of the Panelapp panel objects with a version and genes """
+
+    def __init__(self, version: str, genes: list):
+        self.version = version
+        self.genes = genes
+
+    def get_version(self):
+        return self.version
+
+    def get_genes(self):
+        return [{"hgnc_id": gene} for gene in self.genes]
+
+
+def run_shard_stages(
+    td_data: pd.DataFrame, genepanels_df: pd.DataFrame, inputs: dict
+) -> dict:
+    """ Run the stages of main.py on the test directory and genepanels data
+    of a shard, or of the whole run, without Panelapp and the database
+    server
+
+    Args:
+        td_data (pd.DataFrame): Dataframe with the test directory data
+        genepanels_df (pd.DataFrame): Dataframe with the genepanels data
+        inputs (dict): Dict with the HGNC data, panels, configs, store and
+        database of the run
+
+    Returns:
+        dict: Dict of the results written by main.py for a shard
+    """
+
+    (
+        symbol_table, target_data, test_method_data, new_test_methods,
+        unresolved_symbols
+    ) = main.check_td_data(td_data, inputs["hgnc_data"], inputs["td_config"])
+    panel_changes = main.check_panel_changes(
+        inputs["store"], inputs["panels"], target_data, inputs["blacklist"],
+        False
+    )
+    gene_table, gene_locus_type, genes_to_check = main.get_td_genes(
+        target_data, inputs["panels"], inputs["hgnc_data"],
+        inputs["blacklist"]
+    )
+    identical_tests, removed_tests, replaced_tests = checker.compare_gp_td(
+        target_data, genepanels_df, inputs["panels"], gene_locus_type,
+        inputs["blacklist"], gene_table
+    )
+    new_cis = checker.find_new_clinical_indications(target_data, genepanels_df)
+
+    # sorted like main.py does
+    sort_columns = ["Test Method", "Test ID"]
+
+    return {
+        "identical_tests": identical_tests,
+        "removed_tests": removed_tests,
+        "replaced_tests": replaced_tests,
+        "ci_positions": shard.get_ci_positions(genepanels_df),
+        "new_cis": new_cis.sort_values(sort_columns),
+        "targets": target_data.sort_values(sort_columns),
+        "test_methods": test_method_data.sort_values(sort_columns),
+        "new_test_methods": new_test_methods,
+        "presence_in_db": checker.check_if_genes_present_in_db(
+            "", "", inputs["db"], "sqlite", genes_to_check
+        ),
+        "panel_changes": panel_changes,
+        "unresolved_symbols": unresolved_symbols,
+        "panels": {
+            int(panel_id): inputs["panels"][int(panel_id)]
+            for panel_id in main.get_td_panel_ids(
+                target_data, inputs["blacklist"]
+            )
+        },
+        "gene_table": gene_table,
+        "symbol_table": symbol_table,
+        "genepanels": genepanels_df,
+        "inputs": {"db": inputs["db"]},
+        "input_hashes": store.get_input_hashes({"db": inputs["db"]}),
+    }
+
+
+@pytest.mark.parametrize("nb_shards", [2, 3, 5])
+def test_merge_shards_like_full_run(tmp_path, nb_shards):
+    """ Test that merging the results of the shards gives every report table
+    of a run on the whole test directory and genepanels data
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+        nb_shards (int): Number of shards
+    """
+
+    td_data = pd.DataFrame(
+        TD_TESTS, columns=[
+            "Test ID", "Clinical Indication", "Target/Genes", "Test Method"
+        ]
+    ).assign(Technology="NGS")
+    genepanels_df = pd.DataFrame(GENEPANELS, columns=["ci", "panel", "gene"])
+    hgnc_data = pd.DataFrame(HGNC_DUMP, columns=utils.HGNC_COLUMNS)
+
+    store_path = tmp_path / "results.db"
+    store.write_panel_versions(
+        store_path, {10: MockPanel("1.0", ["HGNC:1100"])}, ["10"]
+    )
+
+    inputs = {
+        "hgnc_data": hgnc_data,
+        "panels": {
+            10: MockPanel("1.1", ["HGNC:1100", "HGNC:1101"]),
+            20: MockPanel("2.0", ["HGNC:59", "HGNC:3531"]),
+        },
+        "td_config": TDConfig.from_dict(TD_CONFIG),
+        "blacklist": BlacklistConfig.from_dict(
+            {
+                "unaccessible_panelapp_panels": [],
+                "genes_with_no_transcripts": []
+            }
+        ),
+        "store": store_path,
+        "db": "tests/test_files/test_db.db",
+    }
+
+    expected_results = run_shard_stages(td_data, genepanels_df, inputs)
+    shard_files = [
+        shard.write_shard_results(
+            tmp_path, shard_index, nb_shards, run_shard_stages(
+                shard.select_td_shard(td_data, shard_index, nb_shards),
+                shard.select_genepanels_shard(
+                    genepanels_df, shard_index, nb_shards
+                ),
+                inputs
+            )
+        )
+        for shard_index in range(1, nb_shards + 1)
+    ]
+    merged_results = shard.merge_shard_results(
+        shard.load_shard_results(shard_files)
+    )
+
+    # the data covers every report
+    for name in [
+        "identical_tests", "removed_tests", "replaced_tests", "new_cis",
+        "new_test_methods", "panel_changes", "unresolved_symbols"
+    ]:
+        assert not expected_results[name].empty, name
+
+    for name in [
+        "identical_tests", "removed_tests", "replaced_tests", "new_cis",
+        "targets", "test_methods", "new_test_methods", "presence_in_db",
+        "panel_changes", "unresolved_symbols", "genepanels",
+    ]:
+        pd.testing.assert_frame_equal(
+            merged_results[name].reset_index(drop=True),
+            expected_results[name].reset_index(drop=True),
+            obj=name
+        )
+
+    # the order of the gene table doesn't matter for the gene index
+    assert sorted(
+        merged_results["gene_table"].to_numpy().tolist()
+    ) == sorted(expected_results["gene_table"].to_numpy().tolist())
+
+    assert merged_results["panels"].keys() == expected_results["panels"].keys()
+    assert merged_results["inputs"] == expected_results["inputs"]
+    assert merged_results["input_hashes"] == expected_results["input_hashes"]
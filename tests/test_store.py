@@ -0,0 +1,285 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from test_directory_checker import identify, store, utils
+
+
+def test_write_run_and_changes(tmp_path):
+    """ Test that two runs written in the store can be read back and that the
+    changes between them are found
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    store_path = tmp_path / "results.db"
+    inputs = {"genepanels": "tests/test_files/test_genepanels.tsv"}
+
+    first_targets = pd.DataFrame(
+        [["R1.1", ["123"], []], ["R2.1", [], ["HGNC:1", "HGNC:2"]]],
+        columns=["Test ID", "Identified panels", "Identified genes"]
+    )
+    second_targets = pd.DataFrame(
+        [["R1.1", ["123"], []], ["R3.1", ["456"], []]],
+        columns=["Test ID", "Identified panels", "Identified genes"]
+    )
+
+    first_run_id = store.write_run(
+        store_path, tmp_path / "run1", "main.py run1", inputs,
+        {"targets": first_targets, "identical_tests": None}
+    )
+    second_run_id = store.write_run(
+        store_path, tmp_path / "run2", "main.py run2", inputs,
+        {"targets": second_targets}
+    )
+
+    runs = store.get_runs(store_path)
+    np.testing.assert_array_equal(
+        runs["run_id"].to_numpy(), [first_run_id, second_run_id]
+    )
+
+    # list columns are stored as comma joined strings
+    targets = store.get_run_table(store_path, "targets", first_run_id)
+    np.testing.assert_array_equal(
+        targets["Identified genes"].to_numpy(), ["", "HGNC:1, HGNC:2"]
+    )
+
+    changes = store.get_changes_since_last_run(store_path, "targets")
+    np.testing.assert_array_equal(
+        changes["Test ID"].to_numpy(), ["R2.1", "R3.1"]
+    )
+    np.testing.assert_array_equal(
+        changes["change"].to_numpy(), ["removed", "added"]
+    )
+
+    trend = store.get_trend(store_path, "identical_tests")
+    np.testing.assert_array_equal(trend["nb_rows"].to_numpy(), [0, 0])
+
+
+def test_write_run_new_columns(tmp_path):
+    """ Test that a run with columns missing from a store created by a
+    previous run is written, the previous runs getting nulls
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    store_path = tmp_path / "results.db"
+    first_replaced_tests = pd.DataFrame(
+        [["R1.1_CI_P", "R1.2"]], columns=["gemini_name", "td_ci"]
+    )
+    second_replaced_tests = pd.DataFrame(
+        [["R1.1_CI_P", "R1.2", 0.5, 1, True]],
+        columns=["gemini_name", "td_ci", "jaccard", "rank", "best_match"]
+    )
+
+    first_run_id = store.write_run(
+        store_path, tmp_path / "run1", "main.py run1", {},
+        {"replaced_tests": first_replaced_tests}
+    )
+    second_run_id = store.write_run(
+        store_path, tmp_path / "run2", "main.py run2", {},
+        {"replaced_tests": second_replaced_tests}
+    )
+
+    assert store.get_run_table(
+        store_path, "replaced_tests", first_run_id
+    ).to_numpy().tolist() == [["R1.1_CI_P", "R1.2", None, None, None]]
+    assert store.get_run_table(
+        store_path, "replaced_tests", second_run_id
+    ).to_numpy().tolist() == [["R1.1_CI_P", "R1.2", 0.5, 1, 1]]
+
+
+def test_get_file_hash(tmp_path):
+    """ Test that the hash of a file is its SHA256
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    file_path = tmp_path / "file.txt"
+    file_path.write_text("test")
+
+    assert utils.get_file_hash(file_path) == (
+        "9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08"
+    )
+
+
+class MockPanel:
+    """ Mock of the Panelapp panel objects with a version and genes """
+
+    def __init__(self, version: str, genes: list):
+        self.version = version
+        self.genes = genes
+
+    def get_version(self):
+        return self.version
+
+    def get_genes(self):
+        return [{"hgnc_id": gene} for gene in self.genes]
+
+
+def test_panel_versions(tmp_path):
+    """ Test that a panel version bump is reported with the genes that moved
+    between the stored version and the current one
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    store_path = tmp_path / "results.db"
+
+    first_panels = {
+        1: MockPanel("1.0", ["HGNC:1", "HGNC:2"]),
+        2: MockPanel("2.0", ["HGNC:3"])
+    }
+    store.write_panel_versions(store_path, first_panels, ["1", "2"])
+
+    second_panels = {
+        1: MockPanel("1.1", ["HGNC:2", "HGNC:4"]),
+        2: MockPanel("2.0", ["HGNC:3"])
+    }
+    panel_changes = store.get_panel_changes(
+        store_path, second_panels, ["1", "2"]
+    )
+
+    np.testing.assert_array_equal(panel_changes["panel_id"].to_numpy(), [1])
+    np.testing.assert_array_equal(
+        panel_changes["previous_version"].to_numpy(), ["1.0"]
+    )
+    np.testing.assert_array_equal(panel_changes["added"].to_numpy(), ["HGNC:4"])
+    np.testing.assert_array_equal(
+        panel_changes["removed"].to_numpy(), ["HGNC:1"]
+    )
+
+    store.write_panel_versions(store_path, second_panels, ["1", "2"])
+
+    assert store.get_panel_diff(store_path, 1, "1.0", "1.1") == (
+        {"HGNC:4"}, {"HGNC:1"}
+    )
+
+    # the bump is not reported again once the current version is stored
+    assert store.get_panel_changes(store_path, second_panels, ["1", "2"]).empty
+
+    # the next bump is compared to the latest stored version
+    third_panels = {
+        1: MockPanel("1.2", ["HGNC:4"]),
+        2: MockPanel("2.0", ["HGNC:3"])
+    }
+    panel_changes = store.get_panel_changes(
+        store_path, third_panels, ["1", "2"]
+    )
+
+    assert panel_changes.to_numpy().tolist() == [
+        [1, "1.1", "1.2", "", "HGNC:2"]
+    ]
+
+
+def test_panel_versions_already_stored(tmp_path):
+    """ Test that the genes of a panel version already stored are not written
+    again under the version of another panel
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    store_path = tmp_path / "results.db"
+
+    store.write_panel_versions(
+        store_path,
+        {1: MockPanel("1.0", ["HGNC:1"]), 2: MockPanel("1.0", ["HGNC:2"])},
+        ["1", "2"]
+    )
+    store.write_panel_versions(
+        store_path,
+        {1: MockPanel("2.0", ["HGNC:3"]), 2: MockPanel("1.0", ["HGNC:2"])},
+        ["1", "2"]
+    )
+
+    assert store.get_panel_genes(store_path, 1, "2.0") == {"HGNC:3"}
+    assert store.get_panel_genes(store_path, 2, "1.0") == {"HGNC:2"}
+
+    with sqlite3.connect(store_path) as conn:
+        nb_panel_genes = conn.execute(
+            "SELECT COUNT(*) FROM panel_genes"
+        ).fetchone()[0]
+
+    assert nb_panel_genes == 3
+
+
+def test_gene_index(tmp_path):
+    """ Test that the genes can be queried by HGNC ID or symbol and that the
+    index of a run replaces the index of the previous run
+
+    Args:
+        tmp_path (Path): Pytest fixture for a temporary folder
+    """
+
+    store_path = tmp_path / "results.db"
+    hgnc_dump = pd.DataFrame(
+        [
+            ["HGNC:1078", "BMPR2", "PPH1", None],
+            ["HGNC:1228", "SERPING1", None, "C1NH"],
+            ["HGNC:25565", "C1orf112", None, "FLJ10706"],
+        ],
+        columns=[
+            "HGNC ID", "Approved symbol", "Previous symbols", "Alias symbols"
+        ]
+    )
+    symbol_table = identify.build_symbol_table(hgnc_dump)
+    gene_table = pd.DataFrame(
+        [
+            ["R1.1", "123", "HGNC:1078"], ["R2.1", "direct", "HGNC:1078"],
+            ["R3.1", "direct", "HGNC:1228"], ["R4.1", "direct", "HGNC:25565"],
+        ],
+        columns=["Test ID", "source", "HGNC ID"]
+    )
+    genepanels_df = pd.DataFrame(
+        [["R1.1_CI_P", "Panel_1.0", "HGNC:1078"]],
+        columns=["ci", "panel", "gene"]
+    )
+
+    # a missing store is not created
+    with pytest.raises(AssertionError, match="doesn't exist"):
+        store.query_gene(store_path, "BMPR2")
+
+    assert not store_path.exists()
+
+    store.create_store_engine(store_path).dispose()
+
+    assert store.query_gene(store_path, "BMPR2").empty
+
+    store.write_gene_index(
+        store_path, 1, gene_table, symbol_table, genepanels_df
+    )
+
+    entries = store.query_gene(store_path, "pph1")
+
+    assert entries.to_numpy().tolist() == [
+        ["HGNC:1078", "BMPR2", "test_directory", "R1.1", "123"],
+        ["HGNC:1078", "BMPR2", "test_directory", "R2.1", "direct"],
+        ["HGNC:1078", "BMPR2", "genepanels", "R1.1_CI_P", "Panel_1.0"],
+    ]
+    pd.testing.assert_frame_equal(
+        store.query_gene(store_path, "HGNC:1078"), entries
+    )
+    assert store.query_gene(store_path, "C1NH")["test"].to_list() == [
+        "R3.1"
+    ]
+
+    # mixed case symbols and lower case HGNC IDs are found
+    for gene in ["C1orf112", "c1orf112", "hgnc:25565"]:
+        assert store.query_gene(store_path, gene).to_numpy().tolist() == [
+            ["HGNC:25565", "C1orf112", "test_directory", "R4.1", "direct"]
+        ]
+
+    # the index is replaced by the index of the next run
+    store.write_gene_index(store_path, 2, gene_table[:1], symbol_table)
+
+    assert store.query_gene(store_path, "BMPR2")["test"].to_list() == [
+        "R1.1"
+    ]
+    assert store.query_gene(store_path, "SERPING1").empty